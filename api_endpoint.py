@@ -1,18 +1,221 @@
 # api_endpoint.py
 
+import base64
+import datetime
+import json
+import threading
+from contextlib import contextmanager
+
+import statements
+import tracing
+
+
+# Raised by run() when the input is invalid or the requested record does not exist
+# execute() prints the message; batch and server callers report it back to their caller
+class APIError(Exception):
+    pass
+
+
+# Structured result returned by run()
+#   - columns: column names, in row order
+#   - rows: list of tuples
+#   - message: optional human readable summary (e.g. "Client updated successfully!")
+#   - next_token: for paginated APIs, the pageToken that fetches the next page (None on the last page)
+class APIResult:
+    def __init__(self, columns, rows, message=None, next_token=None):
+        self.columns = list(columns)
+        self.rows = rows
+        self.message = message
+        self.next_token = next_token
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Rows as dictionaries keyed by column name (used for JSON output)
+    def as_dicts(self):
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+# Convert an optional text parameter: blank strings become None (SQL NULL)
+def optional_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value if value else None
+
+
+# Convert an optional true/false parameter (bool or "true"/"false" text); blank becomes None
+def parse_bool(value, field):
+    if value is None or isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value == "":
+        return None
+    if value not in ("true", "false"):
+        raise APIError(f"{field} must be 'true' or 'false'.")
+    return value == "true"
+
+
+# Convert an optional integer parameter; blank becomes the default
+def parse_int(value, field, default=None):
+    if value is None or str(value).strip() == "":
+        return default
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise APIError(f"{field} must be a whole number.")
+
+
+# Convert an optional YYYY-MM-DD parameter to a date; blank becomes None
+def parse_date(value, field):
+    if value is None or isinstance(value, datetime.date):
+        return value
+    value = str(value).strip()
+    if value == "":
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise APIError(f"{field} must be a date (YYYY-MM-DD).")
+
+
+# Convert an optional page size for paginated APIs; blank becomes the default
+def parse_limit(value, default=None):
+    limit = parse_int(value, "Limit", default)
+    if limit is not None and limit < 1:
+        raise APIError("Limit must be at least 1.")
+    return limit
+
+
+# Opaque continuation token for keyset pagination
+# Holds the API name and the sort key of the last row returned; callers pass it back unchanged
+def encode_page_token(api_name, key):
+    data = json.dumps([api_name, *key], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+# Decode a pageToken back into its sort key; blank means "first page" and returns None
+def decode_page_token(token, api_name, key_size):
+    token = optional_text(token)
+    if token is None:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise APIError("Invalid page token.")
+    if not isinstance(data, list) or len(data) != key_size + 1 or data[0] != api_name:
+        raise APIError("Invalid page token.")
+    return data[1:]
+
+
+# Work to do once a connection's transaction commits, e.g. invalidating a cache of the rows it
+# changed: doing it earlier lets a reader reload the old rows before the commit and keep them.
+# transaction() runs it after its own commit; callers that pass their own connection to run()
+# call run_after_commit(conn) after committing and discard_after_commit(conn) after a rollback.
+_after_commit = {}      # id(connection) -> set of (function, args)
+_after_commit_lock = threading.Lock()
+
+
+def after_commit(conn, function, *args):
+    with _after_commit_lock:
+        _after_commit.setdefault(id(conn), set()).add((function, args))
+
+
+def run_after_commit(conn):
+    with _after_commit_lock:
+        pending = _after_commit.pop(id(conn), ())
+    for function, args in pending:
+        function(*args)
+
+
+def discard_after_commit(conn):
+    with _after_commit_lock:
+        _after_commit.pop(id(conn), None)
+
+
 class APIEndpoint:
     # Abstract base class for all API endpoints
     # Each API must implement:
     #   - display_brief(index): Print a one-line summary
     #   - display_details(): Print detailed usage information
-    #   - execute(): Prompt for input and perform the database operation
-    
+    #   - run(params, conn=None): Validate params, perform the database operation and return an APIResult
+    #   - execute(): Prompt for input, call run() and print the result
+    #
+    # List APIs whose results can be unbounded also implement:
+    #   - stream(params, conn=None): Validate params and return an iterator over the result rows
+    #   - list_query(params): Validate params and return (statement name, statement params, columns)
+    #     for the full, unpaginated result; export() uses it
+    #
+    # APIs whose run() mostly waits for work queued elsewhere (ClockIn's check-in buffer) also implement:
+    #   - submit(params): Validate params, queue the work and return a concurrent.futures.Future of
+    #     the APIResult, so the HTTP service can await it without holding a worker thread
+    #
+    # run() never reads stdin or prints, so batch jobs, servers and benchmarks can call it directly.
+    # When a connection is passed in, run() works inside the caller's transaction and does not commit.
+
+    # Short name of the API (e.g. "UpdateClient"), used by non-interactive callers
+    name = None
+
+    def __init__(self, pool):
+        self.pool = pool
+
     def display_brief(self, index):
         raise NotImplementedError
-    
+
     def display_details(self):
         raise NotImplementedError
 
+    def run(self, params: dict, conn=None) -> APIResult:
+        raise NotImplementedError
+
+    # None means there is no queued path: callers run run() on a thread of their own
+    def submit(self, params: dict):
+        return None
+
     def execute(self):
         raise NotImplementedError
 
+    def list_query(self, params: dict):
+        raise NotImplementedError
+
+    # Yields a connection for one run() call
+    # Without a caller connection: check one out of the pool, commit on success (then run the
+    # after_commit work), roll back on error
+    # The round trips made inside are attributed to this endpoint by the query tracer (tracing.py)
+    @contextmanager
+    def transaction(self, conn=None):
+        if conn is not None:
+            with tracing.endpoint_call(conn, self.name):
+                yield conn
+            return
+        with self.pool.connection() as conn, tracing.endpoint_call(conn, self.name):
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                discard_after_commit(conn)
+                raise
+            # Still holding the connection, so no other thread can register work for it yet
+            run_after_commit(conn)
+
+    # Build the result of a keyset-paginated query that fetched up to limit + 1 rows
+    # The extra row only signals that another page exists; key(row) gives a row's sort key
+    def page_result(self, columns, rows, limit, key):
+        if len(rows) <= limit:
+            return APIResult(columns, rows)
+        rows = rows[:limit]
+        return APIResult(columns, rows, next_token=encode_page_token(self.name, key(rows[-1])))
+
+    # Yields the rows of a registered statement through a server-side cursor, fetch_size rows per round trip
+    # The connection (and its transaction) is held until the rows are exhausted or the iterator is closed
+    def stream_statement(self, name, params, conn=None, fetch_size=statements.STREAM_FETCH_SIZE):
+        with self.transaction(conn) as conn:
+            yield from statements.stream(conn, name, params, fetch_size)
+
+    # Writes every row matching params to the text file out as "csv" or "jsonl" (see statements.copy_out)
+    # Rows are formatted by the server and streamed with COPY, so memory stays constant. Returns the row count.
+    def export(self, params: dict, out, fmt="csv", conn=None) -> int:
+        name, args, columns = self.list_query(params)
+        with self.transaction(conn) as conn, conn.cursor() as cur:
+            return statements.copy_out(cur, name, args, out, columns, fmt)
@@ -2,6 +2,7 @@
 
 from clientmanagement import (
     UpdateClientAPI,
+    BatchUpdateClientsAPI,
     RetrieveClientAPI,
     ListClientsAPI
 )
@@ -10,12 +11,15 @@ from servicemanagement import (
     AssignRecurringService,
     UpdateService,
     GetServiceHistory,       
-    ListAssignedServices
+    ListAssignedServices,
+    VisitSchedule
     )
 
-#from workrecordmanagement import (
-#
-#)
+from workrecordmanagement import (
+    ClockInAPI,
+    ClockOutAPI,
+    DailyPlanAPI
+)
 
 from employeemanagement import (
     ListEmployeesAPI,
@@ -24,7 +28,9 @@ from employeemanagement import (
 )
 
 from financialmanagement import (
-    WorkSummaryAPI
+    WorkSummaryAPI,
+    BillingRunAPI,
+    PayrollAPI
 )
 
 from propertymanagement import (
@@ -33,28 +39,39 @@ from propertymanagement import (
     )
 
 # Returns a dictionary of API groups.
-def get_all_apis(conn):
+# Every endpoint shares the same ConnectionPool and checks out a connection per execute().
+def get_all_apis(pool):
     return {
-        "Client Management": get_client_apis(conn),
-        "Service Management": get_service_apis(conn),
-        "Employee Management": get_employee_apis(conn),
-        "Property Management": get_property_apis(conn),
-        "Financial Management": get_financial_apis(conn)
+        "Client Management": get_client_apis(pool),
+        "Service Management": get_service_apis(pool),
+        "Work Record Management": get_work_record_apis(pool),
+        "Employee Management": get_employee_apis(pool),
+        "Property Management": get_property_apis(pool),
+        "Financial Management": get_financial_apis(pool)
     }
 
 # Group-specific functions returning lists of API endpoint instances.
 
-def get_client_apis(conn):
-    return [UpdateClientAPI(conn), RetrieveClientAPI(conn), ListClientsAPI(conn)]
+def get_client_apis(pool):
+    return [UpdateClientAPI(pool), BatchUpdateClientsAPI(pool), RetrieveClientAPI(pool), ListClientsAPI(pool)]
+
+def get_service_apis(pool):
+    return [AssignRecurringService(pool), UpdateService(pool), GetServiceHistory(pool), ListAssignedServices(pool),
+            VisitSchedule(pool)]
+
+def get_work_record_apis(pool):
+    return [ClockInAPI(pool), ClockOutAPI(pool), DailyPlanAPI(pool)]
 
-def get_service_apis(conn):
-    return [AssignRecurringService(conn), UpdateService(conn), GetServiceHistory(conn), ListAssignedServices(conn)]
+def get_employee_apis(pool):
+    return [ListEmployeesAPI(pool), CreateEmployeeAPI(pool), EditEmployeeAPI(pool)]
 
-def get_employee_apis(conn):
-    return [ListEmployeesAPI(conn), CreateEmployeeAPI(conn), EditEmployeeAPI(conn)]
+def get_property_apis(pool):
+    return [ListPropertiesAPI(pool), UpdateClientPropertiesAPI(pool)]
 
-def get_property_apis(conn):
-    return [ListPropertiesAPI(conn), UpdateClientPropertiesAPI(conn)]
+def get_financial_apis(pool):
+    return [WorkSummaryAPI(pool), BillingRunAPI(pool), PayrollAPI(pool)]
 
-def get_financial_apis(conn):
-    return [WorkSummaryAPI(conn)]
\ No newline at end of file
+# Returns a dictionary of every API endpoint keyed by its short name (e.g. "UpdateClient").
+# Used by non-interactive callers that call run() directly.
+def get_apis_by_name(pool):
+    return {api.name: api for group in get_all_apis(pool).values() for api in group}
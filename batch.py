@@ -0,0 +1,143 @@
+# batch.py
+
+import json
+import sys
+import time
+
+from psycopg2 import extensions
+
+from api_endpoint import APIError, discard_after_commit, run_after_commit
+from apis import get_apis_by_name
+
+
+# ---------------------------
+# Batch mode: replay a JSON-lines file of API calls without the interactive menu
+#
+# Each line names an endpoint and its run() parameters, e.g.
+#   {"api": "UpdateClient", "params": {"accountNumber": "C0001", "phoneNumber": "5551234"}}
+#
+# All calls run back-to-back on one pooled connection. Every commit_size lines are committed
+# together, so the database sees one transaction per group instead of one per call.
+# A line that fails is reported and skipped; if it aborted the transaction, the group is
+# rolled back and its earlier (successful) lines are replayed before continuing.
+# ---------------------------
+
+# Parse one line of the batch file into (api name, params)
+def parse_line(text):
+    call = json.loads(text)
+    if not isinstance(call, dict):
+        raise APIError("Each line must be a JSON object.")
+    name = call.get("api") or call.get("endpoint")
+    params = call.get("params", {})
+    if not name:
+        raise APIError("Missing 'api' (endpoint name).")
+    if not isinstance(params, dict):
+        raise APIError("'params' must be a JSON object.")
+    return name, params
+
+
+# Read the batch file, skipping blank lines and # comments
+# Returns a list of (line number, api name, params, parse error)
+def read_calls(path):
+    calls = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, text in enumerate(f, start=1):
+            text = text.strip()
+            if not text or text.startswith("#"):
+                continue
+            try:
+                name, params = parse_line(text)
+                calls.append((lineno, name, params, None))
+            except (ValueError, APIError) as e:
+                calls.append((lineno, None, None, str(e)))
+    return calls
+
+
+# Write one line of the result report
+def report_line(out, lineno, name, status, result=None, error=None):
+    entry = {"line": lineno, "api": name, "status": status}
+    if result is not None:
+        entry["message"] = result.message
+        entry["rows"] = result.as_dicts()
+        if result.next_token is not None:
+            entry["nextToken"] = result.next_token
+    if error is not None:
+        entry["error"] = error
+    out.write(json.dumps(entry, default=str) + "\n")
+
+
+# Commit the group and report its calls; returns their number
+def commit_group(conn, group, out):
+    conn.commit()
+    run_after_commit(conn)
+    for lineno, name, _, _, result in group:
+        report_line(out, lineno, name, "ok", result=result)
+    return len(group)
+
+
+# Roll back the aborted transaction and run the group's calls again on conn
+# The group's entries get the results of the replay, since values drawn from sequences (e.g.
+# serviceNum, workRecordNum) differ from the rolled-back run. A call that fails during the replay
+# is reported, dropped from the group, and the replay starts over without it.
+# Returns the number of calls dropped
+def replay_group(conn, group, out):
+    dropped = 0
+    while True:
+        conn.rollback()
+        discard_after_commit(conn)
+        for index, (lineno, name, api, params, _) in enumerate(group):
+            try:
+                group[index] = (lineno, name, api, params, api.run(params, conn))
+            except Exception as e:
+                report_line(out, lineno, name, "error", error=f"Failed on replay: {str(e).strip()}")
+                del group[index]
+                dropped += 1
+                break
+        else:
+            return dropped
+
+
+# Run every call in the batch file and write a per-line report
+# Returns (succeeded, failed) counts
+def run_batch(pool, path, commit_size=100, out=sys.stdout):
+    apis = get_apis_by_name(pool)
+    calls = read_calls(path)
+    commit_size = max(1, commit_size)
+    succeeded = failed = 0
+    started = time.monotonic()
+
+    with pool.connection() as conn:
+        # Calls run in the current, uncommitted transaction, as (line, name, api, params, result);
+        # their report lines are held back until the group commits
+        group = []
+        for lineno, name, params, parse_error in calls:
+            if parse_error is not None:
+                report_line(out, lineno, name, "error", error=f"Invalid line: {parse_error}")
+                failed += 1
+                continue
+            api = apis.get(name)
+            if api is None:
+                report_line(out, lineno, name, "error", error=f"Unknown API '{name}'.")
+                failed += 1
+                continue
+
+            try:
+                group.append((lineno, name, api, params, api.run(params, conn)))
+            except Exception as e:
+                failed += 1
+                report_line(out, lineno, name, "error", error=str(e).strip())
+                if conn.info.transaction_status == extensions.TRANSACTION_STATUS_INERROR:
+                    # The failed statement aborted the transaction: replay the good calls of this group
+                    failed += replay_group(conn, group, out)
+
+            if len(group) >= commit_size:
+                succeeded += commit_group(conn, group, out)
+                group = []
+
+        succeeded += commit_group(conn, group, out)
+
+    elapsed = time.monotonic() - started
+    rate = (succeeded + failed) / elapsed if elapsed > 0 else 0.0
+    print(f"Batch finished: {succeeded} succeeded, {failed} failed in {elapsed:.2f}s ({rate:.0f} calls/s).",
+          file=sys.stderr)
+    return succeeded, failed
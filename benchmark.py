@@ -0,0 +1,321 @@
+# benchmark.py
+
+import argparse
+import datetime
+import json
+import re
+import sys
+import time
+
+import psycopg2
+
+import apis
+import datagen
+import tracing
+from api_endpoint import APIError, discard_after_commit
+from config import DB_CONFIG
+from db_pool import ConnectionPool
+from loadtest import EndpointStats
+
+
+# ---------------------------
+# Per-endpoint benchmark suite
+# Calls every API's run() in process against the configured database, once per case of the
+# parameter matrix in BENCHMARK_CASES, and records for each case:
+#   - latency percentiles (p50/p95/p99) and mean over --iterations calls, after --warmup calls
+#   - rows returned per second, and database round trips per call (from the query tracer)
+#   - the plan shape of every statement the call ran: the tree of plan node types with the
+#     tables and indexes they touch, without costs, so a changed plan shows up as a diff
+#
+# Every call runs in its own transaction on one connection and is rolled back, so cases that
+# write (only run with --writes) leave the data unchanged. With --sizes the database is
+# refilled by datagen.py before each size, deleting the data it held.
+#
+#   python3 benchmark.py [--sizes 10000,1000000] [--output results.json]
+#                        [--baseline baseline.json [--threshold 20]] [--save-baseline baseline.json]
+#
+# The results are compared against --baseline: any case whose --metric latency grew by more
+# than --threshold percent (and by more than --min-delta-ms) is a regression, and the exit
+# status is 1. Changed plan shapes are reported alongside.
+# ---------------------------
+
+# (API name, case name, params, writes)
+# The parameters exist both in the sample data (landscapingdb.txt) and in datagen.py output
+BENCHMARK_CASES = [
+    ("ListClients", "all", {}, False),
+    ("ListClients", "active", {"activeStatus": True}, False),
+    ("ListClients", "page", {"limit": 50}, False),
+    ("RetrieveClient", "by_account", {"accountNumber": "C0001"}, False),
+    ("ListProperties", "all", {}, False),
+    ("ListProperties", "filtered", {"activeStatus": True, "city": "Seattle"}, False),
+    ("ListProperties", "by_account", {"accountNumber": "C0001"}, False),
+    ("ListAssignedServices", "by_property", {"propertyNumber": "P001"}, False),
+    ("ListAssignedServices", "page", {"limit": 100}, False),
+    ("GetServiceHistory", "by_account", {"accountNumber": "C0001"}, False),
+    ("GetServiceHistory", "breakdown", {"accountNumber": "C0001", "breakdown": True}, False),
+    ("GetServiceHistory", "narrow", {"accountNumber": "C0001", "startDate": "2025-06-01",
+                                     "endDate": "2025-06-30"}, False),
+    ("ListEmployees", "all", {}, False),
+    ("ListEmployees", "page", {"limit": 50}, False),
+    ("WorkSummary", "wide", {"startDate": "2000-01-01", "endDate": "2100-01-01"}, False),
+    ("WorkSummary", "narrow", {"startDate": "2025-06-01", "endDate": "2025-06-08"}, False),
+    ("Payroll", "month", {"periodStart": "2025-05-01", "periodEnd": "2025-05-31"}, False),
+    ("Payroll", "biweekly", {"periodStart": "2025-01-01", "periodEnd": "2025-06-30", "periodDays": 14}, False),
+    ("VisitSchedule", "year_summary", {"startDate": "2025-07-01", "endDate": "2026-06-30", "summary": True}, False),
+    ("VisitSchedule", "month", {"startDate": "2025-07-01", "endDate": "2025-07-31"}, False),
+    ("VisitSchedule", "property_year", {"startDate": "2025-07-01", "endDate": "2026-06-30",
+                                        "propertyNumber": "P001"}, False),
+    ("DailyPlan", "day", {"date": "2025-07-01"}, False),
+    ("DailyPlan", "summary", {"date": "2025-07-01", "summary": True}, False),
+    ("UpdateClient", "one_field", {"accountNumber": "C0001", "firstName": "Bench"}, True),
+    ("BatchUpdateClients", "one_client", {"clients": [{"accountNumber": "C0001", "firstName": "Bench"}]}, True),
+    ("UpdateClientProperties", "activate", {"accountNumber": "C0001", "activeStatus": True}, True),
+    ("UpdateService", "price", {"serviceNum": "RS0001", "price": "55.00"}, True),
+    ("AssignRecurringService", "one_property", {"propertyNumber": "P001", "serviceName": "Bench Mowing",
+                                                "allocatedManHours": "01:00:00", "price": "50.00",
+                                                "serviceType": "L", "frequencyType": "W"}, True),
+    ("EditEmployee", "one_field", {"employeeNum": "E0001", "firstName": "Bench"}, True),
+    ("CreateEmployee", "new", {"firstName": "Bench", "lastName": "Mark", "phone": "555-555-0100",
+                               "email": "bench.mark@landscaping.example", "hireDate": "2025-01-01",
+                               "hourlyWage": "25.00"}, True),
+    ("BillingRun", "month", {"period": "2025-05"}, True),
+    ("ClockIn", "ten_employees", {"checkIns": [{"employeeNum": f"E{n:04d}", "serviceNum": f"RS{n:04d}"}
+                                               for n in range(1, 11)]}, True),
+]
+
+# Plans are captured for statements starting with one of these keywords (not PREPARE, SET, ...)
+EXPLAINABLE = re.compile(r"^\s*(EXECUTE|SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+PERCENTILES = (50, 95, 99)
+
+
+# Cursor used for one extra call per case: runs EXPLAIN before each explainable statement
+class PlanCursor(tracing.TracingCursor):
+    plans = []      # (statement key, plan shape) in execution order; reset per case
+
+    def execute(self, query, vars=None):
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        # Server-side cursors cannot DECLARE an EXPLAIN; multi-statement batches are setup
+        if self.name is None and EXPLAINABLE.match(text) and ";" not in text.strip().rstrip(";"):
+            super().execute("EXPLAIN (FORMAT JSON) " + text.strip().rstrip(";"), vars)
+            plan = self.fetchone()[0]
+            PlanCursor.plans.append((tracing.statement_key(text), plan_shape(plan[0]["Plan"])))
+        return super().execute(query, vars)
+
+
+# Compact plan tree, e.g. "Limit(Index Scan[idx_client_name])"
+def plan_shape(node):
+    label = node["Node Type"]
+    target = node.get("Index Name") or node.get("Relation Name")
+    if target:
+        label += f"[{target}]"
+    children = node.get("Plans") or []
+    if children:
+        label += "(" + ", ".join(plan_shape(child) for child in children) + ")"
+    return label
+
+
+# Time one case on conn; returns its result entry
+def run_case(api, params, conn, iterations, warmup):
+    stats = EndpointStats()
+    rows = 0
+    for i in range(warmup + iterations):
+        started = time.perf_counter()
+        try:
+            rows_returned = len(api.run(dict(params), conn))
+        finally:
+            conn.rollback()
+            discard_after_commit(conn)
+        if i >= warmup:
+            stats.latencies.append(time.perf_counter() - started)
+            rows += rows_returned
+    trips_before = tracing.tracer.snapshot()["endpoints"].get(api.name, {}).get("roundTrips", 0)
+    # One more call, untimed, for the round trip count and the plans
+    PlanCursor.plans = []
+    factory = conn.cursor_factory
+    conn.cursor_factory = PlanCursor
+    try:
+        api.run(dict(params), conn)
+    finally:
+        conn.cursor_factory = factory
+        conn.rollback()
+        discard_after_commit(conn)
+    trips_after = tracing.tracer.snapshot()["endpoints"].get(api.name, {}).get("roundTrips", 0)
+    explains = len(PlanCursor.plans)
+
+    total = sum(stats.latencies)
+    result = {f"p{p}Ms": round(stats.percentile(p) * 1000, 3) for p in PERCENTILES}
+    result.update({
+        "meanMs": round(total / iterations * 1000, 3),
+        "calls": iterations,
+        "rowsPerCall": rows // iterations,
+        "rowsPerSec": round(rows / total, 1) if total else 0.0,
+        # Only counted when tracing is on ("trace" in DB_CONFIG)
+        "roundTripsPerCall": (trips_after - trips_before - explains
+                              if isinstance(conn, tracing.TracingConnection) else None),
+        "plans": [{"statement": key, "shape": shape} for key, shape in PlanCursor.plans],
+    })
+    return result
+
+
+# Run every selected case against the data currently in the database
+def run_suite(pool, cases, iterations, warmup, out=sys.stderr):
+    by_name = apis.get_apis_by_name(pool)
+    results = {}
+    with pool.connection() as conn:
+        for name, case, params, _ in cases:
+            api = by_name.get(name)
+            if api is None:
+                print(f"  {name}/{case}: skipped, no such API", file=out)
+                continue
+            try:
+                results[f"{name}/{case}"] = run_case(api, params, conn, iterations, warmup)
+            except (APIError, psycopg2.Error) as e:
+                conn.rollback()
+                results[f"{name}/{case}"] = {"error": str(e).strip()}
+            entry = results[f"{name}/{case}"]
+            print(f"  {name}/{case}: " + (f"p50 {entry['p50Ms']:.2f} ms" if "error" not in entry
+                                          else f"error: {entry['error']}"), file=out)
+    return results
+
+
+def database_info(pool):
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT current_setting('server_version'), (SELECT count(*) FROM WorkRecord), "
+                    "(SELECT count(*) FROM Client);")
+        version, work_records, clients = cur.fetchone()
+        conn.commit()
+    return {"serverVersion": version, "workRecords": work_records, "clients": clients}
+
+
+# Compare results with a baseline of the same layout
+# Returns (regressions, report lines)
+def compare(results, baseline, metric, threshold, min_delta_ms):
+    regressions = 0
+    lines = []
+    for size, cases in results.items():
+        for key, entry in cases.items():
+            base = baseline.get(size, {}).get(key)
+            if base is None or "error" in base or "error" in entry:
+                continue
+            before, now = base[metric], entry[metric]
+            change = (now - before) / before * 100 if before else 0.0
+            status = ""
+            if change > threshold and now - before > min_delta_ms:
+                regressions += 1
+                status = "REGRESSION"
+            if [p["shape"] for p in base.get("plans", [])] != [p["shape"] for p in entry.get("plans", [])]:
+                status = (status + " PLAN CHANGED").strip()
+            if status:
+                lines.append(f"{size:>10} {key:<40} {before:>10.2f} {now:>10.2f} {change:>+8.1f}%  {status}")
+                if "PLAN CHANGED" in status:
+                    for old, new in zip(base.get("plans", []), entry.get("plans", [])):
+                        if old["shape"] != new["shape"]:
+                            lines.append(f"{'':>12}{new['statement']}: {old['shape']}")
+                            lines.append(f"{'':>12}{'':>{len(new['statement'])}}  -> {new['shape']}")
+    return regressions, lines
+
+
+def print_results(results, out=sys.stdout):
+    print(f"\n{'Size':>10} {'Case':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Rows/s':>11} {'Trips':>6}",
+          file=out)
+    print("-" * 100, file=out)
+    for size, cases in results.items():
+        for key, e in cases.items():
+            if "error" in e:
+                print(f"{size:>10} {key:<40} error: {e['error']}", file=out)
+                continue
+            print(f"{size:>10} {key:<40} {e['p50Ms']:>9.2f} {e['p95Ms']:>9.2f} {e['p99Ms']:>9.2f} "
+                  f"{e['rowsPerSec']:>11.1f} {e['roundTripsPerCall'] if e['roundTripsPerCall'] is not None else '-':>6}",
+                  file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint against a local database.")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        help="Work record counts to benchmark at; refills the database with datagen.py "
+                             "before each size (DELETES the existing data). Default: the current data.")
+    parser.add_argument("--seed", type=int, default=475, help="datagen.py seed for --sizes (default: 475).")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per case (default: 50).")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed calls per case first (default: 5).")
+    parser.add_argument("--writes", action="store_true", help="Also run the cases that write (rolled back).")
+    parser.add_argument("--api", action="append", help="Only benchmark this API (repeatable).")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against this results file and fail on regressions.")
+    parser.add_argument("--save-baseline", help="Write the results to this file as the new baseline.")
+    parser.add_argument("--metric", choices=[f"p{p}Ms" for p in PERCENTILES] + ["meanMs"], default="p50Ms",
+                        help="Latency compared against the baseline (default: p50Ms).")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="Percent slower than the baseline that fails the run (default: 20).")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="Ignore slowdowns smaller than this many ms, which are noise (default: 0.5).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.iterations < 1 or args.warmup < 0:
+        print("--iterations must be at least 1 and --warmup at least 0.")
+        return 1
+    cases = [case for case in BENCHMARK_CASES
+             if (args.writes or not case[3]) and (not args.api or case[0] in args.api)]
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading baseline {args.baseline}: {e}")
+            return 1
+
+    try:
+        dbPool = ConnectionPool(DB_CONFIG)
+    except psycopg2.Error as e:
+        print("Error connecting to database:", e)
+        return 1
+
+    results = {}
+    databases = {}
+    try:
+        for size in args.sizes or [None]:
+            label = str(size) if size is not None else "current"
+            if size is not None:
+                with dbPool.connection() as conn:
+                    datagen.DataGenerator(size, args.seed).load(conn, truncate=True)
+            databases[label] = database_info(dbPool)
+            print(f"Benchmarking {len(cases)} cases at {label} "
+                  f"({databases[label]['workRecords']:,} work records)", file=sys.stderr)
+            results[label] = run_suite(dbPool, cases, args.iterations, args.warmup)
+    except psycopg2.Error as e:
+        print("Benchmark failed:", str(e).strip())
+        return 1
+    finally:
+        dbPool.closeall()
+
+    report = {
+        "createdAt": datetime.datetime.now().isoformat(timespec="seconds"),
+        "iterations": args.iterations,
+        "databases": databases,
+        "results": results,
+    }
+    print_results(results)
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if baseline is None:
+        return 0
+    regressions, lines = compare(results, baseline, args.metric, args.threshold, args.min_delta_ms)
+    print(f"\nCompared with {args.baseline} on {args.metric} (threshold {args.threshold:g}%):")
+    if lines:
+        print(f"{'Size':>10} {'Case':<40} {'Baseline':>10} {'Now':>10} {'Change':>9}")
+        for line in lines:
+            print(line)
+    print(f"{regressions} regression(s).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+# bulk_import.py
+
+import argparse
+import csv
+import sys
+
+import psycopg2
+
+from config import DB_CONFIG
+from db_pool import ConnectionPool
+
+
+# ---------------------------
+# Bulk import of clients, properties, recurring services and work records from CSV files
+#
+# Each file is streamed with COPY into a temporary staging table of text columns, so malformed
+# values never abort the load. Every row is then checked set-wise, in a few UPDATEs over the
+# staging table: blanks are trimmed to NULL, one UPDATE records the first failed check (required
+# fields, lengths, lookup codes, foreign keys, value formats), and one more per unique column
+# rejects duplicates within the file. Accepted rows are merged into the real tables with
+# INSERT ... ON CONFLICT (existing records are updated by their business key).
+# All files are imported in one transaction, in dependency order, so a property can refer
+# to a client from the same import. Rejected rows are reported with their row number.
+#
+#   python3 bulk_import.py --clients clients.csv --properties properties.csv \
+#       --services services.csv --work-records workrecords.csv [--rejects rejects.csv] [--dry-run]
+#
+# Requires migration 0002 (python3 migrate.py).
+# ---------------------------
+
+
+# Raised for problems with a whole file (missing required columns, unknown columns)
+class BulkImportError(Exception):
+    pass
+
+
+# One importable CSV file: its columns, checks and merge statements
+#   - columns: (name, max length or None, required) in staging order
+#   - checks: (reason, SQL condition on staging row "s") evaluated in order; the first true one rejects the row
+#   - unique: columns whose values must not repeat within the file (later rows are rejected), or
+#     (column, SQL condition, reason) when only the rows matching the condition must not repeat it
+#   - merge: SQL statements run over the accepted rows; the first one's row count is reported
+class ImportTable:
+    def __init__(self, name, columns, checks, unique, merge, prepare=()):
+        self.name = name
+        self.staging = f"staging_{name}"
+        self.columns = columns
+        self.checks = checks
+        self.unique = unique
+        self.prepare = prepare      # SQL run on accepted rows before the merge
+        self.merge = merge
+
+    def column_names(self):
+        return [column for column, _, _ in self.columns]
+
+
+CLIENTS = ImportTable(
+    "clients",
+    columns=[("accountNumber", 10, True), ("firstName", 20, True), ("lastName", 20, True),
+             ("phoneNumber", 10, True), ("email", 50, False), ("activeStatus", None, False)],
+    checks=[
+        ("activeStatus must be true or false", "s.activeStatus IS NOT NULL AND NOT is_valid_boolean(s.activeStatus)"),
+        ("email belongs to another client",
+         "EXISTS (SELECT 1 FROM Client c WHERE c.email = s.email AND c.accountNumber <> s.accountNumber)"),
+    ],
+    unique=["accountNumber", "email"],
+    # A blank activeStatus keeps an existing client's status (new clients start active)
+    prepare=["""
+        UPDATE staging_clients s
+        SET activeStatus = c.activeStatus::TEXT
+        FROM Client c
+        WHERE c.accountNumber = s.accountNumber AND s.reason IS NULL AND s.activeStatus IS NULL;
+    """],
+    merge=["""
+        INSERT INTO Client (accountNumber, firstName, lastName, phoneNumber, email, activeStatus)
+        SELECT s.accountNumber, s.firstName, s.lastName, s.phoneNumber, s.email,
+               COALESCE(s.activeStatus::boolean, TRUE)
+        FROM staging_clients s
+        WHERE s.reason IS NULL
+        ON CONFLICT (accountNumber) DO UPDATE
+            SET firstName = EXCLUDED.firstName,
+                lastName = EXCLUDED.lastName,
+                phoneNumber = EXCLUDED.phoneNumber,
+                email = EXCLUDED.email,
+                activeStatus = EXCLUDED.activeStatus;
+    """],
+)
+
+PROPERTIES = ImportTable(
+    "properties",
+    columns=[("propertyNumber", 10, True), ("accountNumber", 10, True), ("propertyType", 2, True),
+             ("streetAddress", 50, True), ("streetAddress2", 50, False), ("city", 20, True),
+             ("state", 2, True), ("zipcode", 10, True), ("activeStatus", None, False)],
+    checks=[
+        ("unknown accountNumber", "NOT EXISTS (SELECT 1 FROM Client c WHERE c.accountNumber = s.accountNumber)"),
+        ("unknown propertyType", "NOT EXISTS (SELECT 1 FROM PropertyType t WHERE t.id = upper(s.propertyType))"),
+        ("unknown state", "NOT EXISTS (SELECT 1 FROM State t WHERE t.id = upper(s.state))"),
+        ("activeStatus must be true or false", "s.activeStatus IS NOT NULL AND NOT is_valid_boolean(s.activeStatus)"),
+    ],
+    unique=["propertyNumber"],
+    # A blank activeStatus keeps an existing property's status (new properties start active)
+    prepare=["""
+        UPDATE staging_properties s
+        SET activeStatus = p.activeStatus::TEXT
+        FROM Property p
+        WHERE p.propertyNumber = s.propertyNumber AND s.reason IS NULL AND s.activeStatus IS NULL;
+    """],
+    merge=["""
+        INSERT INTO Property (clientID, propertyTypeID, propertyNumber, streetAddress, streetAddress2,
+                              city, stateID, zipcode, activeStatus)
+        SELECT c.id, upper(s.propertyType), s.propertyNumber, s.streetAddress, s.streetAddress2,
+               s.city, upper(s.state), s.zipcode, COALESCE(s.activeStatus::boolean, TRUE)
+        FROM staging_properties s
+            JOIN Client c ON c.accountNumber = s.accountNumber
+        WHERE s.reason IS NULL
+        ON CONFLICT (propertyNumber) DO UPDATE
+            SET clientID = EXCLUDED.clientID,
+                propertyTypeID = EXCLUDED.propertyTypeID,
+                streetAddress = EXCLUDED.streetAddress,
+                streetAddress2 = EXCLUDED.streetAddress2,
+                city = EXCLUDED.city,
+                stateID = EXCLUDED.stateID,
+                zipcode = EXCLUDED.zipcode,
+                activeStatus = EXCLUDED.activeStatus;
+    """],
+)
+
+# Each row is a recurring service and its assignment to a property (RecurringServiceList)
+SERVICES = ImportTable(
+    "services",
+    columns=[("serviceNum", 10, False), ("propertyNumber", 10, True), ("name", 50, True),
+             ("serviceType", 2, True), ("orderStatus", 2, False), ("allocatedManHours", None, True),
+             ("price", None, True), ("frequencyType", 2, True)],
+    checks=[
+        ("unknown propertyNumber", "NOT EXISTS (SELECT 1 FROM Property p WHERE p.propertyNumber = s.propertyNumber)"),
+        ("unknown serviceType", "NOT EXISTS (SELECT 1 FROM ServiceType t WHERE t.id = upper(s.serviceType))"),
+        ("unknown orderStatus",
+         "s.orderStatus IS NOT NULL AND NOT EXISTS (SELECT 1 FROM OrderStatus t WHERE t.id = upper(s.orderStatus))"),
+        ("unknown frequencyType", "NOT EXISTS (SELECT 1 FROM FrequencyType t WHERE t.id = upper(s.frequencyType))"),
+        ("allocatedManHours is not a valid interval", "NOT is_valid_interval(s.allocatedManHours)"),
+        ("price is not a valid amount", "NOT is_valid_money(s.price)"),
+    ],
+    unique=["serviceNum"],
+    # Rows without a serviceNum get one now (same format as the set_service_num trigger),
+    # so the RecurringServiceList merge can find the service it belongs to
+    prepare=["""
+        UPDATE staging_services
+        SET serviceNum = 'RS' || LPAD(nextval('service_num_seq')::TEXT, 4, '0')
+        WHERE reason IS NULL AND serviceNum IS NULL;
+    """],
+    merge=["""
+        INSERT INTO RecurringService (serviceNum, name, allocatedManHours, price, serviceTypeID, orderStatusID)
+        SELECT s.serviceNum, s.name, s.allocatedManHours::interval, s.price::money,
+               upper(s.serviceType), COALESCE(upper(s.orderStatus), 'A')
+        FROM staging_services s
+        WHERE s.reason IS NULL
+        ON CONFLICT (serviceNum) DO UPDATE
+            SET name = EXCLUDED.name,
+                allocatedManHours = EXCLUDED.allocatedManHours,
+                price = EXCLUDED.price,
+                serviceTypeID = EXCLUDED.serviceTypeID,
+                orderStatusID = EXCLUDED.orderStatusID;
+    """, """
+        INSERT INTO RecurringServiceList (propertyID, recurringServiceID, frequencyTypeID, activeStatus)
+        SELECT p.id, rs.id, upper(s.frequencyType), TRUE
+        FROM staging_services s
+            JOIN Property p ON p.propertyNumber = s.propertyNumber
+            JOIN RecurringService rs ON rs.serviceNum = s.serviceNum
+        WHERE s.reason IS NULL
+        ON CONFLICT (propertyID, recurringServiceID) DO UPDATE
+            SET frequencyTypeID = EXCLUDED.frequencyTypeID,
+                activeStatus = TRUE;
+    """],
+)
+
+WORK_RECORDS = ImportTable(
+    "work_records",
+    columns=[("workRecordNum", 10, True), ("serviceNum", 10, True), ("employeeNum", None, True),
+             ("startTime", None, False), ("endTime", None, False)],
+    checks=[
+        ("unknown serviceNum", "NOT EXISTS (SELECT 1 FROM RecurringService rs WHERE rs.serviceNum = s.serviceNum)"),
+        ("unknown employeeNum", "NOT EXISTS (SELECT 1 FROM Employee e WHERE e.employeeNum = s.employeeNum)"),
+        ("startTime is not a valid timestamp", "s.startTime IS NOT NULL AND NOT is_valid_timestamp(s.startTime)"),
+        ("endTime is not a valid timestamp", "s.endTime IS NOT NULL AND NOT is_valid_timestamp(s.endTime)"),
+        ("endTime is before startTime", "s.endTime::timestamp < s.startTime::timestamp"),
+        # One open record per employee (migration 0008); re-importing that open record itself is fine
+        ("employee already has an open work record",
+         """s.endTime IS NULL AND EXISTS (SELECT 1 FROM WorkRecord w JOIN Employee e ON e.id = w.employeeID
+                                          WHERE e.employeeNum = s.employeeNum AND w.endTime IS NULL
+                                              AND w.workRecordNum <> s.workRecordNum)"""),
+    ],
+    unique=["workRecordNum", ("employeeNum", "endTime IS NULL", "employee has another open work record in file")],
+    merge=["""
+        INSERT INTO WorkRecord (workRecordNum, recurringServiceID, startTime, endTime, employeeID)
+        SELECT s.workRecordNum, rs.id, s.startTime::timestamp, s.endTime::timestamp, e.id
+        FROM staging_work_records s
+            JOIN RecurringService rs ON rs.serviceNum = s.serviceNum
+            JOIN Employee e ON e.employeeNum = s.employeeNum
+        WHERE s.reason IS NULL
+        ON CONFLICT (workRecordNum) DO UPDATE
+            SET recurringServiceID = EXCLUDED.recurringServiceID,
+                startTime = EXCLUDED.startTime,
+                endTime = EXCLUDED.endTime,
+                employeeID = EXCLUDED.employeeID;
+    """, """
+        -- Keep ClockIn's generated numbers (migration 0005) past the imported ones; a no-op without the sequence
+        SELECT setval(to_regclass('work_record_num_seq'), m.n)
+        FROM (SELECT MAX(substring(workRecordNum FROM 3)::BIGINT) AS n FROM WorkRecord
+              WHERE workRecordNum ~ '^WR[0-9]+$') m
+        WHERE m.n > COALESCE((SELECT last_value FROM pg_sequences WHERE sequencename = 'work_record_num_seq'), 0);
+    """],
+)
+
+# Import order: every table only refers to tables imported before it
+IMPORT_TABLES = [CLIENTS, PROPERTIES, SERVICES, WORK_RECORDS]
+
+
+# Read the CSV header and return the staging columns in file order
+def read_header(table, f):
+    header = next(csv.reader([f.readline()]), [])
+    known = {name.lower(): name for name in table.column_names()}
+    columns = []
+    for title in header:
+        name = known.get(title.strip().lower())
+        if name is None:
+            raise BulkImportError(f"{table.name}: unknown column '{title.strip()}'.")
+        columns.append(name)
+    missing = [column for column, _, required in table.columns if required and column not in columns]
+    if missing:
+        raise BulkImportError(f"{table.name}: missing required column(s) {', '.join(missing)}.")
+    return columns
+
+
+# COPY one CSV file into a fresh staging table; returns the number of rows loaded
+def load_staging(cur, table, path):
+    columns = ", ".join(f"{column} TEXT" for column in table.column_names())
+    cur.execute(f"CREATE TEMP TABLE {table.staging} (rowNum BIGSERIAL, {columns}, reason TEXT) ON COMMIT DROP;")
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        file_columns = read_header(table, f)
+        cur.copy_expert(f"COPY {table.staging} ({', '.join(file_columns)}) FROM STDIN WITH (FORMAT csv);", f)
+    cur.execute(f"SELECT count(*) FROM {table.staging};")
+    return cur.fetchone()[0]
+
+
+# Mark every invalid staged row with the first reason it fails, in one pass over the table
+def validate_staging(cur, table):
+    # Blank values count as missing
+    cur.execute(f"UPDATE {table.staging} SET "
+                + ", ".join(f"{column} = NULLIF(trim({column}), '')" for column in table.column_names()) + ";")
+
+    cases = []
+    for column, max_length, required in table.columns:
+        if required:
+            cases.append((f"{column} is required", f"s.{column} IS NULL"))
+        if max_length:
+            cases.append((f"{column} is longer than {max_length} characters", f"length(s.{column}) > {max_length}"))
+    cases.extend(table.checks)
+
+    # CASE stops at the first matching check, so later checks (e.g. casts) only see values that passed earlier ones
+    params = [reason for reason, _ in cases]
+    case_sql = " ".join(f"WHEN {condition} THEN %s" for _, condition in cases)
+    cur.execute(f"UPDATE {table.staging} s SET reason = CASE {case_sql} END;", params)
+
+    # Repeated keys within the file: the first valid row wins
+    for unique in table.unique:
+        if isinstance(unique, str):
+            unique = (unique, "TRUE", f"duplicate {unique} in file")
+        column, condition, reason = unique
+        cur.execute(f"""
+            UPDATE {table.staging} s
+            SET reason = %s
+            FROM (
+                SELECT rowNum, row_number() OVER (PARTITION BY {column} ORDER BY rowNum) AS occurrence
+                FROM {table.staging}
+                WHERE reason IS NULL AND {column} IS NOT NULL AND {condition}
+            ) d
+            WHERE d.rowNum = s.rowNum AND d.occurrence > 1;
+        """, (reason,))
+
+    # Temporary tables are never auto-analyzed; give the merge joins real row counts
+    cur.execute(f"ANALYZE {table.staging};")
+
+
+# Merge accepted rows into the real tables; returns (merged, rejected rows as (row, reason))
+def merge_staging(cur, table):
+    for sql in table.prepare:
+        cur.execute(sql)
+    merged = None
+    for sql in table.merge:
+        cur.execute(sql)
+        if merged is None:
+            merged = cur.rowcount
+    cur.execute(f"SELECT rowNum, reason FROM {table.staging} WHERE reason IS NOT NULL ORDER BY rowNum;")
+    return merged, cur.fetchall()
+
+
+# Import the given files ({table name: path}) in one transaction
+# Returns a list of (table name, path, loaded, merged, rejects); nothing is committed when dry_run is set
+def import_files(conn, files, dry_run=False):
+    results = []
+    try:
+        with conn.cursor() as cur:
+            for table in IMPORT_TABLES:
+                path = files.get(table.name)
+                if not path:
+                    continue
+                loaded = load_staging(cur, table, path)
+                validate_staging(cur, table)
+                merged, rejects = merge_staging(cur, table)
+                results.append((table.name, path, loaded, merged, rejects))
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return results
+
+
+def write_rejects(results, out):
+    writer = csv.writer(out)
+    writer.writerow(["file", "row", "reason"])
+    for _, path, _, _, rejects in results:
+        for row, reason in rejects:
+            writer.writerow([path, row, reason])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import LandscapingDB data from CSV files.")
+    parser.add_argument("--clients", metavar="CSV", help="Clients file.")
+    parser.add_argument("--properties", metavar="CSV", help="Properties file.")
+    parser.add_argument("--services", metavar="CSV", help="Recurring services (with their property) file.")
+    parser.add_argument("--work-records", metavar="CSV", help="Work records file.")
+    parser.add_argument("--rejects", metavar="CSV",
+                        help="Write rejected rows (file, row, reason) here instead of standard output.")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report, then roll everything back.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = {"clients": args.clients, "properties": args.properties,
+             "services": args.services, "work_records": args.work_records}
+    if not any(files.values()):
+        print("Nothing to import: give at least one of --clients, --properties, --services, --work-records.")
+        return 1
+
+    try:
+        dbPool = ConnectionPool(DB_CONFIG)
+    except psycopg2.Error as e:
+        print("Error connecting to database:", e)
+        return 1
+
+    try:
+        with dbPool.connection() as conn:
+            results = import_files(conn, files, args.dry_run)
+    except (BulkImportError, OSError) as e:
+        print("Import error:", e)
+        return 1
+    except psycopg2.Error as e:
+        print("Import failed, nothing was imported:", str(e).strip())
+        return 1
+    finally:
+        dbPool.closeall()
+
+    for name, path, loaded, merged, rejects in results:
+        print(f"{name}: {loaded} rows in {path}, {merged} merged, {len(rejects)} rejected", file=sys.stderr)
+    if args.dry_run:
+        print("Dry run: nothing was committed.", file=sys.stderr)
+
+    if args.rejects:
+        with open(args.rejects, "w", encoding="utf-8", newline="") as out:
+            write_rejects(results, out)
+    elif any(rejects for *_, rejects in results):
+        write_rejects(results, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# client_cache.py
+
+import select
+import sys
+import threading
+from collections import OrderedDict
+
+import psycopg2
+
+# ---------------------------
+# ClientCache
+# Bounded LRU cache of client rows keyed by accountNumber, used by RetrieveClientAPI.
+#
+# Migration 0003 adds triggers that NOTIFY client_changed with the account number of every
+# updated or deleted client ('*' for large statements). Each cache runs a listener thread on
+# its own connection that LISTENs on that channel and evicts the named rows, so changes made
+# by any process become visible as soon as they commit. The cache only serves rows while the
+# listener is connected: on a lost connection it empties itself and bypasses until LISTEN is
+# re-established, because notifications sent in between are gone.
+# ---------------------------
+
+# Number of clients kept per process
+CLIENT_CACHE_SIZE = 1024
+
+# Channel and trigger created by migrations/0003_client_change_notify.sql
+NOTIFY_CHANNEL = "client_changed"
+NOTIFY_TRIGGER = "client_notify_update"
+
+# Seconds the listener waits for a notification before checking whether it should stop
+POLL_INTERVAL = 1.0
+
+
+class ClientCache:
+    def __init__(self, pool, capacity=CLIENT_CACHE_SIZE):
+        self.pool = pool
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()  # accountNumber -> row, least recently used first
+        self._generation = 0        # bumped by every invalidation
+        self._listening = False
+        self._disabled = False
+        self._thread = None
+        self._stop = threading.Event()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    # Read before querying the database and pass to put(): a row read while an invalidation
+    # arrived may already be stale, so it is not cached
+    @property
+    def generation(self):
+        return self._generation
+
+    # The cached row, or None on a miss (including while the listener is not connected)
+    def get(self, account_number):
+        self._start()
+        with self._lock:
+            row = self._rows.get(account_number) if self._listening else None
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(account_number)
+            self.hits += 1
+            return row
+
+    def put(self, account_number, row, generation):
+        with self._lock:
+            if not self._listening or generation != self._generation:
+                return
+            self._rows[account_number] = row
+            self._rows.move_to_end(account_number)
+            if len(self._rows) > self.capacity:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+
+    # Drop one client, or every client when account_number is None
+    def invalidate(self, account_number=None):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if account_number is None:
+                self._rows.clear()
+            else:
+                self._rows.pop(account_number, None)
+
+    # Counters for monitoring (HTTP service: GET /stats)
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._rows), "capacity": self.capacity, "listening": self._listening,
+                    "hits": self.hits, "misses": self.misses,
+                    "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
+
+    # Stop the listener thread and empty the cache
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # The listener starts on first use, so tools that never retrieve clients open no extra connection
+    def _start(self):
+        if self._thread is not None or self._disabled:
+            return
+        with self._lock:
+            if self._thread is None and not self._disabled:
+                self._thread = threading.Thread(target=self._listen, name="client-cache-listener", daemon=True)
+                self._thread.start()
+
+    def _set_listening(self, listening):
+        with self._lock:
+            self._listening = listening
+            self._generation += 1
+            self._rows.clear()
+
+    # Listener thread: keep a LISTEN connection open, reconnecting with backoff
+    def _listen(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                conn = psycopg2.connect(**self.pool.connect_kwargs)
+            except psycopg2.Error:
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            try:
+                conn.autocommit = True
+                cur = conn.cursor()
+                try:
+                    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s;", (NOTIFY_TRIGGER,))
+                    if cur.fetchone() is None:
+                        # Without the trigger nothing would ever evict a changed client
+                        print("Client cache disabled: run migrate.py to add the client change triggers.",
+                              file=sys.stderr)
+                        self._disabled = True
+                        return
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+                finally:
+                    cur.close()
+                self._set_listening(True)
+                backoff = 1
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], POLL_INTERVAL) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        payload = conn.notifies.pop(0).payload
+                        self.invalidate(None if payload == "*" else payload)
+            except (psycopg2.Error, OSError):
+                pass
+            finally:
+                self._set_listening(False)
+                conn.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# The cache shared by every endpoint using this pool (one per pool, so one listener per process)
+def for_pool(pool):
+    with _caches_lock:
+        cache = _caches.get(id(pool))
+        if cache is None:
+            cache = _caches[id(pool)] = ClientCache(pool)
+        return cache
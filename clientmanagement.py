@@ -1,36 +1,40 @@
 # clientmanagement.py
 
-from api_endpoint import APIEndpoint
+import csv
+import io
+
+from api_endpoint import (APIEndpoint, APIError, APIResult, decode_page_token, optional_text, parse_bool,
+                          parse_limit)
+import client_cache
+import statements
+
+# Columns returned by every client statement, in row order
+CLIENT_COLUMNS = ["accountNumber", "firstName", "lastName", "phoneNumber", "email", "activeStatus"]
 
 # ---------------------------
 # UpdateClientAPI using prepared statement inline
 # ---------------------------
 class UpdateClientAPI(APIEndpoint):
+    name = "UpdateClient"
+
     # Initialize Class Instance
-    def __init__(self, conn):
-        self.conn = conn
-        # Prepare the SQL statement for updating clients
-        cur = self.conn.cursor()
-        try:
-            cur.execute("""
-                PREPARE update_client(text, text, text, text, text, boolean) AS
+    def __init__(self, pool):
+        self.pool = pool
+        self.cache = client_cache.for_pool(pool)
+        # Register the SQL statement for updating clients
+        # It is prepared lazily the first time each connection executes it
+        statements.register("update_client", ("text", "text", "text", "text", "text", "boolean"), """
                 UPDATE Client
-                SET 
+                SET
                     firstName = COALESCE($2, firstName),
                     lastName = COALESCE($3, lastName),
                     phoneNumber = COALESCE($4, phoneNumber),
                     email = COALESCE($5, email),
                     activeStatus = COALESCE($6, activeStatus)
-                WHERE 
+                WHERE
                     accountNumber = $1
                 RETURNING accountNumber, firstName, lastName, phoneNumber, email, activeStatus;
             """)
-            self.conn.commit() # Commit the prepare command
-        except Exception:
-            self.conn.rollback()
-            print("Error preparing update_client statement.")
-        finally:
-            cur.close()
 
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
@@ -50,94 +54,252 @@ class UpdateClientAPI(APIEndpoint):
         print("\tExample: accountNumber = C0001, firstName = John, lastName = Smith")
         print("-------------------------\n")
 
+    # Updates one client; blank/missing fields keep their current value
+    # params: accountNumber (required), firstName, lastName, phoneNumber, email, activeStatus
+    def run(self, params: dict, conn=None) -> APIResult:
+        accountNumber = optional_text(params.get("accountNumber"))
+        if not accountNumber:
+            raise APIError("Account number is required.")
+        activeStatus = parse_bool(params.get("activeStatus"), "Active status")
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement with parameters
+                statements.execute(cur, "update_client",
+                           (accountNumber,
+                            optional_text(params.get("firstName")),
+                            optional_text(params.get("lastName")),
+                            optional_text(params.get("phoneNumber")),
+                            optional_text(params.get("email")),
+                            activeStatus))
+                result = cur.fetchone()
+            finally:
+                cur.close()
+
+            if not result:
+                raise APIError(f"Client with account number {accountNumber} not found.")
+
+        # Other processes are told by the trigger's NOTIFY; evicting here as well means this
+        # process reads its own update even before the notification arrives
+        self.cache.invalidate(accountNumber)
+        return APIResult(CLIENT_COLUMNS, [result], "Client updated successfully!")
+
     # Function for executing API and collecting user input
     def execute(self):
         accountNumber = input("Enter client's account number: ").strip()
-        
+
         if not accountNumber:
             print("Error: Account number is required.")
             return
-            
+
         print("Enter the fields you want to update (leave blank to keep current value):")
-        firstName = input("Enter client's first name: ").strip()
-        lastName = input("Enter client's last name: ").strip()
-        phoneNumber = input("Enter client's phone number: ").strip()
-        email = input("Enter client's email: ").strip()
-        activeStatus_input = input("Enter client's active status (true/false): ").strip().lower()
-        
-        activeStatus = None
-        if activeStatus_input:
-            if activeStatus_input not in ["true", "false"]:
-                print("Error: Active status must be 'true' or 'false'.")
-                return
-            activeStatus = True if activeStatus_input == "true" else False
-
-        cur = self.conn.cursor()
+        params = {
+            "accountNumber": accountNumber,
+            "firstName": input("Enter client's first name: ").strip(),
+            "lastName": input("Enter client's last name: ").strip(),
+            "phoneNumber": input("Enter client's phone number: ").strip(),
+            "email": input("Enter client's email: ").strip(),
+            "activeStatus": input("Enter client's active status (true/false): ").strip().lower(),
+        }
+
         try:
-            cur.execute("BEGIN;")
-            
-            # Execute the prepared statement with parameters
-            cur.execute("EXECUTE update_client(%s, %s, %s, %s, %s, %s);", 
-                       (accountNumber, 
-                        firstName if firstName else None, 
-                        lastName if lastName else None, 
-                        phoneNumber if phoneNumber else None, 
-                        email if email else None, 
-                        activeStatus))
-            
-            result = cur.fetchone()
-            
-            if result:
-                self.conn.commit()
-                # Display Results
-                print("\nClient updated successfully!")
-                print(f"Account Number: {result[0]}")
-                print(f"First Name: {result[1]}")
-                print(f"Last Name: {result[2]}")
-                print(f"Phone Number: {result[3]}")
-                print(f"Email: {result[4]}")
-                print(f"Active Status: {result[5]}")
-            else:
-                self.conn.rollback()
-                print(f"Error: Client with account number {accountNumber} not found.")
-                
+            result = self.run(params)
+        except APIError as e:
+            print(f"Error: {e}")
+            return
         except Exception:
-            self.conn.rollback()
             print("Error updating client. Please try again.")
-        finally:
-            cur.close()
+            return
+
+        # Display Results
+        row = result.rows[0]
+        print(f"\n{result.message}")
+        print(f"Account Number: {row[0]}")
+        print(f"First Name: {row[1]}")
+        print(f"Last Name: {row[2]}")
+        print(f"Phone Number: {row[3]}")
+        print(f"Email: {row[4]}")
+        print(f"Active Status: {row[5]}")
+
+
+# ---------------------------
+# BatchUpdateClientsAPI: many client updates in one set-based UPDATE
+# ---------------------------
+class BatchUpdateClientsAPI(APIEndpoint):
+    name = "BatchUpdateClients"
+
+    # Fields that can be updated, in the column order of the temp table
+    UPDATE_FIELDS = ["firstName", "lastName", "phoneNumber", "email", "activeStatus"]
+
+    # Initialize Class Instance
+    # The statements below read a per-session temp table, which cannot be PREPAREd ahead of it,
+    # so they are sent as plain queries (three round trips per call, whatever the number of rows)
+    def __init__(self, pool):
+        self.pool = pool
+        self.cache = client_cache.for_pool(pool)
+
+    # Displays brief description of API for API Listing Page
+    def display_brief(self, index):
+        print(f"{index}. BatchUpdateClients - Applies many client updates from a CSV file at once.")
+
+    # Displays details of API and its use
+    def display_details(self):
+        print("\n--- BatchUpdateClients ---")
+        print("Description: Updates many clients in one statement, e.g. a nightly sync of CRM contact changes.")
+        print("Fields left empty keep their current value, as in UpdateClient.")
+        print("Parameters:")
+        print("\t- clients (list): One object per client with accountNumber (required) and any of")
+        print("\t  firstName, lastName, phoneNumber, email, activeStatus")
+        print("\tFrom the menu, the clients are read from a CSV file with those column names as its header.")
+        print("\tReturns: the updated clients, plus a row with updated = false for each account number not found")
+        print("\tExample CSV:")
+        print("\t\taccountNumber,phoneNumber,email")
+        print("\t\tC0001,5551234,")
+        print("-------------------------\n")
+
+    # Applies every update with one COPY into a temp table and one UPDATE ... FROM
+    # params: clients (list of {accountNumber, firstName, lastName, phoneNumber, email, activeStatus})
+    # Several entries for the same account are merged in order, later non-empty fields winning.
+    def run(self, params: dict, conn=None) -> APIResult:
+        updates = self._merge_updates(params.get("clients"))
+
+        # Rows for COPY (FORMAT csv): an empty unquoted field is NULL, which COALESCE keeps as the current value
+        data = io.StringIO()
+        writer = csv.writer(data, lineterminator="\n")
+        for accountNumber, fields in updates.items():
+            active = fields["activeStatus"]
+            writer.writerow([accountNumber, *(fields[field] for field in self.UPDATE_FIELDS[:-1]),
+                             "" if active is None else str(active).lower()])
+        data.seek(0)
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # The temp table lives as long as the session and is emptied by every commit
+                cur.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS client_updates (
+                        accountNumber   TEXT PRIMARY KEY,
+                        firstName       TEXT,
+                        lastName        TEXT,
+                        phoneNumber     TEXT,
+                        email           TEXT,
+                        activeStatus    BOOLEAN
+                    ) ON COMMIT DELETE ROWS;
+                    TRUNCATE client_updates;
+                """)
+                cur.copy_expert("COPY client_updates (accountNumber, firstName, lastName, phoneNumber, email, "
+                                "activeStatus) FROM STDIN WITH (FORMAT csv);", data)
+                # Same COALESCE semantics as update_client; unknown account numbers come back with updated = false
+                cur.execute("""
+                    WITH updated AS (
+                        UPDATE Client c
+                        SET
+                            firstName = COALESCE(u.firstName, c.firstName),
+                            lastName = COALESCE(u.lastName, c.lastName),
+                            phoneNumber = COALESCE(u.phoneNumber, c.phoneNumber),
+                            email = COALESCE(u.email, c.email),
+                            activeStatus = COALESCE(u.activeStatus, c.activeStatus)
+                        FROM client_updates u
+                        WHERE c.accountNumber = u.accountNumber
+                        RETURNING c.accountNumber, c.firstName, c.lastName, c.phoneNumber, c.email, c.activeStatus
+                    )
+                    SELECT accountNumber, firstName, lastName, phoneNumber, email, activeStatus, TRUE
+                    FROM updated
+                    UNION ALL
+                    SELECT u.accountNumber, NULL, NULL, NULL, NULL, NULL, FALSE
+                    FROM client_updates u
+                    WHERE NOT EXISTS (SELECT 1 FROM Client c WHERE c.accountNumber = u.accountNumber)
+                    ORDER BY 1;
+                """)
+                results = cur.fetchall()
+            finally:
+                cur.close()
+
+        # The Client trigger notifies other processes; evict here too so this process reads its own writes
+        updated = [row for row in results if row[6]]
+        for row in updated:
+            self.cache.invalidate(row[0])
+        missing = [row[0] for row in results if not row[6]]
+        message = f"{len(updated)} client(s) updated."
+        if missing:
+            shown = ", ".join(missing[:10]) + (f" and {len(missing) - 10} more" if len(missing) > 10 else "")
+            message += f" Not found: {shown}."
+        return APIResult(CLIENT_COLUMNS + ["updated"], results, message)
+
+    # Validate the update list and merge entries for the same account: {accountNumber: {field: value}}
+    def _merge_updates(self, clients):
+        if not isinstance(clients, (list, tuple)) or not clients:
+            raise APIError("clients must be a non-empty list of client updates.")
+        updates = {}
+        for number, client in enumerate(clients, start=1):
+            if not isinstance(client, dict):
+                raise APIError(f"Client update {number} must be an object.")
+            accountNumber = optional_text(client.get("accountNumber"))
+            if not accountNumber:
+                raise APIError(f"Client update {number}: account number is required.")
+            fields = updates.setdefault(accountNumber, dict.fromkeys(self.UPDATE_FIELDS))
+            for field in self.UPDATE_FIELDS[:-1]:
+                value = optional_text(client.get(field))
+                if value is not None:
+                    fields[field] = value
+            active = parse_bool(client.get("activeStatus"), f"Client update {number}: active status")
+            if active is not None:
+                fields["activeStatus"] = active
+        return updates
+
+    # Function for executing API and collecting user input
+    def execute(self):
+        path = input("Enter the path of the CSV file of client updates: ").strip()
+        if not path:
+            print("Error: A file is required.")
+            return
+
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                clients = list(csv.DictReader(f))
+        except OSError as e:
+            print("Error reading file:", e)
+            return
+
+        try:
+            result = self.run({"clients": clients})
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except Exception:
+            print("Error updating clients. Please try again.")
+            return
+
+        print(f"\n{result.message}")
 
 
 # ---------------------------
 # RetrieveClientAPI using prepared statement inline
 # ---------------------------
 class RetrieveClientAPI(APIEndpoint):
+    name = "RetrieveClient"
+
     # Initialize Class Instance
-    def __init__(self, conn):
-        self.conn = conn
-        # Prepare the SQL statement for retrieving clients
-        cur = self.conn.cursor()
-        try:
-            cur.execute("""
-                PREPARE retrieve_client(text) AS
-                SELECT 
-                    accountNumber, 
-                    firstName, 
-                    lastName, 
-                    phoneNumber, 
-                    email, 
+    def __init__(self, pool):
+        self.pool = pool
+        # Recently retrieved clients, evicted on change through LISTEN/NOTIFY (client_cache.py)
+        self.cache = client_cache.for_pool(pool)
+        # Register the SQL statement for retrieving clients
+        # It is prepared lazily the first time each connection executes it
+        statements.register("retrieve_client", ("text",), """
+                SELECT
+                    accountNumber,
+                    firstName,
+                    lastName,
+                    phoneNumber,
+                    email,
                     activeStatus
-                FROM 
+                FROM
                     Client
-                WHERE 
+                WHERE
                     accountNumber = $1;
             """)
-            self.conn.commit() 
-        except Exception:
-            self.conn.rollback()
-            print("Error preparing retrieve_client statement.")
-        finally:
-            cur.close()
 
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
@@ -152,71 +314,111 @@ class RetrieveClientAPI(APIEndpoint):
         print("\tExample: accountNumber = C0001")
         print("-------------------------\n")
 
+    # Retrieves one client by account number, from the client cache when possible
+    # params: accountNumber (required)
+    # A caller's transaction may hold uncommitted client changes, so run(params, conn) always reads the database
+    def run(self, params: dict, conn=None) -> APIResult:
+        accountNumber = optional_text(params.get("accountNumber"))
+        if not accountNumber:
+            raise APIError("Account number is required.")
+
+        use_cache = conn is None
+        if use_cache:
+            generation = self.cache.generation
+            result = self.cache.get(accountNumber)
+            if result is not None:
+                return APIResult(CLIENT_COLUMNS, [result])
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement with parameters
+                statements.execute(cur, "retrieve_client", (accountNumber,))
+                result = cur.fetchone()
+            finally:
+                cur.close()
+
+        if not result:
+            raise APIError(f"Client with account number {accountNumber} not found.")
+        if use_cache:
+            self.cache.put(accountNumber, result, generation)
+        return APIResult(CLIENT_COLUMNS, [result])
+
     # Function for executing API and collecting user input
     def execute(self):
         accountNumber = input("Enter client's account number: ").strip()
-        
+
         if not accountNumber:
             print("Error: Account number is required.")
             return
 
-        cur = self.conn.cursor()
         try:
-            # Execute the prepared statement with parameters
-            cur.execute("EXECUTE retrieve_client(%s);", (accountNumber,))
-            
-            result = cur.fetchone()
-            
-            if result:
-                # Display Results
-                print("\nClient Details:")
-                print(f"Account Number: {result[0]}")
-                print(f"First Name: {result[1]}")
-                print(f"Last Name: {result[2]}")
-                print(f"Phone Number: {result[3]}")
-                print(f"Email: {result[4] or 'N/A'}")
-                print(f"Active Status: {result[5]}")
-            else:
-                print(f"Error: Client with account number {accountNumber} not found.")
-                
+            result = self.run({"accountNumber": accountNumber})
+        except APIError as e:
+            print(f"Error: {e}")
+            return
         except Exception:
             print("Error retrieving client. Please try again.")
-        finally:
-            cur.close()
+            return
+
+        # Display Results
+        row = result.rows[0]
+        print("\nClient Details:")
+        print(f"Account Number: {row[0]}")
+        print(f"First Name: {row[1]}")
+        print(f"Last Name: {row[2]}")
+        print(f"Phone Number: {row[3]}")
+        print(f"Email: {row[4] or 'N/A'}")
+        print(f"Active Status: {row[5]}")
 
 
 # ---------------------------
 # ListClientsAPI using prepared statement inline
 # ---------------------------
 class ListClientsAPI(APIEndpoint):
+    name = "ListClients"
+
     # Initialize Class Instance
-    def __init__(self, conn):
-        self.conn = conn
-        # Prepare the SQL statement for listing clients
-        cur = self.conn.cursor()
-        try:
-            cur.execute("""
-                PREPARE list_clients(boolean) AS
-                SELECT 
-                    accountNumber, 
-                    firstName, 
-                    lastName, 
-                    phoneNumber, 
-                    email, 
+    def __init__(self, pool):
+        self.pool = pool
+        # Register the SQL statements for listing clients
+        # Both are prepared lazily the first time each connection executes them
+        # The first page (or the whole list when $2 is NULL) starts at the beginning of the name order
+        statements.register("list_clients", ("boolean", "integer"), """
+                SELECT
+                    accountNumber,
+                    firstName,
+                    lastName,
+                    phoneNumber,
+                    email,
                     activeStatus
-                FROM 
+                FROM
                     Client
-                WHERE 
+                WHERE
                     ($1 IS NULL OR activeStatus = $1)
-                ORDER BY 
-                    lastName, firstName;
+                ORDER BY
+                    lastName, firstName, accountNumber
+                LIMIT $2;
+            """)
+        # Later pages seek past the last (lastName, firstName, accountNumber) returned,
+        # so page N reads from the index like page 1 instead of skipping N pages of rows
+        statements.register("list_clients_after", ("boolean", "text", "text", "text", "integer"), """
+                SELECT
+                    accountNumber,
+                    firstName,
+                    lastName,
+                    phoneNumber,
+                    email,
+                    activeStatus
+                FROM
+                    Client
+                WHERE
+                    ($1 IS NULL OR activeStatus = $1)
+                    AND (lastName, firstName, accountNumber) > ($2, $3, $4)
+                ORDER BY
+                    lastName, firstName, accountNumber
+                LIMIT $5;
             """)
-            self.conn.commit() 
-        except Exception:
-            self.conn.rollback()
-            print("Error preparing list_clients statement.")
-        finally:
-            cur.close()
 
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
@@ -231,47 +433,80 @@ class ListClientsAPI(APIEndpoint):
         print("\tExample: activeStatus = true (to show only active clients)")
         print("-------------------------\n")
 
+    # Lists clients ordered by name, optionally one page at a time
+    # params: activeStatus, limit, pageToken (all optional)
+    # Without a limit every client is returned; with one, result.next_token fetches the next page
+    def run(self, params: dict, conn=None) -> APIResult:
+        activeStatus = parse_bool(params.get("activeStatus"), "Active status")
+        limit = parse_limit(params.get("limit"))
+        after = decode_page_token(params.get("pageToken"), self.name, 3)
+        if after is not None and limit is None:
+            raise APIError("A limit is required with a page token.")
+        # One extra row tells whether another page follows
+        fetch = limit + 1 if limit is not None else None
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement with parameters
+                if after is None:
+                    statements.execute(cur, "list_clients", (activeStatus, fetch))
+                else:
+                    statements.execute(cur, "list_clients_after", (activeStatus, *after, fetch))
+                results = cur.fetchall()
+            finally:
+                cur.close()
+
+        if limit is None:
+            return APIResult(CLIENT_COLUMNS, results)
+        return self.page_result(CLIENT_COLUMNS, results, limit, lambda row: (row[2], row[1], row[0]))
+
+    # The full client list for the given filters, used by stream() and export()
+    # params: activeStatus (optional)
+    def list_query(self, params: dict):
+        activeStatus = parse_bool(params.get("activeStatus"), "Active status")
+        return "list_clients", (activeStatus, None), CLIENT_COLUMNS
+
+    # Yields clients one row at a time through a server-side cursor (memory stays constant)
+    # params: activeStatus (optional)
+    def stream(self, params: dict, conn=None):
+        name, args, _ = self.list_query(params)
+        return self.stream_statement(name, args, conn)
+
     # Function for executing API and collecting user input
     def execute(self):
         activeStatus_input = input("Enter active status filter (true/false or leave empty for all): ").strip().lower()
-        
-        # Process activeStatus input
-        activeStatus = None
-        if activeStatus_input:
-            if activeStatus_input not in ["true", "false"]:
-                print("Error: Active status must be 'true' or 'false'.")
-                return
-            activeStatus = True if activeStatus_input == "true" else False
-
-        cur = self.conn.cursor()
+
+        try:
+            rows = self.stream({"activeStatus": activeStatus_input})
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+
+        # Display Results as they arrive from the server
+        count = 0
         try:
-            # Execute the prepared statement with parameters
-            cur.execute("EXECUTE list_clients(%s);", (activeStatus,))
-            
-            results = cur.fetchall()
-            
-            if results:
-                # Display Results
-                print("\nClient List:")
-                print("--------------------------------------------------------------")
-                print(f"{'Account Number':<15} {'Name':<30} {'Phone':<15} {'Email':<30} {'Active':<6}")
-                print("--------------------------------------------------------------")
-                
-                for row in results:
-                    account_num = row[0]
-                    name = f"{row[1]} {row[2]}"
-                    phone = row[3]
-                    email = row[4] or "N/A"
-                    active = "Yes" if row[5] else "No"
-                    
-                    print(f"{account_num:<15} {name:<30} {phone:<15} {email:<30} {active:<6}")
-                
-                print("--------------------------------------------------------------")
-                print(f"Total clients: {len(results)}")
-            else:
-                print("No clients found with the specified criteria.")
-                
+            for row in rows:
+                if count == 0:
+                    print("\nClient List:")
+                    print("--------------------------------------------------------------")
+                    print(f"{'Account Number':<15} {'Name':<30} {'Phone':<15} {'Email':<30} {'Active':<6}")
+                    print("--------------------------------------------------------------")
+
+                account_num = row[0]
+                name = f"{row[1]} {row[2]}"
+                phone = row[3]
+                email = row[4] or "N/A"
+                active = "Yes" if row[5] else "No"
+
+                print(f"{account_num:<15} {name:<30} {phone:<15} {email:<30} {active:<6}")
+                count += 1
         except Exception:
             print("Error listing clients. Please try again.")
-        finally:
-            cur.close()
+            return
+
+        if count:
+            print("--------------------------------------------------------------")
+            print(f"Total clients: {count}")
+        else:
+            print("No clients found with the specified criteria.")
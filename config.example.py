@@ -8,4 +8,7 @@
 #    "dbname": "landscapedb",
 #    "user": "postgres",
 #    "password": "**PASSWORD**",  # Replace with your actual password on your own local file "config.py"
+#    "minconn": 1,                # Connections the pool opens at startup
+#    "maxconn": 10,               # Upper bound on concurrent connections shared by all APIs
+#    "trace": True,               # Time every query for the driver's query statistics (tracing.py)
 #}
@@ -0,0 +1,468 @@
+# datagen.py
+
+import argparse
+import datetime
+import itertools
+import random
+import sys
+import time
+
+import psycopg2
+
+from config import DB_CONFIG
+from db_pool import ConnectionPool
+
+
+# ---------------------------
+# Synthetic data generator for performance testing
+#
+# Fills the business tables (Employee, Client, Property, RecurringService,
+# RecurringServiceList, WorkRecord, Invoice) with realistic, internally consistent data
+# sized by the number of work records, from 10 thousand to 50 million. The same seed and size
+# always produce the same rows. Every other table is derived from the work record count with
+# the ratios below, every foreign key points at a generated row, and every code comes from
+# the seeded lookup tables.
+#
+# Rows are rendered lazily and streamed into COPY, so memory does not grow with the size.
+# Work records are generated day by day in start time order, as a live system would insert
+# them, and each service is visited on its own weekly/biweekly/monthly/quarterly schedule.
+# The work record rollup triggers are disabled during the load and the rollup is rebuilt
+# once at the end. Invoices (one per client and complete month) are derived from the loaded
+# work records with a single INSERT ... SELECT.
+#
+#   python3 datagen.py --work-records 1000000 [--seed 475] [--end-date 2025-06-30] [--truncate]
+#
+# The target tables must be empty; --truncate empties them first (this deletes the sample data).
+# ---------------------------
+
+# Sizes derived from the work record count
+WORK_RECORDS_PER_SERVICE = 50
+EMPLOYEES_PER_WORK_RECORD = 1 / 5000
+MIN_EMPLOYEES = 10
+MIN_SERVICES = 20
+
+# Largest invoice number that fits invoiceNumber VARCHAR(10) as INVnnnnnnn
+MAX_INVOICES = 9_999_999
+
+# Rows rendered per chunk handed to COPY
+COPY_CHUNK_ROWS = 5000
+
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William",
+               "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah",
+               "Charles", "Karen", "Daniel", "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Sandra",
+               "Steven", "Ashley", "Paul", "Emily", "Andrew", "Donna", "Joshua", "Michelle", "Kevin", "Carol",
+               "Brian", "Amanda", "Minh", "Hyobin", "Kat", "Sofia", "Mateo", "Aiko", "Priya", "Omar"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+              "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore",
+              "Jackson", "Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez",
+              "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen",
+              "Hill", "Flores", "Tran", "Yook", "Kim", "Patel", "Chen", "Olsen", "Larsen", "Kowalski"]
+STREETS = ["Maple", "Oak", "Pine", "Cedar", "Elm", "Birch", "Alder", "Spruce", "Willow", "Aspen", "Madrona",
+           "Hemlock", "Juniper", "Lake", "Hill", "Park", "Forest", "Meadow", "River", "Sunset", "Harbor",
+           "Mountain", "Valley", "Ridge", "Orchard", "Garden", "Cascade", "Rainier", "Olympic", "Evergreen"]
+STREET_SUFFIXES = ["St", "Ave", "Rd", "Dr", "Ln", "Way", "Pl", "Ct", "Blvd"]
+# (city, state, zip codes), weighted toward the Puget Sound service area
+CITIES = [
+    ("Seattle", "WA", ["98101", "98103", "98105", "98109", "98115", "98117", "98122", "98125"]),
+    ("Everett", "WA", ["98201", "98203", "98204", "98208"]),
+    ("Bothell", "WA", ["98011", "98012", "98021"]),
+    ("Mill Creek", "WA", ["98012"]),
+    ("Lynnwood", "WA", ["98036", "98037", "98087"]),
+    ("Bellevue", "WA", ["98004", "98005", "98006", "98007", "98008"]),
+    ("Redmond", "WA", ["98052", "98053"]),
+    ("Kirkland", "WA", ["98033", "98034"]),
+    ("Renton", "WA", ["98055", "98056", "98057", "98058", "98059"]),
+    ("Tacoma", "WA", ["98402", "98403", "98405", "98406", "98407"]),
+    ("Olympia", "WA", ["98501", "98502", "98506"]),
+    ("Spokane", "WA", ["99201", "99203", "99205"]),
+    ("Portland", "OR", ["97201", "97202", "97205", "97209"]),
+    ("Vancouver", "WA", ["98660", "98661", "98662", "98664"]),
+    ("Coeur d'Alene", "ID", ["83814", "83815"]),
+]
+CITY_WEIGHTS = [20, 10, 6, 4, 6, 8, 6, 6, 6, 8, 4, 3, 5, 5, 2]
+
+PROPERTY_TYPES = (["R", "C", "I"], [80, 15, 5])
+# Price and hours multiplier per property type
+PROPERTY_SCALE = {"R": 1.0, "C": 2.0, "I": 3.0}
+
+# (service type, name, minutes, price) templates; weights pick the service type
+SERVICE_TEMPLATES = {
+    "L": [("Lawn Mowing", 60, 50), ("Lawn Fertilizing", 45, 40), ("Lawn Aeration", 90, 85)],
+    "F": [("Weed Control", 30, 35), ("Flowerbed Maintenance", 60, 55), ("Mulching", 90, 80)],
+    "T": [("Hedge Trimming", 45, 45), ("Tree Pruning", 120, 150), ("Shrub Shaping", 60, 60)],
+    "S": [("Snow Removal", 60, 75), ("Sidewalk De-icing", 30, 30)],
+    "O": [("Gutter Cleaning", 90, 95), ("Leaf Cleanup", 60, 55), ("Irrigation Check", 45, 50)],
+}
+SERVICE_TYPE_WEIGHTS = (["L", "F", "T", "S", "O"], [45, 20, 15, 8, 12])
+ORDER_STATUSES = (["A", "P", "I"], [85, 10, 5])
+# Frequency code -> days between visits
+FREQUENCY_DAYS = {"W": 7, "B": 14, "M": 30, "Q": 91}
+FREQUENCIES = (["W", "B", "M", "Q"], [40, 30, 25, 5])
+
+BUSINESS_TABLES = ["Invoice", "WorkRecordDailyRollup", "WorkRecord", "RecurringServiceList",
+                   "RecurringService", "Property", "Client", "Employee"]
+ROLLUP_TRIGGERS = ["work_record_rollup_insert", "work_record_rollup_update", "work_record_rollup_delete"]
+
+
+# File-like object that renders rows as COPY text format on demand, for cursor.copy_expert()
+class CopySource:
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = [copy_line(row) for row in itertools.islice(self._rows, COPY_CHUNK_ROWS)]
+            if not chunk:
+                break
+            self.count += len(chunk)
+            self._buffer += "".join(chunk)
+        if size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+# One row in COPY text format; generated values never contain tabs, newlines or backslashes
+def copy_line(values):
+    return "\t".join("\\N" if value is None else ("t" if value else "f") if isinstance(value, bool)
+                     else str(value) for value in values) + "\n"
+
+
+# Row counts for a requested number of work records
+def plan_sizes(work_records):
+    services = max(MIN_SERVICES, work_records // WORK_RECORDS_PER_SERVICE)
+    employees = max(MIN_EMPLOYEES, int(work_records * EMPLOYEES_PER_WORK_RECORD))
+    return {"work_records": work_records, "services": services, "employees": employees}
+
+
+class DataGenerator:
+    def __init__(self, work_records, seed=475, end_date=datetime.date(2025, 6, 30), out=sys.stderr):
+        self.sizes = plan_sizes(work_records)
+        self.rng = random.Random(seed)
+        self.end_date = end_date
+        self.out = out
+        self.started = time.monotonic()
+        # Filled while generating and used by later tables
+        self.employees = []         # (deactivatedDate or None) per employee id - 1
+        self.property_types = []    # propertyTypeID per property id - 1
+        self.service_days = []      # days between visits per service id - 1
+        self.service_minutes = []   # allocated minutes per service id - 1
+
+    def log(self, message):
+        print(f"[{time.monotonic() - self.started:7.1f}s] {message}", file=self.out)
+
+    # Generate and load everything in one transaction
+    def load(self, conn, truncate=False):
+        with conn.cursor() as cur:
+            self.prepare_tables(cur, truncate)
+            # Visits are spread over however many days it takes to reach the requested count
+            self.plan_services()
+            self.start_date = self.end_date - datetime.timedelta(days=self.days_needed())
+
+            self.copy(cur, "Employee", ["id", "firstName", "lastName", "phone", "email", "hireDate",
+                                        "deactivatedDate", "hourlyWage"], self.employee_rows())
+            self.copy(cur, "Client", ["id", "accountNumber", "firstName", "lastName", "phoneNumber", "email",
+                                      "activeStatus"], self.client_rows())
+            self.copy(cur, "Property", ["id", "clientID", "propertyTypeID", "propertyNumber", "streetAddress",
+                                        "streetAddress2", "city", "stateID", "zipcode", "activeStatus"],
+                      self.property_rows())
+            self.copy(cur, "RecurringService", ["id", "serviceNum", "name", "allocatedManHours", "price",
+                                                "serviceTypeID", "orderStatusID"], self.service_rows())
+            self.copy(cur, "RecurringServiceList", ["propertyID", "recurringServiceID", "frequencyTypeID",
+                                                    "activeStatus"], self.service_list_rows())
+
+            for trigger in ROLLUP_TRIGGERS:
+                cur.execute(f"ALTER TABLE WorkRecord DISABLE TRIGGER {trigger};")
+            self.copy(cur, "WorkRecord", ["id", "workRecordNum", "recurringServiceID", "startTime", "endTime",
+                                          "employeeID"], self.work_record_rows())
+            for trigger in ROLLUP_TRIGGERS:
+                cur.execute(f"ALTER TABLE WorkRecord ENABLE TRIGGER {trigger};")
+            cur.execute("SELECT refresh_work_record_rollup();")
+            self.log("Rebuilt WorkRecordDailyRollup")
+            self.set_start_dates(cur)
+
+            self.insert_invoices(cur)
+            self.reset_sequences(cur)
+        conn.commit()
+
+        # Fresh statistics so the planner sees the real sizes immediately
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE;")
+        finally:
+            conn.autocommit = False
+        self.log("Analyzed; done")
+
+    def prepare_tables(self, cur, truncate):
+        if truncate:
+            cur.execute(f"TRUNCATE {', '.join(BUSINESS_TABLES)} RESTART IDENTITY CASCADE;")
+            cur.execute("SELECT setval('employeeNum_seq', 1, false), setval('service_num_seq', 1, false);")
+            return
+        cur.execute(" UNION ALL ".join(f"(SELECT '{table}' FROM {table} LIMIT 1)" for table in BUSINESS_TABLES) + ";")
+        nonempty = [row[0] for row in cur.fetchall()]
+        if nonempty:
+            raise ValueError(f"{', '.join(nonempty)} already contain rows; use --truncate to replace them.")
+
+    def copy(self, cur, table, columns, rows):
+        source = CopySource(rows)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN;", source)
+        self.log(f"Loaded {source.count:,} rows into {table}")
+
+    # Decide every service's property, frequency and length up front; later tables depend on them
+    def plan_services(self):
+        rng = self.rng
+        frequencies, weights = FREQUENCIES
+        self.service_frequency = rng.choices(frequencies, weights, k=self.sizes["services"])
+        self.service_days = [FREQUENCY_DAYS[code] for code in self.service_frequency]
+
+    # Days of visits needed for the planned services to produce the requested work records
+    def days_needed(self):
+        visits_per_day = sum(1 / days for days in self.service_days)
+        return int(self.sizes["work_records"] / visits_per_day) + 1
+
+    def employee_rows(self):
+        rng = self.rng
+        for employee_id in range(1, self.sizes["employees"] + 1):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            hired = self.start_date - datetime.timedelta(days=rng.randint(30, 5 * 365))
+            # One in ten has left, at some point during the generated period
+            deactivated = None
+            if employee_id > MIN_EMPLOYEES // 2 and rng.random() < 0.1:
+                deactivated = self.start_date + datetime.timedelta(
+                    days=rng.randint(1, max(1, (self.end_date - self.start_date).days)))
+            self.employees.append(deactivated)
+            email = f"{first}.{last}.{employee_id}@landscaping.example".lower() if rng.random() < 0.7 else None
+            phone = f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}"
+            yield (employee_id, first[:15], last[:15], phone, email, hired, deactivated,
+                   f"{rng.uniform(22, 40):.2f}")
+        self.active_employees = [i + 1 for i, deactivated in enumerate(self.employees) if deactivated is None]
+
+    # Clients are created until every planned service has a property, 1-3 services per property
+    def client_rows(self):
+        rng = self.rng
+        services = self.sizes["services"]
+        self.property_clients = []
+        self.property_services = []     # services per property
+        planned = client_id = 0
+        while planned < services:
+            client_id += 1
+            roll = rng.random()
+            properties = 1 if roll < 0.75 else 2 if roll < 0.9 else rng.randint(3, 10)
+            for _ in range(properties):
+                count = min(rng.choice((1, 2, 2, 3)), services - planned)
+                if count <= 0:
+                    break
+                self.property_clients.append(client_id)
+                self.property_services.append(count)
+                planned += count
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            email = f"{first}.{last}.{client_id}@example.com".lower() if rng.random() < 0.9 else None
+            yield (client_id, f"C{client_id:04d}", first, last, f"{rng.randint(200, 999)}{rng.randint(0, 9999999):07d}",
+                   email, rng.random() < 0.95)
+
+    def property_rows(self):
+        rng = self.rng
+        types, weights = PROPERTY_TYPES
+        for property_id, client_id in enumerate(self.property_clients, start=1):
+            city, state, zipcodes = rng.choices(CITIES, CITY_WEIGHTS)[0]
+            property_type = rng.choices(types, weights)[0]
+            self.property_types.append(property_type)
+            street = f"{rng.randint(100, 29999)} {rng.choice(STREETS)} {rng.choice(STREET_SUFFIXES)}"
+            unit = f"Unit {rng.randint(1, 400)}" if property_type != "R" and rng.random() < 0.3 else None
+            yield (property_id, client_id, property_type, f"P{property_id:03d}", street, unit, city, state,
+                   rng.choice(zipcodes), rng.random() < 0.97)
+
+    def service_rows(self):
+        rng = self.rng
+        types, weights = SERVICE_TYPE_WEIGHTS
+        statuses, status_weights = ORDER_STATUSES
+        service_id = 0
+        for property_index, count in enumerate(self.property_services):
+            scale = PROPERTY_SCALE[self.property_types[property_index]]
+            for _ in range(count):
+                service_id += 1
+                service_type = rng.choices(types, weights)[0]
+                name, minutes, price = rng.choice(SERVICE_TEMPLATES[service_type])
+                minutes = int(minutes * scale)
+                self.service_minutes.append(minutes)
+                yield (service_id, f"RS{service_id:04d}", name, f"{minutes // 60:02d}:{minutes % 60:02d}:00",
+                       f"{price * scale:.2f}", service_type, rng.choices(statuses, status_weights)[0])
+
+    def service_list_rows(self):
+        service_id = 0
+        for property_id, count in enumerate(self.property_services, start=1):
+            for _ in range(count):
+                service_id += 1
+                yield (property_id, service_id, self.service_frequency[service_id - 1], True)
+
+    # Visits in start time order: each service recurs every N days from a random first day
+    def work_record_rows(self):
+        rng = self.rng
+        # schedule[days][offset] -> services visited on days where day_number % days == offset
+        schedule = {days: [[] for _ in range(days)] for days in FREQUENCY_DAYS.values()}
+        for service_id, days in enumerate(self.service_days, start=1):
+            schedule[days][rng.randrange(days)].append(service_id)
+
+        target = self.sizes["work_records"]
+        employees = len(self.employees)
+        record_id = 0
+        day_number = 0
+        open_employees = set()  # employees already given an open record (at most one each)
+        while record_id < target:
+            day = self.start_date + datetime.timedelta(days=day_number)
+            last_day = day >= self.end_date - datetime.timedelta(days=1)
+            visits = []
+            for days, offsets in schedule.items():
+                for service_id in offsets[day_number % days]:
+                    # Crews start between 7:00 and 16:00
+                    visits.append((rng.randint(7 * 60, 16 * 60), service_id))
+            visits.sort()
+            start_of_day = datetime.datetime.combine(day, datetime.time())
+            for minute, service_id in visits:
+                record_id += 1
+                if record_id > target:
+                    break
+                employee = rng.randrange(employees)
+                deactivated = self.employees[employee]
+                if deactivated is not None and day >= deactivated:
+                    employee_id = self.active_employees[rng.randrange(len(self.active_employees))]
+                else:
+                    employee_id = employee + 1
+                start = start_of_day + datetime.timedelta(minutes=minute)
+                # Actual time is 80-125% of the allocated time; some of the last day is still in progress,
+                # but like ClockIn allows, no employee has more than one open record
+                if last_day and employee_id not in open_employees and rng.random() < 0.5:
+                    open_employees.add(employee_id)
+                    end = None
+                else:
+                    end = start + datetime.timedelta(
+                        minutes=round(self.service_minutes[service_id - 1] * rng.uniform(0.8, 1.25)))
+                yield (record_id, f"WR{record_id:04d}", service_id, start, end, employee_id)
+            day_number += 1
+        self.last_day = day
+
+    # Schedules (migration 0006) start on each service's first generated visit, so the visit
+    # schedule continues the generated history; skipped when the migration has not been applied
+    def set_start_dates(self, cur):
+        cur.execute("SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'recurringservicelist' AND column_name = 'startdate';")
+        if cur.fetchone() is None:
+            return
+        cur.execute("""
+            UPDATE RecurringServiceList l
+            SET startDate = f.firstVisit
+            FROM (SELECT recurringServiceID, MIN(startTime)::date AS firstVisit
+                  FROM WorkRecord
+                  GROUP BY recurringServiceID) f
+            WHERE f.recurringServiceID = l.recurringServiceID;
+        """)
+        self.log(f"Set {cur.rowcount:,} schedule start dates")
+
+    # One invoice per client and complete calendar month of finished work, newest months first
+    # until MAX_INVOICES; the latest two months leave one client in twenty past due
+    # Work is billed to the client owning the service, as BillingRun does
+    def insert_invoices(self, cur):
+        cur.execute("""
+            WITH owner AS (
+                SELECT recurringServiceID, MIN(propertyID) AS propertyID
+                FROM RecurringServiceList
+                GROUP BY recurringServiceID
+            ),
+            billable AS (
+                SELECT p.clientID, date_trunc('month', w.startTime)::date AS periodStart,
+                       SUM(rs.price) AS totalAmount, MIN(w.id) AS workRecordID
+                FROM WorkRecord w
+                    JOIN RecurringService rs ON rs.id = w.recurringServiceID
+                    JOIN owner o ON o.recurringServiceID = w.recurringServiceID
+                    JOIN Property p ON p.id = o.propertyID
+                WHERE w.endTime IS NOT NULL
+                  AND w.startTime < date_trunc('month', %(last_day)s::date)
+                GROUP BY 1, 2
+            ),
+            months AS (
+                SELECT periodStart, SUM(COUNT(*)) OVER (ORDER BY periodStart DESC) AS running
+                FROM billable
+                GROUP BY periodStart
+            ),
+            latest AS (
+                SELECT max(periodStart) AS periodStart FROM billable
+            )
+            INSERT INTO Invoice (clientID, invoiceNumber, totalAmount, workRecordID, periodStart, periodEnd,
+                                 dueDate, invoiceDate, invoiceStandingID)
+            SELECT b.clientID,
+                   'INV' || LPAD(row_number() OVER (ORDER BY b.periodStart, b.clientID)::TEXT, 4, '0'),
+                   b.totalAmount, b.workRecordID, b.periodStart,
+                   (b.periodStart + INTERVAL '1 month' - INTERVAL '1 day')::date,
+                   b.periodStart + INTERVAL '1 month 4 days',
+                   b.periodStart + INTERVAL '1 month' - INTERVAL '1 day',
+                   CASE WHEN b.periodStart >= (SELECT periodStart FROM latest) - INTERVAL '1 month'
+                             AND b.clientID %% 20 = 0
+                        THEN 'P' ELSE 'G' END
+            FROM billable b
+                JOIN months m ON m.periodStart = b.periodStart
+            WHERE m.running <= %(max_invoices)s
+            ORDER BY b.periodStart, b.clientID;
+        """, {"last_day": self.last_day, "max_invoices": MAX_INVOICES})
+        self.log(f"Inserted {cur.rowcount:,} rows into Invoice")
+
+    # Move every sequence past the generated ids so later inserts do not collide
+    def reset_sequences(self, cur):
+        for table in ["employee", "client", "property", "recurringservice", "workrecord", "invoice"]:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"COALESCE(MAX(id), 0) + 1, false) FROM {table};")
+        cur.execute("SELECT setval('service_num_seq', COALESCE(MAX(id), 0) + 1, false) FROM RecurringService;")
+        # Created by migrations 0004 and 0005, which may not have been applied yet
+        cur.execute("SELECT setval(to_regclass('invoice_num_seq'), COALESCE(MAX(id), 0) + 1, false) FROM Invoice "
+                    "WHERE to_regclass('invoice_num_seq') IS NOT NULL;")
+        cur.execute("SELECT setval(to_regclass('work_record_num_seq'), COALESCE(MAX(id), 0) + 1, false) "
+                    "FROM WorkRecord WHERE to_regclass('work_record_num_seq') IS NOT NULL;")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic LandscapingDB dataset for performance tests.")
+    parser.add_argument("--work-records", type=int, default=10_000,
+                        help="Work records to generate; every other table is sized from it (default: 10000).")
+    parser.add_argument("--seed", type=int, default=475, help="Random seed; the same seed gives the same data.")
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, default=datetime.date(2025, 6, 30),
+                        help="Day of the most recent visits, YYYY-MM-DD (default: 2025-06-30).")
+    parser.add_argument("--truncate", action="store_true",
+                        help="Empty the business tables first (deletes existing data, including the samples).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.work_records < 1:
+        print("--work-records must be at least 1.")
+        return 1
+
+    try:
+        dbPool = ConnectionPool(DB_CONFIG)
+    except psycopg2.Error as e:
+        print("Error connecting to database:", e)
+        return 1
+
+    generator = DataGenerator(args.work_records, args.seed, args.end_date)
+    sizes = generator.sizes
+    print(f"Generating {sizes['work_records']:,} work records for {sizes['services']:,} services "
+          f"and {sizes['employees']:,} employees (seed {args.seed}).", file=sys.stderr)
+    try:
+        with dbPool.connection() as conn:
+            generator.load(conn, args.truncate)
+    except ValueError as e:
+        print("Error:", e)
+        return 1
+    except psycopg2.Error as e:
+        print("Generation failed, nothing was loaded:", str(e).strip())
+        return 1
+    finally:
+        dbPool.closeall()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
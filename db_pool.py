@@ -0,0 +1,110 @@
+# db_pool.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+from statements import registry
+import tracing
+
+# ---------------------------
+# ConnectionPool
+# Shares a bounded set of physical connections between every APIEndpoint.
+# A connection is checked out for the duration of one execute() and checked
+# back in afterwards, so independent callers no longer serialize on one socket
+# and an aborted transaction never leaks into another endpoint.
+# ---------------------------
+class ConnectionPool:
+    def __init__(self, db_config):
+        # minconn/maxconn/checkout_timeout/health_check_interval configure the pool,
+        # everything else is passed straight to psycopg2.connect()
+        settings = dict(db_config)
+        self.minconn = int(settings.pop("minconn", 1))
+        self.maxconn = int(settings.pop("maxconn", 10))
+        self.checkout_timeout = float(settings.pop("checkout_timeout", 30))
+        # Connections idle longer than this (seconds) are pinged before being handed out
+        self.health_check_interval = float(settings.pop("health_check_interval", 60))
+        # Time every round trip with the query tracer (tracing.py)
+        self.trace = bool(settings.pop("trace", True))
+        self.connect_kwargs = settings
+
+        factories = tracing.CONNECT_KWARGS if self.trace else {}
+        self._pool = pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs, **factories)
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._last_used = {}        # id(connection) -> time of last checkin
+
+    # Check out a healthy connection
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise pool.PoolError("Timed out waiting for a database connection.")
+        try:
+            while True:
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    break
+                self._discard(conn)
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    # Return a connection to the pool, rolling back anything left open
+    def putconn(self, conn):
+        try:
+            broken = conn.closed != 0
+            if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            if broken:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    # Context manager used by endpoints: with pool.connection() as conn: ...
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        self._pool.closeall()
+        self._last_used.clear()
+
+    # Cheap check on every checkout, round trip only for connections idle past the interval
+    def _is_healthy(self, conn):
+        if conn.closed != 0:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1;")
+            finally:
+                cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # Close a broken connection and forget any per-connection state
+    def _discard(self, conn):
+        registry.forget(conn)
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except pool.PoolError:
+            pass
@@ -1,39 +1,142 @@
 # driver.py
 
+import argparse                 # Import the command line parser used for non-interactive modes
+import json                     # Import the JSON parser used for export parameters
+import sys                      # Import sys to export to standard output
 import psycopg2                 # Import the PostgreSQL adapter library for Python
-from apis import get_all_apis   # Import the function that retrieves all API objects grouped by category
+from apis import get_all_apis, get_apis_by_name   # Import the functions that retrieve the API objects
+from api_endpoint import APIError   # Import the error raised by APIs for invalid input
+from statements import EXPORT_FORMATS   # Import the formats supported by export
 from config import DB_CONFIG    # Import the database configuration dictionary
+from db_pool import ConnectionPool  # Import the pooled connection layer shared by all APIs
+from batch import run_batch     # Import the JSON-lines batch runner
+from tracing import tracer      # Import the query tracer that times every database round trip
 
 
 
 # Function to connect to the PostgreSQL database
-# It uses the connection settings specified in config.py
-# Returns a connection object if successful, otherwise returns None
+# It uses the connection settings specified in config.py, including the
+# optional pool sizing keys (minconn, maxconn)
+# Returns a connection pool if successful, otherwise returns None
 def connect_to_db():
-    try: # Attempt to establish a connection to the database 
-        dbConnection = psycopg2.connect(**DB_CONFIG)
-        return dbConnection 
+    try: # Attempt to open the pool's initial connections to the database 
+        dbPool = ConnectionPool(DB_CONFIG)
+        return dbPool 
     except psycopg2.Error as e: # Print an error message if the connection attempt fails
         print("Error connecting to database:", e)
         return None  # Return None to indicate that the connection was not successful
 
 
 
+# Parse the command line options
+# With no options the interactive menu is started
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LandscapingDB command line driver.")
+    parser.add_argument("--batch", metavar="CALLS.jsonl",
+                        help="Run the API calls in a JSON-lines file instead of the interactive menu.")
+    parser.add_argument("--commit-size", type=int, default=100,
+                        help="Number of batch calls committed together (default: 100).")
+    parser.add_argument("--report", metavar="REPORT.jsonl",
+                        help="Write the per-line batch report to this file instead of standard output.")
+    parser.add_argument("--export", metavar="API",
+                        help="Export every row of a list API (e.g. ListProperties) instead of the interactive menu.")
+    parser.add_argument("--params", default="{}",
+                        help="""Export filters as a JSON object, e.g. '{"activeStatus": true}' (default: none).""")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv",
+                        help="Export file format (default: csv).")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Write the export to this file instead of standard output.")
+    parser.add_argument("--trace-output", metavar="FILE.json",
+                        help="On exit, write the query statistics (per statement and per API) to this JSON file.")
+    return parser.parse_args(argv)
+
+
+
+# Export mode: stream every row of a list API to a CSV or JSON-lines file
+def run_export(dbPool, args):
+    api = get_apis_by_name(dbPool).get(args.export)
+    if api is None:
+        print(f"Unknown API '{args.export}'.", file=sys.stderr)
+        return
+    try:
+        params = json.loads(args.params)
+        if not isinstance(params, dict):
+            raise ValueError("expected a JSON object")
+    except ValueError as e:
+        print(f"Invalid --params: {e}", file=sys.stderr)
+        return
+
+    try:
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                count = api.export(params, out, args.format)
+        else:
+            count = api.export(params, sys.stdout, args.format)
+    except NotImplementedError:
+        print(f"{api.name} does not support export.", file=sys.stderr)
+        return
+    except APIError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+    except OSError as e:
+        print("Error writing export file:", e, file=sys.stderr)
+        return
+    print(f"Exported {count} rows from {api.name}.", file=sys.stderr)
+
+
+
+# Write the query statistics if requested, then close every pooled database connection
+def shutdown(dbPool, args):
+    if args.trace_output:
+        try:
+            tracer.dump(args.trace_output)
+            print(f"Query statistics written to {args.trace_output}.", file=sys.stderr)
+        except OSError as e:
+            print("Error writing query statistics:", e, file=sys.stderr)
+    dbPool.closeall()
+
+
+
 # The main function that acts as the entry point for the CLI program
-def main():
-    # Try to establish a connection to the database
-    dbConnection = connect_to_db()
-    if not dbConnection:
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Try to establish a connection pool to the database
+    dbPool = connect_to_db()
+    if not dbPool:
         print("Could not connect to the database. Exiting.")
         return
 
+    # Non-interactive batch mode: replay the calls file and exit
+    if args.batch:
+        try:
+            if args.report:
+                with open(args.report, "w", encoding="utf-8") as report:
+                    run_batch(dbPool, args.batch, args.commit_size, report)
+            else:
+                run_batch(dbPool, args.batch, args.commit_size)
+        except OSError as e:
+            print("Error reading batch file:", e)
+        finally:
+            shutdown(dbPool, args)
+        return
+
+    # Non-interactive export mode: stream one list API to a file and exit
+    if args.export:
+        try:
+            run_export(dbPool, args)
+        finally:
+            shutdown(dbPool, args)
+        return
+
     # Retrieve a dictionary of API endpoint groups from apis.py
-    apis_by_group = get_all_apis(dbConnection)
+    apis_by_group = get_all_apis(dbPool)
     
     # Define the group order as desired for display
     group_order = [
         "Client Management",
         "Service Management",
+        "Work Record Management",
         "Employee Management",
         "Property Management",
         "Financial Management"
@@ -58,6 +161,10 @@ def main():
                 counter += 1
             print("")  # Blank line after each group
         
+        print("--DIAGNOSTICS--")
+        print("S. Show query statistics (time, round trips and rows per statement and API)")
+        print("")
+
         print("--EXIT PROGRAM--")
         print("0. Exit")
         
@@ -70,6 +177,11 @@ def main():
             print("Exiting CLI. Goodbye!")
             break
 
+        # Show the query tracer's totals for this session
+        if choice.lower() == "s":
+            tracer.print_report()
+            continue
+
         # Convert the user input to an integer, and run the API chosen
         try:
             choice = int(choice)
@@ -85,7 +197,7 @@ def main():
         except ValueError:
             print("Invalid input. Please enter a number.")
 
-    dbConnection.close() # After the user chooses to exit, close the database connection
+    shutdown(dbPool, args) # After the user chooses to exit, save the statistics and close every pooled connection
 
 
 
@@ -3,40 +3,103 @@
 # Note: Prepared for CSS475, Winter2025, UWB
 # ---------------------------------------------
 
-from api_endpoint import APIEndpoint
+from api_endpoint import (APIEndpoint, APIError, APIResult, decode_page_token, optional_text, parse_bool,
+                          parse_limit)
+import statements
 import re # Regex model for correct formatting
 
+# Columns returned when an employee is created or edited, in row order
+EMPLOYEE_COLUMNS = ["employeeNum", "firstName", "lastName", "phone", "email", "hireDate", "hourlyWage"]
+
+
+# Shared input validation for phone numbers and emails
+def validate_contact(phone, email):
+    if phone and not re.match(r"^\d{3}-\d{3}-\d{4}$", phone):
+        raise APIError("Invalid phone number format.")
+    if email and ("@" not in email or "." not in email.split("@")[1]):
+        raise APIError("Invalid email format.")
+
+
 # ---------------------------
 # ListEmployeesAPI (List API)
 # Author: Hyobin Yook
 # ---------------------------
 class ListEmployeesAPI(APIEndpoint):
+    name = "ListEmployees"
+
+    # Columns of the Employee table, in row order
+    COLUMNS = ["id", "employeeNum", "firstName", "lastName", "phone", "email",
+               "hireDate", "deactivatedDate", "hourlyWage"]
 
     #initalize class
-    def __init__(self, conn):
-        # Database connection and initialize the cursor
-        self.conn = conn
-        cur = self.conn.cursor()
-        try:
-            # Prepare the SQL statement for listing employees with optional filters
-            cur.execute("""
-                PREPARE list_employees(boolean, text, text, text) AS
+    def __init__(self, pool):
+        self.pool = pool
+        # Register the SQL statements for listing employees with optional filters
+        # Both are prepared lazily the first time each connection executes them
+        # The first page (or the whole list when $5 is NULL) starts at the lowest employee number
+        statements.register("list_employees", ("boolean", "text", "text", "text", "integer"), """
                 SELECT *
                 FROM Employee
                 WHERE ($1 IS NULL OR (CASE WHEN $1 THEN deactivateddate IS NULL ELSE deactivateddate IS NOT NULL END))
                     AND ($2 IS NULL OR employeenum ILIKE $2)
                     AND ($3 IS NULL OR LOWER(firstName) = LOWER($3))
                     AND ($4 IS NULL OR LOWER(lastName) = LOWER($4))
-                ORDER BY employeenum;
+                ORDER BY employeenum
+                LIMIT $5;
+            """)
+        # Later pages seek past the last employee number returned using the unique index on employeenum
+        statements.register("list_employees_after", ("boolean", "text", "text", "text", "text", "integer"), """
+                SELECT *
+                FROM Employee
+                WHERE ($1 IS NULL OR (CASE WHEN $1 THEN deactivateddate IS NULL ELSE deactivateddate IS NOT NULL END))
+                    AND ($2 IS NULL OR employeenum ILIKE $2)
+                    AND ($3 IS NULL OR LOWER(firstName) = LOWER($3))
+                    AND ($4 IS NULL OR LOWER(lastName) = LOWER($4))
+                    AND employeenum > $5
+                ORDER BY employeenum
+                LIMIT $6;
             """)
 
-            self.conn.commit()  # Commit the prepare command
+    # Lists employees ordered by employee number, optionally one page at a time
+    # params: activeStatus, employeeNum, firstName, lastName, limit, pageToken (all optional)
+    # Without a limit every match is returned; with one, result.next_token fetches the next page
+    def run(self, params: dict, conn=None) -> APIResult:
+        filters = self._filters(params)
+        limit = parse_limit(params.get("limit"))
+        after = decode_page_token(params.get("pageToken"), self.name, 1)
+        if after is not None and limit is None:
+            raise APIError("A limit is required with a page token.")
+        # One extra row tells whether another page follows
+        fetch = limit + 1 if limit is not None else None
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement with the provided filter(s)
+                if after is None:
+                    statements.execute(cur, "list_employees", (*filters, fetch))
+                else:
+                    statements.execute(cur, "list_employees_after", (*filters, *after, fetch))
+                rows = cur.fetchall()
+            finally:
+                cur.close()
 
-        except Exception as e:
-            self.conn.rollback() # Rollback the transaction if an error occurs
-            print("Error preparing list_employees.") 
-        finally:
-            cur.close()
+        if limit is None:
+            return APIResult(self.COLUMNS, rows)
+        return self.page_result(self.COLUMNS, rows, limit, lambda row: (row[1],))
+
+    # Every employee matching the filters, used by export()
+    # params: activeStatus, employeeNum, firstName, lastName (all optional)
+    def list_query(self, params: dict):
+        return "list_employees", (*self._filters(params), None), self.COLUMNS
+
+    # Validated filter values shared by run() and list_query()
+    def _filters(self, params):
+        active_filter = parse_bool(params.get("activeStatus"), "activeStatus")
+        return (active_filter,
+                optional_text(params.get("employeeNum")),
+                optional_text(params.get("firstName")),
+                optional_text(params.get("lastName")))
 
     # Function for executing API and collecting user input
     def execute(self):
@@ -45,52 +108,39 @@ class ListEmployeesAPI(APIEndpoint):
         filter_employeeNum = input("Filter: Enter employeeNum ('eg. E0001' or leave empty for all): ").strip().lower()
         filter_firstName = input("Filter: Enter firstName (or leave empty for all): ").strip().lower()
         filter_lastName = input("Filter: Enter lastName (or leave empty for all): ").strip().lower()
-        
+
         # Input validation: Handle input formats and 'quit' command
         if any(field.lower() == "quit" for field in [filter_active, filter_firstName, filter_lastName]):
             print("Operation terminated by user.")
             return  # Exit the API if "quit" is entered
-        
-        if filter_active == "":
-            active_filter = None
-        elif filter_active not in {"true", "false"}:
-            print("Error: filter_active must be either 'true', 'false', or an empty string (case insensitive).")
-            active_filter = None
-        else:
-            active_filter = filter_active == "true"
 
-        employeenum_filter = filter_employeeNum if filter_employeeNum else None
-        firstName_filter = filter_firstName if filter_firstName else None
-        lastName_filter = filter_lastName if filter_lastName else None
-        
-        cur = self.conn.cursor()
+        if filter_active not in {"", "true", "false"}:
+            print("Error: filter_active must be either 'true', 'false', or an empty string (case insensitive).")
+            filter_active = ""
 
         try:
-            # Execute the prepared statement with the provided filter(s)
-            cur.execute("EXECUTE list_employees(%s, %s, %s, %s);", (active_filter, employeenum_filter, firstName_filter, lastName_filter))
-            rows = cur.fetchall()
-            
-            # Print the results
-            print("\nemployeenum | firstname | lastname |    phone     |            email           |  hiredate  | deactivateddate | hourlywage")
-            print("------------+-----------+----------+--------------+---------------------------+------------+-----------------+------------")
+            rows = self.run({"activeStatus": filter_active, "employeeNum": filter_employeeNum,
+                             "firstName": filter_firstName, "lastName": filter_lastName}).rows
+        except Exception as e:
+            print("Error executing list_employees.")
+            return
 
-            for row in rows:
-                id, employeenum, firstname, lastname, phone, email, hiredate, deactivateddate, hourlywage = row
-                hiredate_str = hiredate.strftime('%Y-%m-%d') if hiredate else None
-                deactivateddate_str = deactivateddate.strftime('%Y-%m-%d') if deactivateddate else None
+        # Print the results
+        print("\nemployeenum | firstname | lastname |    phone     |            email           |  hiredate  | deactivateddate | hourlywage")
+        print("------------+-----------+----------+--------------+---------------------------+------------+-----------------+------------")
 
-                print(f"{employeenum:11} | {firstname:9} | {lastname:8} | {phone:12} | {email or '':26} | {hiredate_str or '':10} | {deactivateddate_str or '':15} | {hourlywage:9}")
+        for row in rows:
+            id, employeenum, firstname, lastname, phone, email, hiredate, deactivateddate, hourlywage = row
+            hiredate_str = hiredate.strftime('%Y-%m-%d') if hiredate else None
+            deactivateddate_str = deactivateddate.strftime('%Y-%m-%d') if deactivateddate else None
 
-            print(f"({len(rows)} rows)")
+            print(f"{employeenum:11} | {firstname:9} | {lastname:8} | {phone:12} | {email or '':26} | {hiredate_str or '':10} | {deactivateddate_str or '':15} | {hourlywage:9}")
+
+        print(f"({len(rows)} rows)")
 
-        except Exception as e:
-            print("Error executing list_employees.")
-        finally:
-            cur.close()
-    
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
-        print(f"{index}. ListEmployees - Lists employee records (optional filters).") 
+        print(f"{index}. ListEmployees - Lists employee records (optional filters).")
 
     # Display details of API and its use
     def display_details(self):
@@ -111,79 +161,88 @@ class ListEmployeesAPI(APIEndpoint):
 # Author: Hyobin Yook
 # ---------------------------
 class CreateEmployeeAPI(APIEndpoint):
-    def __init__(self, conn):
-        # Database connection and initialize the cursor
-        self.conn = conn
-        cur = self.conn.cursor()
+    name = "CreateEmployee"
+
+    def __init__(self, pool):
+        # Connection pool shared by every endpoint
+        self.pool = pool
+        # Register the insert statement; it is prepared lazily, once per connection
+        statements.register("create_employee", ("text", "text", "text", "text", "date", "money"), """
+                INSERT INTO Employee (firstName, lastName, phone, email, hireDate, hourlyWage)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING employeeNum, firstName, lastName, phone, email, hireDate, hourlyWage;
+            """)
+
+    # Creates one employee
+    # params: firstName, lastName, phone (XXX-XXX-XXXX), email, hireDate (YYYY-MM-DD), hourlyWage (all required)
+    def run(self, params: dict, conn=None) -> APIResult:
+        fields = [optional_text(params.get(key)) for key in
+                  ("firstName", "lastName", "phone", "email", "hireDate", "hourlyWage")]
+        firstName, lastName, phone, email, hireDate, hourlyWage = fields
+
+        # Ensure all required inputs received
+        if not all(fields):
+            raise APIError("All fields are required. Please re-enter the details.")
+        validate_contact(phone, email)
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement
+                statements.execute(cur, "create_employee",
+                            (firstName, lastName, phone, email, hireDate, hourlyWage))
+                new_employee = cur.fetchone()
+            finally:
+                cur.close()
+
+        return APIResult(EMPLOYEE_COLUMNS, [new_employee], "Success! Employee created")
 
     def execute(self):
         # Loop to enfore input of all required fields
         while True:
             print("Enter 'quit' at any time to terminate the operation.")
             print("-------------------------")
-            firstName = input("Enter first name: ").strip()
-            lastName = input("Enter last name: ").strip()
-            phone = input("Enter phone (XXX-XXX-XXXX): ").strip()
-            email = input("Enter email: ").strip()
-            hireDate = input("Enter hire date (YYYY-MM-DD): ").strip()
-            hourlyWage = input("Enter hourly wage: ").strip()
+            params = {
+                "firstName": input("Enter first name: ").strip(),
+                "lastName": input("Enter last name: ").strip(),
+                "phone": input("Enter phone (XXX-XXX-XXXX): ").strip(),
+                "email": input("Enter email: ").strip(),
+                "hireDate": input("Enter hire date (YYYY-MM-DD): ").strip(),
+                "hourlyWage": input("Enter hourly wage: ").strip(),
+            }
             print("-------------------------")
 
-            # Input validation: Handle formats and 'quit' command
-            if any(field.lower() == "quit" for field in [firstName, lastName, phone, email, hireDate, hourlyWage]):
+            # Input validation: Handle 'quit' command
+            if any(field.lower() == "quit" for field in params.values()):
                 print("Operation terminated by user.")
                 return  # Exit the API if "quit" is entered
 
             # Ensure all required inputs received
-            if not firstName or not lastName or not phone or not email or not hireDate or not hourlyWage:
+            if not all(params.values()):
                 print("Error: All fields are required. Please re-enter the details.")
                 continue  # Re-execute the loop
 
-            if not re.match(r"^\d{3}-\d{3}-\d{4}$", phone):
-                print("Error: Invalid phone number format.")
+            try:
+                result = self.run(params)
+            except APIError as e:
+                print(f"Error: {e}")
                 return
-            
-            if "@" not in email or "." not in email.split("@")[1]:
-                print("Error: Invalid email format.")
+            except Exception as e:
+                print("Error creating employee")
                 return
 
-            try:
-                cur = self.conn.cursor()
-                # Prepare the insert statement
-                cur.execute("""
-                    PREPARE create_employee AS
-                    INSERT INTO Employee (firstName, lastName, phone, email, hireDate, hourlyWage)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    RETURNING employeeNum, firstName, lastName, phone, email, hireDate, hourlyWage;
-                """, (firstName, lastName, phone, email, hireDate, hourlyWage))
-
-                # Execute the prepared statement
-                cur.execute("EXECUTE create_employee (%s, %s, %s, %s, %s, %s);", 
-                            (firstName, lastName, phone, email, hireDate, hourlyWage))
-                
-                new_employee = cur.fetchone()
-                self.conn.commit()
-                print(f"Success! Employee created")
+            print(result.message)
 
-                # Print the results
-                print("\nemployeenum | firstname | lastname |    phone     |            email           |  hiredate  | hourlywage")
-                print("------------+-----------+----------+--------------+----------------------------+------------+------------")
-                
-                employeeNum, firstName, lastName, phone, email, hireDate, hourlyWage = new_employee
-                hireDate_str = hireDate.strftime('%Y-%m-%d') if hireDate else 'N/A'
-                
-                print(f"{employeeNum:11} | {firstName:9} | {lastName:8} | {phone:12} | {email:26} | {hireDate_str:10} | {hourlyWage:9}")
+            # Print the results
+            print("\nemployeenum | firstname | lastname |    phone     |            email           |  hiredate  | hourlywage")
+            print("------------+-----------+----------+--------------+----------------------------+------------+------------")
 
-                break
+            employeeNum, firstName, lastName, phone, email, hireDate, hourlyWage = result.rows[0]
+            hireDate_str = hireDate.strftime('%Y-%m-%d') if hireDate else 'N/A'
 
-            except Exception as e:
-                self.conn.rollback()
-                print("Error creating employee")
-                break
+            print(f"{employeeNum:11} | {firstName:9} | {lastName:8} | {phone:12} | {email:26} | {hireDate_str:10} | {hourlyWage:9}")
+            return
 
-            finally:
-                cur.close()
-    
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
         print(f"{index}. CreateEmployee - Adds a new employee record.")
@@ -210,138 +269,167 @@ class CreateEmployeeAPI(APIEndpoint):
 # Author: Hyobin Yook
 # ---------------------------
 class EditEmployeeAPI(APIEndpoint):
-    def __init__(self, conn):
-        # Database connection and initialize the cursor
-        self.conn = conn
-        self.cur = self.conn.cursor()
-    
-    def execute(self):
-        # Collect user input for finding the employee
-        employee_number_search = input("Enter Employee Number to search (Eg.'E1234') (leave blank if not applicable): ").strip() or None
-        first_name_search = input("Enter First Name to search (leave blank if not applicable): ").strip() or None
-        last_name_search = input("Enter Last Name to search (leave blank if not applicable): ").strip() or None
-       
+    name = "EditEmployee"
+
+    # Updatable columns, keyed by the parameter name used in run()
+    UPDATE_COLUMNS = {
+        "firstName": "firstname",
+        "lastName": "lastname",
+        "phone": "phone",
+        "email": "email",
+        "hourlyWage": "hourlywage",
+        "hireDate": "hiredate",
+        "deactivatedDate": "deactivateddate",
+    }
+
+    # Parameter type of each updatable column
+    COLUMN_TYPES = {
+        "firstname": "text",
+        "lastname": "text",
+        "phone": "text",
+        "email": "text",
+        "hourlywage": "money",
+        "hiredate": "date",
+        "deactivateddate": "date",
+    }
+
+    def __init__(self, pool):
+        # Connection pool shared by every endpoint
+        self.pool = pool
+        # One UPDATE per set of columns being changed, prepared once per connection and reused
+        statements.register_family("update_employee", self.update_statement)
+
+    # Build the UPDATE for one shape (a tuple of columns, in UPDATE_COLUMNS order)
+    # The employee number is the last parameter; the updated row is returned
+    @classmethod
+    def update_statement(cls, columns):
+        assignments = ", ".join(f"{column} = ${i}" for i, column in enumerate(columns, start=1))
+        argtypes = [cls.COLUMN_TYPES[column] for column in columns] + ["text"]
+        return argtypes, f"""
+                UPDATE employee
+                SET {assignments}
+                WHERE employeeNum = ${len(columns) + 1}
+                RETURNING employeeNum, firstname, lastname, phone, email, hiredate, hourlywage;
+            """
+
+    # Find the employeeNum matching the search criteria (employee number, or first and/or last name)
+    # Returns None if no employee matches
+    def find_employee(self, params: dict, conn=None):
+        employee_number_search = optional_text(params.get("searchEmployeeNum"))
+        first_name_search = optional_text(params.get("searchFirstName"))
+        last_name_search = optional_text(params.get("searchLastName"))
+
         # Check if at least one search parameter is provided
         if not first_name_search and not last_name_search and not employee_number_search:
-            print("Please provide at least one search parameter (first name, last name, or employee number).")
-            return
+            raise APIError("Please provide at least one search parameter (first name, last name, or employee number).")
 
-        cur = self.conn.cursor()
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                if employee_number_search:
+                    cur.execute("SELECT employeeNum FROM employee WHERE employeenum iLIKE %s;", (employee_number_search,))
+                elif first_name_search and last_name_search:
+                    cur.execute("SELECT employeeNum FROM employee WHERE firstname = %s AND lastname = %s;", (first_name_search, last_name_search))
+                elif first_name_search:
+                    cur.execute("SELECT employeeNum FROM employee WHERE firstname = %s;", (first_name_search,))
+                else:
+                    cur.execute("SELECT employeeNum FROM employee WHERE lastname = %s;", (last_name_search,))
+                result = cur.fetchone()
+            finally:
+                cur.close()
 
-        # Find & Save the employeeNum based on the provided search criteria 
-        employeeNum = None
-        try:
-            if employee_number_search:
-                cur.execute("SELECT employeeNum FROM employee WHERE employeenum iLIKE %s;", (employee_number_search,))
-            elif first_name_search and last_name_search:
-                cur.execute("SELECT employeeNum FROM employee WHERE firstname = %s AND lastname = %s;", (first_name_search, last_name_search))
-            elif first_name_search:
-                cur.execute("SELECT employeeNum FROM employee WHERE firstname = %s;", (first_name_search,))
-            elif last_name_search:
-                cur.execute("SELECT employeeNumd FROM employee WHERE lastname = %s;", (last_name_search,))
-
-            result = cur.fetchone()
-            
-            if result:
-                employeeNum = result[0] # Stored to used in the update query & print updated employee information
-            
-            else:
-                print("Employee not found. Try again.")
-                return
+        return result[0] if result else None
+
+    # Updates the supplied fields of one employee; blank fields keep their current value
+    # params: employeeNum, or searchEmployeeNum/searchFirstName/searchLastName to find the employee,
+    #         plus any of firstName, lastName, phone, email, hourlyWage, hireDate, deactivatedDate
+    def run(self, params: dict, conn=None) -> APIResult:
+        updates = {column: optional_text(params.get(key)) for key, column in self.UPDATE_COLUMNS.items()}
+        updates = {column: value for column, value in updates.items() if value}
+        validate_contact(updates.get("phone"), updates.get("email"))
+        if not updates:
+            raise APIError("No updates were provided.")
+
+        with self.transaction(conn) as conn:
+            employeeNum = optional_text(params.get("employeeNum")) or self.find_employee(params, conn)
+            if not employeeNum:
+                raise APIError("Employee not found. Try again.")
+
+            cur = conn.cursor()
+            try:
+                # Execute the prepared UPDATE for this set of columns; it returns the updated row
+                statements.execute_shape(cur, "update_employee", tuple(updates),
+                                         (*updates.values(), employeeNum))
+                updated_employee = cur.fetchone()
+            finally:
+                cur.close()
+
+        if not updated_employee:
+            raise APIError("Employee not found. Try again.")
+        return APIResult(EMPLOYEE_COLUMNS, [updated_employee], "Employee information updated successfully.")
+
+    def execute(self):
+        # Collect user input for finding the employee
+        search = {
+            "searchEmployeeNum": input("Enter Employee Number to search (Eg.'E1234') (leave blank if not applicable): ").strip(),
+            "searchFirstName": input("Enter First Name to search (leave blank if not applicable): ").strip(),
+            "searchLastName": input("Enter Last Name to search (leave blank if not applicable): ").strip(),
+        }
 
+        # Find & Save the employeeNum based on the provided search criteria
+        try:
+            employeeNum = self.find_employee(search)
+        except APIError as e:
+            print(e)
+            return
         except Exception as e:
             print(f"Error finding employee.")
             return
 
+        if not employeeNum:
+            print("Employee not found. Try again.")
+            return
+
         print("\n-------------------------")
         print("Provide updated information for the employee. Leave blank to keep current information.")
-        first_name = input("Enter First Name (leave blank to keep current): ").strip() or None
-        last_name = input("Enter Last Name (leave blank to keep current): ").strip() or None
-        phone = input("Enter Phone Number (leave blank to keep current): ").strip() or None
-        email = input("Enter Email (leave blank to keep current): ").strip() or None
-        hourly_wage = input("Enter Hourly Wage (leave blank to keep current): ").strip() or None
-        hire_date = input("Enter Hire Date (YYYY-MM-DD, leave blank to keep current): ").strip() or None
-        deactivated_date = input("Enter Deactivated Date (YYYY-MM-DD, leave blank to keep current): ").strip() or None
-
+        params = {
+            "employeeNum": employeeNum,
+            "firstName": input("Enter First Name (leave blank to keep current): ").strip(),
+            "lastName": input("Enter Last Name (leave blank to keep current): ").strip(),
+            "phone": input("Enter Phone Number (leave blank to keep current): ").strip(),
+            "email": input("Enter Email (leave blank to keep current): ").strip(),
+            "hourlyWage": input("Enter Hourly Wage (leave blank to keep current): ").strip(),
+            "hireDate": input("Enter Hire Date (YYYY-MM-DD, leave blank to keep current): ").strip(),
+            "deactivatedDate": input("Enter Deactivated Date (YYYY-MM-DD, leave blank to keep current): ").strip(),
+        }
         print("-------------------------")
 
-        # Input validation: Handle formats and 'quit' command
-        if any(item and item.lower() == "quit" for item in [first_name, last_name, phone, email, hourly_wage, hire_date, deactivated_date]):
+        # Input validation: Handle 'quit' command
+        if any(item.lower() == "quit" for item in params.values()):
             print("Operation terminated by user.")
             return
-        if phone and (not re.match(r"^\d{3}-\d{3}-\d{4}$", phone)):
-                print("Error: Invalid phone number format.")
-                return
-        if email and ("@" not in email or "." not in email.split("@")[1]):
-            print("Error: Invalid email format.")
-            return
-        if not any([first_name, last_name, phone, email, hourly_wage, hire_date, deactivated_date]):
+        if not any(value for key, value in params.items() if key != "employeeNum"):
             return
 
         # Update employee information
         try:
-            cur.execute("BEGIN;") # Begin the transaction block
-            update_fields = []
-            update_values = []
-
-            if first_name:
-                update_fields.append("firstname = %s")
-                update_values.append(first_name)
-            if last_name:
-                update_fields.append("lastname = %s")
-                update_values.append(last_name)
-            if phone:
-                update_fields.append("phone = %s")
-                update_values.append(phone)
-            if email:
-                update_fields.append("email = %s")
-                update_values.append(email)
-            if hourly_wage:
-                update_fields.append("hourlywage = %s")
-                update_values.append(hourly_wage)
-            if hire_date:
-                update_fields.append("hiredate = %s")
-                update_values.append(hire_date)
-            if deactivated_date:
-                update_fields.append("deactivateddate = %s")
-                update_values.append(deactivated_date)
-
-            if update_fields:
-                update_query = "UPDATE employee SET " + ", ".join(update_fields) + " WHERE employeeNum = %s"
-                update_values.append(employeeNum)
-
-                # Prepare and execute the update query
-                cur.execute("PREPARE update_employee_prepared AS " + update_query, tuple(update_values))
-                cur.execute("EXECUTE update_employee_prepared")
-                cur.execute("DEALLOCATE update_employee_prepared")
-
-                self.conn.commit() # Commit the transaction only if the entire operation succeeds
-                print("Employee information updated successfully.")
-
-                # Retrieve and print updated employee information ('Prepare' not needed as following the successful update)
-                cur.execute("SELECT employeeNum, firstname, lastname, phone, email, hiredate, hourlywage FROM employee WHERE employeeNum = %s", (employeeNum,))
-                updated_employee = cur.fetchone()
-                if updated_employee:
-                    print("\nemployeenum | firstname | lastname |    phone     |            email           |  hiredate  | hourlywage")
-                    print("------------+-----------+----------+--------------+----------------------------+------------+------------")
+            result = self.run(params)
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except Exception as e:
+            print(f"Error updating employee information. Try again.")
+            return
 
-                    employeeNum, firstName, lastName, phone, email, hireDate, hourlyWage = updated_employee
-                    hireDate_str = hireDate.strftime('%Y-%m-%d') if hireDate else 'N/A'
+        print(result.message)
+        print("\nemployeenum | firstname | lastname |    phone     |            email           |  hiredate  | hourlywage")
+        print("------------+-----------+----------+--------------+----------------------------+------------+------------")
 
-                    print(f"{employeeNum:11} | {firstName:9} | {lastName:8} | {phone:12} | {email:26} | {hireDate_str:10} | {hourlyWage:9}")
-                else:
-                    print("Could not retrieve updated employee information.")
-                
-            else:
-                print("No updates were provided.")
+        employeeNum, firstName, lastName, phone, email, hireDate, hourlyWage = result.rows[0]
+        hireDate_str = hireDate.strftime('%Y-%m-%d') if hireDate else 'N/A'
 
-        except Exception as e:
-            self.conn.rollback() # Rollback the transaction if an error occurs
-            print(f"Error updating employee information. Try again.")
+        print(f"{employeeNum:11} | {firstName:9} | {lastName:8} | {phone:12} | {email:26} | {hireDate_str:10} | {hourlyWage:9}")
 
-        finally:
-            cur.close()
-    
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
         print(f"{index}. EditEmployee - Updates employee information based on first name, last name, or employee number.")
@@ -360,4 +448,4 @@ class EditEmployeeAPI(APIEndpoint):
         print("\t- hire_date (optional)")
         print("\t- deactivated_date (optional)")
         print("\tExample: first_name = John, last_name = Doe")
-        print("-------------------------\n")
\ No newline at end of file
+        print("-------------------------\n")
@@ -3,7 +3,20 @@
 # Note: Prepared for CSS475, Winter2025, UWB
 # ---------------------------------------------
 
-from api_endpoint import APIEndpoint
+import calendar
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import errors
+
+from api_endpoint import APIEndpoint, APIError, APIResult, optional_text, parse_date, parse_int
+import statements
+
+# Client ranges a billing run is split into, each billed on its own connection
+BILLING_PARTITIONS = 4
+
+# Days between the invoice date and its due date
+INVOICE_DUE_DAYS = 30
 
 # ---------------------------
 # WorkSummaryAPI (List API)
@@ -12,52 +25,59 @@ from api_endpoint import APIEndpoint
 # Author: Manuel Rodriguez
 # ---------------------------
 class WorkSummaryAPI(APIEndpoint):
+    name = "WorkSummary"
 
     # Initialize class and prepare the SQL statement with date range parameters.
-    def __init__(self, conn):
-        self.conn = conn            # Database connection object.
-        cur = self.conn.cursor()    # Create a cursor object for executing SQL commands.
-        
-        # Prepare the postgres PREPARE statement with date range parameters
-        try:
-            cur.execute("""
-                PREPARE my_work_summary(timestamp, timestamp) AS
+    def __init__(self, pool):
+        self.pool = pool
+        # Register the postgres PREPARE statement with date range parameters
+        # It is prepared lazily the first time each connection executes it
+        # A work record counts when it starts at or after $1 and ends at or before $2.
+        # Whole days inside the range are read from WorkRecordDailyRollup (kept current by triggers
+        # on WorkRecord), so the cost depends on the number of days, not the number of records.
+        # Only records that start before the first midnight or end after the last midnight of
+        # the range are read from WorkRecord itself.
+        statements.register("my_work_summary", ("timestamp", "timestamp"), """
+                WITH bounds AS (
+                    SELECT
+                        -- First midnight at or after the range start
+                        CASE WHEN $1 = date_trunc('day', $1) THEN $1
+                             ELSE date_trunc('day', $1) + interval '1 day' END AS firstMidnight,
+                        -- Last midnight at or before the range end
+                        date_trunc('day', $2) AS lastMidnight
+                ),
+                parts AS (
+                    -- Records that start and end on whole days inside the range
+                    SELECT R.employeeid, R.recordcount AS records, R.totalduration AS duration
+                    FROM WorkRecordDailyRollup R, bounds B
+                    WHERE R.startdate >= B.firstMidnight::date
+                      AND R.enddate < B.lastMidnight::date
+                    UNION ALL
+                    -- Records that start on the partial first day
+                    SELECT W.employeeid, 1, W.endtime - W.starttime
+                    FROM Workrecord W, bounds B
+                    WHERE W.starttime >= $1
+                      AND W.starttime < B.firstMidnight
+                      AND W.endtime <= $2
+                    UNION ALL
+                    -- Records that start on a whole day but end on the partial last day
+                    SELECT W.employeeid, 1, W.endtime - W.starttime
+                    FROM Workrecord W, bounds B
+                    WHERE W.starttime >= B.firstMidnight
+                      AND W.endtime >= B.lastMidnight
+                      AND W.endtime <= $2
+                )
                 SELECT
                     E.employeenum,                -- Employee number from the Employee table
                     E.firstname,                  -- Employee first name
                     E.lastname,                   -- Employee last name
-                    COUNT(W.id) AS total_work_records,  -- Count of work records for each employee in the specified date range
-                    COALESCE(
-                        (
-                            -- Subquery: Sum the durations of work records for this employee that fall within the specified date range.
-                            -- It subtracts the start time from the end time for each record to calculate the interval, then sums these intervals.
-                            SELECT SUM(W2.endtime - W2.starttime)
-                            FROM Workrecord W2
-                            WHERE W2.employeeid = E.id
-                              AND W2.starttime >= $1 -- Start time of the date range, first parameter
-                              AND W2.endtime <= $2  -- End time of the date range, second parameter
-                        ),
-                        '0 seconds'::interval   -- If no work records exist in the date range, default to a zero-length interval.
-                    ) AS total_duration     -- Total duration (as an interval) of work within the date range.
+                    COALESCE(SUM(P.records), 0) AS total_work_records,  -- Count of work records for each employee in the specified date range
+                    COALESCE(SUM(P.duration), '0 seconds'::interval) AS total_duration     -- Total duration (as an interval) of work within the date range.
                 FROM Employee E
-                    LEFT JOIN Workrecord W ON       -- LEFT JOIN with date conditions ensures employees with no work records in this range are still included
-                        (E.id = W.employeeid 
-                            AND W.starttime >= $1   -- Start time of the date range, first parameter
-                            AND W.endtime <= $2)    -- End time of the date range, second parameter
+                    LEFT JOIN parts P ON (E.id = P.employeeid)   -- LEFT JOIN ensures employees with no work records in this range are still included
                 GROUP BY E.id, E.firstname, E.lastname
                 ORDER BY E.employeenum;
             """)
-            self.conn.commit()  # Commit the prepare command.
-        
-        # Handle exceptions if the prepare statement fails
-        except Exception as e:
-            self.conn.rollback()
-            print("Error preparing my_work_summary.")
-        
-        # Close the cursor object
-        finally:
-            cur.close()
-
 
     # Display brief description of the API for the API listing page.
     def display_brief(self, index):
@@ -75,6 +95,37 @@ class WorkSummaryAPI(APIEndpoint):
         print("-------------------------\n")
 
 
+    # Summarizes work records per employee for a date range
+    # params: startDate, endDate (YYYY-MM-DD or YYYY-MM-DD HH:MI, both required)
+    def run(self, params: dict, conn=None) -> APIResult:
+        _, (start_date, end_date), columns = self.list_query(params)
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor() # Create a cursor object for executing SQL commands
+
+            # Execute the prepared statement with the provided start and end date parameters
+            try:
+                statements.execute(cur, "my_work_summary", (start_date, end_date))
+                rows = cur.fetchall()
+
+            # Close the cursor object
+            finally:
+                cur.close()
+
+        return APIResult(columns, rows)
+
+
+    # The summary statement and its parameters, used by run() and export()
+    # params: startDate, endDate (both required)
+    def list_query(self, params: dict):
+        start_date = optional_text(params.get("startDate"))
+        end_date = optional_text(params.get("endDate"))
+        if not start_date or not end_date:
+            raise APIError("Start date and end date are required.")
+        return ("my_work_summary", (start_date, end_date),
+                ["employeeNum", "firstName", "lastName", "totalWorkRecords", "totalDuration"])
+
+
     # Function for executing the API and collecting user input for the date range.
     def execute(self):
         start_date = input("Enter start date (YYYY-MM-DD or YYYY-MM-DD HH:MI): ").strip()
@@ -85,25 +136,354 @@ class WorkSummaryAPI(APIEndpoint):
             print("Operation terminated by user.")
             return
 
-        cur = self.conn.cursor() # Create a cursor object for executing SQL commands
-        
-        # Execute the prepared statement with the provided start and end date parameters
         try:
-            cur.execute("EXECUTE my_work_summary(%s, %s);", (start_date, end_date))
-            rows = cur.fetchall()
-
-            print("\nemployeenum | first name | last name | total work records | total duration")
-            print("------------+-----------+----------+--------------------+---------------")
-
-            # Print the results of the query
-            for row in rows:
-                employeenum, firstname, lastname, total_work_records, total_duration = row
-                print(f"{employeenum:12} | {firstname:9} | {lastname:8} | {total_work_records:18} | {total_duration}")
+            rows = self.run({"startDate": start_date, "endDate": end_date}).rows
 
         # Print Error message if the query fails
         except Exception as e:
             print("Error executing my_work_summary.")
-        
-        # Close the cursor object
-        finally:
-            cur.close()
+            return
+
+        print("\nemployeenum | first name | last name | total work records | total duration")
+        print("------------+-----------+----------+--------------------+---------------")
+
+        # Print the results of the query
+        for row in rows:
+            employeenum, firstname, lastname, total_work_records, total_duration = row
+            print(f"{employeenum:12} | {firstname:9} | {lastname:8} | {total_work_records:18} | {total_duration}")
+
+
+
+# ---------------------------
+# BillingRunAPI
+# Description: Creates the invoices of every client for one billing period from the work
+#              records completed in it, priced at each service's RecurringService.price.
+# ---------------------------
+class BillingRunAPI(APIEndpoint):
+    name = "BillingRun"
+
+    COLUMNS = ["fromClientID", "toClientID", "billableClients", "invoicesCreated", "totalAmount"]
+
+    # Initialize class and register the billing statement
+    # One INSERT ... SELECT bills every client in the id range $3..$4 for the period $1..$2 (inclusive
+    # days): a work record is billed in the period its startTime falls in, once it has an endTime.
+    # Clients that already have an invoice for exactly this period are skipped, and the unique index
+    # from migration 0004 turns a concurrent duplicate into a no-op, so rerunning a period (e.g. after a
+    # failed partition) only creates the invoices still missing. Requires migration 0004.
+    # A service linked to several properties is billed once per work record, to the client of the
+    # property with the lowest propertyID, as GetServiceHistory attributes it. The owners are only
+    # computed for the services linked to the range's properties, so each parallel range reads its
+    # own part of RecurringServiceList instead of all of it.
+    def __init__(self, pool):
+        self.pool = pool
+        statements.register("bill_clients", ("date", "date", "int", "int", "int"), """
+            WITH owner AS (
+                SELECT o.recurringServiceID, MIN(o.propertyID) AS propertyID
+                FROM RecurringServiceList o
+                WHERE o.recurringServiceID IN (SELECT rsl.recurringServiceID
+                                               FROM Property p
+                                                   JOIN RecurringServiceList rsl ON rsl.propertyID = p.id
+                                               WHERE p.clientID BETWEEN $3 AND $4)
+                GROUP BY o.recurringServiceID
+            ),
+            billable AS (
+                SELECT p.clientID, SUM(rs.price) AS totalAmount, MIN(wr.id) AS workRecordID
+                FROM WorkRecord wr
+                    JOIN RecurringService rs ON rs.id = wr.recurringServiceID
+                    JOIN owner o ON o.recurringServiceID = rs.id
+                    JOIN Property p ON p.id = o.propertyID
+                WHERE wr.startTime >= $1 AND wr.startTime < $2 + 1
+                    AND wr.endTime IS NOT NULL
+                    AND p.clientID BETWEEN $3 AND $4
+                GROUP BY p.clientID
+            ),
+            created AS (
+                INSERT INTO Invoice (clientID, invoiceNumber, totalAmount, workRecordID, periodStart, periodEnd,
+                                     dueDate, invoiceDate, invoiceStandingID)
+                SELECT b.clientID, 'INV' || LPAD(nextval('invoice_num_seq')::TEXT, 4, '0'), b.totalAmount,
+                       b.workRecordID, $1, $2, CURRENT_DATE + $5, CURRENT_DATE, 'G'
+                FROM billable b
+                WHERE NOT EXISTS (SELECT 1 FROM Invoice i
+                                  WHERE i.clientID = b.clientID AND i.periodStart = $1 AND i.periodEnd = $2)
+                ON CONFLICT (clientID, periodStart, periodEnd) DO NOTHING
+                RETURNING totalAmount
+            )
+            SELECT $3, $4, (SELECT count(*) FROM billable), count(*), COALESCE(SUM(totalAmount), 0::money)
+            FROM created;
+            """)
+
+    # Display brief description of the API for the API listing page.
+    def display_brief(self, index):
+        print(f"{index}. BillingRun - Creates the invoices of every client for a billing period.")
+
+    # Display detailed information about the API.
+    def display_details(self):
+        print("\n--- BillingRun ---")
+        print("Description: Invoices every client for the work records completed in a billing period,")
+        print("at the price of each recurring service. Running a period again only creates missing invoices.")
+        print("Parameters:")
+        print("\t- period (YYYY-MM): Bill one calendar month, or")
+        print("\t- periodStart, periodEnd (YYYY-MM-DD): First and last day of the period")
+        print(f"\t- partitions (number, optional): Client ranges billed in parallel (default {BILLING_PARTITIONS})")
+        print(f"\t- dueDays (number, optional): Days until the invoices are due (default {INVOICE_DUE_DAYS})")
+        print("Returns: per client range, the clients with billable work, the invoices created and their total.")
+        print("Example: period = '2025-01'")
+        print("-------------------------\n")
+
+    # Bills every client for the period, one client range per connection
+    # params: period (YYYY-MM) or periodStart and periodEnd, optional partitions and dueDays
+    # With a caller connection the ranges run one after another in the caller's transaction.
+    def run(self, params: dict, conn=None) -> APIResult:
+        period_start, period_end = self._period(params)
+        partitions = parse_int(params.get("partitions"), "Partitions", BILLING_PARTITIONS)
+        due_days = parse_int(params.get("dueDays"), "Due days", INVOICE_DUE_DAYS)
+        if partitions < 1 or due_days < 0:
+            raise APIError("Partitions must be at least 1 and due days at least 0.")
+
+        ranges = self._client_ranges(partitions, conn)
+        jobs = [(period_start, period_end, low, high, due_days) for low, high in ranges]
+        if conn is not None or len(jobs) < 2:
+            rows = [self._bill(job, conn) for job in jobs]
+        else:
+            # Each range commits on its own; a failed range is billed by simply running the period again
+            with ThreadPoolExecutor(max_workers=min(len(jobs), self.pool.maxconn)) as executor:
+                rows = list(executor.map(self._bill, jobs))
+
+        created = sum(row[3] for row in rows)
+        skipped = sum(row[2] for row in rows) - created
+        message = f"Created {created} invoice(s) for {period_start} to {period_end}."
+        if skipped:
+            message += f" {skipped} client(s) already had an invoice for this period."
+        return APIResult(self.COLUMNS, rows, message)
+
+    # The billing period: a calendar month or an explicit first/last day
+    def _period(self, params):
+        month = optional_text(params.get("period"))
+        if month:
+            try:
+                first = datetime.datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
+                raise APIError("Period must be a month (YYYY-MM).")
+            return first, first.replace(day=calendar.monthrange(first.year, first.month)[1])
+        start = parse_date(params.get("periodStart"), "Period start")
+        end = parse_date(params.get("periodEnd"), "Period end")
+        if start is None or end is None:
+            raise APIError("A period (YYYY-MM) or a period start and end are required.")
+        if start > end:
+            raise APIError("Period start must be on or before period end.")
+        return start, end
+
+    # Split the client ids into up to partitions contiguous, equally wide ranges
+    def _client_ranges(self, partitions, conn=None):
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT MIN(id), MAX(id) FROM Client;")
+                low, high = cur.fetchone()
+            finally:
+                cur.close()
+        if low is None:
+            return []
+        width = -(-(high - low + 1) // partitions)
+        return [(start, min(start + width - 1, high)) for start in range(low, high + 1, width)]
+
+    # Bill one client range; returns its result row
+    def _bill(self, job, conn=None):
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                statements.execute(cur, "bill_clients", job)
+                return cur.fetchone()
+            except (errors.UndefinedTable, errors.InvalidColumnReference):
+                raise APIError("Billing needs migration 0004: run migrate.py first.")
+            finally:
+                cur.close()
+
+    # Function for executing the API and collecting the billing period.
+    def execute(self):
+        period = input("Enter billing month (YYYY-MM), or leave blank to enter start and end days: ").strip()
+        if period.lower() == "quit":
+            print("Operation terminated by user.")
+            return
+        params = {"period": period}
+        if not period:
+            params = {"periodStart": input("Enter period start (YYYY-MM-DD): ").strip(),
+                      "periodEnd": input("Enter period end (YYYY-MM-DD): ").strip()}
+            if "quit" in (value.lower() for value in params.values()):
+                print("Operation terminated by user.")
+                return
+
+        try:
+            result = self.run(params)
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except Exception as e:
+            print("Error executing bill_clients.")
+            return
+
+        print("\nclient ids      | billable clients | invoices created | total amount")
+        print("----------------+------------------+------------------+-------------")
+        for low, high, billable, created, total in result.rows:
+            print(f"{f'{low}-{high}':15} | {billable:16} | {created:16} | {total}")
+        print(result.message)
+
+
+
+# ---------------------------
+# PayrollAPI (List API)
+# Description: Computes the gross pay of every employee for each pay period in a date range
+#              from the time worked on their work records and their hourly wage.
+# ---------------------------
+class PayrollAPI(APIEndpoint):
+    name = "Payroll"
+
+    COLUMNS = ["periodStart", "periodEnd", "employeeNum", "firstName", "lastName", "hourlyWage",
+               "workRecords", "hoursWorked", "grossPay", "openRecords", "deactivatedDate"]
+
+    # Initialize class and register the pay run statement
+    # $1/$2: first and last day (inclusive) of the pay run, $3: days per pay period.
+    # Time is paid in the period it was worked: a record crossing a period boundary is clipped and
+    # each period pays its own part, while midnight inside a period needs no special case.
+    # As in WorkSummary, records that start and end inside a period are read from
+    # WorkRecordDailyRollup, so only the records crossing a boundary or still open are read from
+    # WorkRecord; all parts are then totalled per employee and period in one aggregate.
+    # Employees are listed for a period when they worked in it or were employed during it, so an
+    # employee deactivated mid-period gets a final row. Open records (no endTime) are not paid yet
+    # and are counted in openRecords instead.
+    def __init__(self, pool):
+        self.pool = pool
+        statements.register("payroll", ("date", "date", "int"), """
+            WITH periods AS (
+                SELECT s AS periodStart,
+                       -- First midnight after the period
+                       LEAST(s + make_interval(days => $3), $2 + interval '1 day') AS periodNext
+                FROM generate_series($1::timestamp, $2::timestamp, make_interval(days => $3)) AS s
+            ),
+            parts AS (
+                -- Records that start and end on days inside the period
+                SELECT P.periodStart, R.employeeID, R.recordCount AS records, R.totalDuration AS duration,
+                       0 AS openRecords
+                FROM periods P
+                    JOIN WorkRecordDailyRollup R ON R.startDate >= P.periodStart AND R.endDate < P.periodNext
+                UNION ALL
+                -- Records that start in the period and end after it: paid up to the period end
+                SELECT P.periodStart, W.employeeID, 1, P.periodNext - W.startTime, 0
+                FROM periods P
+                    JOIN WorkRecord W ON W.startTime >= P.periodStart AND W.startTime < P.periodNext
+                                     AND W.endTime >= P.periodNext
+                UNION ALL
+                -- Records that started before the period and end in or after it: paid from the period start
+                -- (their span contains periodStart; found with idx_workrecord_span, migration 0009)
+                SELECT P.periodStart, W.employeeID, 1, LEAST(W.endTime, P.periodNext) - P.periodStart, 0
+                FROM periods P
+                    JOIN WorkRecord W ON tsrange(LEAST(W.startTime, W.endTime), W.endTime) @> P.periodStart
+                                     AND W.startTime < P.periodStart AND W.endTime IS NOT NULL
+                UNION ALL
+                -- Records still open, in every period from the one they started in (idx_workrecord_open)
+                SELECT P.periodStart, W.employeeID, 0, interval '0', 1
+                FROM periods P
+                    JOIN WorkRecord W ON W.startTime < P.periodNext AND W.endTime IS NULL
+            ),
+            worked AS (
+                SELECT periodStart, employeeID, SUM(records) AS records,
+                       EXTRACT(EPOCH FROM SUM(duration))::numeric / 3600 AS hours, SUM(openRecords) AS openRecords
+                FROM parts
+                GROUP BY periodStart, employeeID
+            )
+            SELECT P.periodStart::date, (P.periodNext - interval '1 day')::date AS periodEnd,
+                   E.employeeNum, E.firstName, E.lastName, E.hourlyWage,
+                   COALESCE(W.records, 0) AS workRecords,
+                   ROUND(COALESCE(W.hours, 0), 2) AS hoursWorked,
+                   ROUND(E.hourlyWage::numeric * COALESCE(W.hours, 0), 2)::money AS grossPay,
+                   COALESCE(W.openRecords, 0) AS openRecords,
+                   E.deactivatedDate
+            FROM periods P
+                CROSS JOIN Employee E
+                LEFT JOIN worked W ON W.periodStart = P.periodStart AND W.employeeID = E.id
+            WHERE W.employeeID IS NOT NULL
+               OR (E.hireDate < P.periodNext AND (E.deactivatedDate IS NULL OR E.deactivatedDate >= P.periodStart))
+            ORDER BY P.periodStart, E.employeeNum;
+            """)
+
+    # Display brief description of the API for the API listing page.
+    def display_brief(self, index):
+        print(f"{index}. Payroll - Computes gross pay per employee and pay period from work records and hourly wages.")
+
+    # Display detailed information about the API.
+    def display_details(self):
+        print("\n--- Payroll ---")
+        print("Description: Gross pay of every employee for each pay period, from the time worked on work records")
+        print("times the hourly wage. Work crossing a period boundary is paid in the period it was worked.")
+        print("Employees deactivated during a period are included; open work records are counted, not paid.")
+        print("Parameters:")
+        print("\t- periodStart (date, format: YYYY-MM-DD): First day of the pay run")
+        print("\t- periodEnd (date, format: YYYY-MM-DD): Last day of the pay run")
+        print("\t- periodDays (number, optional): Days per pay period, e.g. 14 (default: the whole range)")
+        print("Example: periodStart = '2025-01-01', periodEnd = '2025-01-28', periodDays = 14")
+        print("-------------------------\n")
+
+    # Gross pay per employee and pay period
+    # params: periodStart, periodEnd (required), periodDays
+    def run(self, params: dict, conn=None) -> APIResult:
+        name, args, columns = self.list_query(params)
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                statements.execute(cur, name, args)
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+
+        return APIResult(columns, rows)
+
+    # The pay run statement and its parameters, used by run() and export()
+    # params: periodStart, periodEnd (required), periodDays
+    def list_query(self, params: dict):
+        start = parse_date(params.get("periodStart"), "Period start")
+        end = parse_date(params.get("periodEnd"), "Period end")
+        if start is None or end is None:
+            raise APIError("Period start and period end are required.")
+        if start > end:
+            raise APIError("Period start must be on or before period end.")
+        days = parse_int(params.get("periodDays"), "Period days", (end - start).days + 1)
+        if days < 1:
+            raise APIError("Period days must be at least 1.")
+        return "payroll", (start, end, days), self.COLUMNS
+
+    # Function for executing the API: prints the pay run or writes it to a CSV file
+    def execute(self):
+        params = {
+            "periodStart": input("Enter first day of the pay run (YYYY-MM-DD): ").strip(),
+            "periodEnd": input("Enter last day of the pay run (YYYY-MM-DD): ").strip(),
+            "periodDays": input("Enter days per pay period (leave blank for one period): ").strip(),
+        }
+        if any(value.lower() == "quit" for value in params.values()):
+            print("Operation terminated by user.")
+            return
+        path = input("Enter a CSV file to write the pay run to (leave blank to print it): ").strip()
+
+        try:
+            if path:
+                with open(path, "w", encoding="utf-8", newline="") as out:
+                    count = self.export(params, out)
+                print(f"Wrote {count} row(s) to {path}.")
+                return
+            rows = self.run(params).rows
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except OSError as e:
+            print("Error writing file:", e)
+            return
+        except Exception as e:
+            print("Error executing payroll.")
+            return
+
+        print("\nperiod start | employeenum | first name | last name | hours   | gross pay   | open | deactivated")
+        print("-------------+-------------+------------+-----------+---------+-------------+------+------------")
+        for (period_start, _, employeenum, firstname, lastname, _, _, hours, gross_pay, open_records,
+             deactivated) in rows:
+            print(f"{period_start!s:12} | {employeenum:11} | {firstname:10} | {lastname:9} | {hours!s:>7} | "
+                  f"{gross_pay:>11} | {open_records:4} | {deactivated or ''}")
@@ -0,0 +1,148 @@
+# loadtest.py
+
+import argparse
+import asyncio
+import itertools
+import math
+import sys
+import time
+from urllib.parse import urlencode
+
+from batch import read_calls
+
+
+# ---------------------------
+# Load test for server.py
+# Opens --concurrency keep-alive connections and sends API calls back-to-back for --duration
+# seconds, then prints requests/sec and latency percentiles for each endpoint.
+#
+# Calls come from a JSON-lines file in the batch format ({"api": ..., "params": {...}}), or
+# from DEFAULT_CALLS, a read-only mix that works against the sample data in landscapingdb.txt.
+# Calls are sent as GET with a query string, so only read-only APIs should be load tested
+# against a database you care about.
+# ---------------------------
+
+DEFAULT_CALLS = [
+    ("ListClients", {}),
+    ("RetrieveClient", {"accountNumber": "C0001"}),
+    ("ListProperties", {}),
+    ("ListAssignedServices", {"propertyNumber": "P001"}),
+    ("ListEmployees", {}),
+    ("GetServiceHistory", {"accountNumber": "C0001"}),
+]
+
+
+# Latency statistics for one endpoint
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []     # seconds, successful and failed requests alike
+        self.errors = 0
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+
+# Send one request on an open connection and return the HTTP status
+async def send(reader, writer, host, api, params):
+    query = urlencode({key: "" if value is None else str(value).lower() if isinstance(value, bool) else value
+                       for key, value in params.items()})
+    target = f"/api/{api}?{query}" if query else f"/api/{api}"
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection.")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value.strip())
+    await reader.readexactly(length)
+    return status
+
+
+# One simulated client: keeps one connection open and cycles through the calls until the deadline
+async def worker(host, port, calls, deadline, stats):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for api, params in calls:
+            if time.monotonic() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                status = await send(reader, writer, host, api, params)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                stats[api].errors += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            stats[api].latencies.append(time.perf_counter() - started)
+            if status != 200:
+                stats[api].errors += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, calls, concurrency, duration):
+    stats = {api: EndpointStats() for api, _ in calls}
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    # Offset each worker into the call list so every endpoint is in flight from the start
+    await asyncio.gather(*(
+        worker(host, port, itertools.islice(itertools.cycle(calls), i, None), deadline, stats)
+        for i in range(concurrency)
+    ))
+    return stats, time.monotonic() - started
+
+
+def print_report(stats, elapsed, out=sys.stdout):
+    print(f"{'API':<24} {'Requests':>9} {'Errors':>7} {'Req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}", file=out)
+    print("-" * 79, file=out)
+    total = errors = 0
+    for api, s in sorted(stats.items()):
+        count = len(s.latencies)
+        total += count
+        errors += s.errors
+        print(f"{api:<24} {count:>9} {s.errors:>7} {count / elapsed:>9.1f} "
+              f"{s.percentile(50) * 1000:>8.1f} {s.percentile(99) * 1000:>8.1f} {s.percentile(100) * 1000:>8.1f}",
+              file=out)
+    print("-" * 79, file=out)
+    print(f"{'Total':<24} {total:>9} {errors:>7} {total / elapsed:>9.1f}", file=out)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the LandscapingDB HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1", help="Server address (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8080, help="Server port (default: 8080).")
+    parser.add_argument("--concurrency", type=int, default=20, help="Simultaneous connections (default: 20).")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run (default: 10).")
+    parser.add_argument("--calls", metavar="CALLS.jsonl",
+                        help="JSON-lines file of calls to cycle through (default: a read-only mix).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.calls:
+        calls = [(name, params) for _, name, params, error in read_calls(args.calls) if error is None]
+        if not calls:
+            print("No valid calls in", args.calls)
+            return
+    else:
+        calls = DEFAULT_CALLS
+
+    stats, elapsed = asyncio.run(run_load(args.host, args.port, calls, max(1, args.concurrency), args.duration))
+    print_report(stats, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# lookups.py
+
+import threading
+from types import MappingProxyType
+
+from api_endpoint import APIError
+
+# ---------------------------
+# LookupCache
+# The small domain tables (service types, order statuses, frequencies, states and property
+# types) only change when their seed data does, so they are read once per process, in one
+# round trip, into read-only mappings of code -> name. Endpoints validate codes against the
+# cache before touching the database and build their help text from it. refresh() reloads
+# every table after the codes were edited; readers keep the old snapshot until the swap.
+# ---------------------------
+
+LOOKUP_TABLES = ("ServiceType", "OrderStatus", "FrequencyType", "State", "PropertyType")
+
+
+class LookupCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None     # table name -> read-only {code: name}, replaced whole on refresh
+
+    # Every cached table, loaded on first use
+    # conn lets a caller already holding a connection (e.g. batch mode) load through it
+    def tables(self, pool, conn=None):
+        tables = self._tables
+        if tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = self._load(pool, conn)
+                tables = self._tables
+        return tables
+
+    # Reload every table from the database
+    def refresh(self, pool, conn=None):
+        tables = self._load(pool, conn)
+        with self._lock:
+            self._tables = tables
+        return tables
+
+    # Read-only {code: name} for one table, in table order
+    def codes(self, pool, table, conn=None):
+        return self.tables(pool, conn)[table]
+
+    # Normalize a code (trimmed, upper case) and check that it exists; raises APIError otherwise
+    # A missing optional code is returned as None
+    def validate(self, pool, table, code, field, required=False, conn=None):
+        if code is None or not str(code).strip():
+            if required:
+                raise APIError(f"{field} is required.")
+            return None
+        code = str(code).strip().upper()
+        codes = self.codes(pool, table, conn)
+        if code not in codes:
+            raise APIError(f"Invalid {field} '{code}'. Options: {self.options(pool, table)}.")
+        return code
+
+    # "L: Lawncare" lines for display_details()
+    def describe(self, pool, table):
+        return [f"{code}: {name}" for code, name in self.codes(pool, table).items()]
+
+    # "L for Lawncare, T for Tree Trimming, ..." for input prompts
+    def options(self, pool, table):
+        return ", ".join(f"{code} for {name}" for code, name in self.codes(pool, table).items())
+
+    # One UNION ALL query over every table; ids are CHAR(2), so the padding is trimmed
+    def _load(self, pool, conn=None):
+        query = "\nUNION ALL\n".join(f"SELECT '{table}', id, name FROM {table}" for table in LOOKUP_TABLES)
+        if conn is not None:
+            rows = self._fetch(conn, query)
+        else:
+            with pool.connection() as conn:
+                rows = self._fetch(conn, query)
+                conn.commit()
+        loaded = {table: {} for table in LOOKUP_TABLES}
+        for table, code, name in rows:
+            loaded[table][code.strip()] = name
+        return MappingProxyType({table: MappingProxyType(codes) for table, codes in loaded.items()})
+
+    @staticmethod
+    def _fetch(conn, query):
+        cur = conn.cursor()
+        try:
+            cur.execute(query + ";")
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+
+# The process-wide cache shared by every endpoint module
+cache = LookupCache()
+
+
+def validate(pool, table, code, field, required=False, conn=None):
+    return cache.validate(pool, table, code, field, required, conn)
+
+
+def describe(pool, table):
+    return cache.describe(pool, table)
+
+
+def options(pool, table):
+    return cache.options(pool, table)
+
+
+def refresh(pool, conn=None):
+    return cache.refresh(pool, conn)
@@ -0,0 +1,200 @@
+# migrate.py
+
+import argparse
+import json
+import os
+import re
+import sys
+
+import psycopg2
+
+from apis import get_all_apis
+from config import DB_CONFIG
+from db_pool import ConnectionPool
+from statements import registry
+
+
+# ---------------------------
+# Versioned schema migrations
+#
+# landscapingdb.txt creates a fresh database once. Changes to an existing database are
+# shipped as numbered SQL files in migrations/ (NNNN_description.sql) and applied in order
+# by this runner. Every migration runs in its own transaction together with the row that
+# records it in SchemaMigration, so a failed migration leaves nothing behind and an
+# applied one is never run twice. Migrations are also written to be idempotent
+# (CREATE ... IF NOT EXISTS) so they are safe on databases that already have the change.
+#
+#   python3 migrate.py              apply pending migrations
+#   python3 migrate.py --status     list applied and pending migrations
+#   python3 migrate.py --verify     EXPLAIN each endpoint's statement and check it uses its index
+# ---------------------------
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Arbitrary key for the advisory lock that keeps two runners from migrating at once
+MIGRATION_LOCK_KEY = 475_2025
+
+# Statements whose plans must use one of the given indexes: (API, statement, sample params, indexes)
+INDEX_CHECKS = [
+    ("ListProperties", "list_properties", (None, None, "C0001"), ("idx_property_client",)),
+    ("UpdateClientProperties", "update_properties", ("C0001", True), ("idx_property_client",)),
+    ("WorkSummary", "my_work_summary", ("2025-01-05 12:00", "2025-01-23 12:00"),
+     ("idx_workrecord_start", "idx_workrecord_end")),
+    ("GetServiceHistory", "service_history", ("C0001",),
+     ("idx_property_client", "idx_workrecord_service")),
+    ("ListClients", "list_clients_after", (None, "Lastname1", "Client1", "C0001", 11), ("idx_client_name",)),
+    ("Payroll", "payroll", ("2025-01-01", "2025-06-30", 14), ("idx_workrecord_span",)),
+    ("BillingRun", "bill_clients", ("2025-01-01", "2025-01-31", 1, 2147483647, 30), ("idx_workrecord_start",)),
+]
+
+
+# Migrations on disk, as a sorted list of (version, name, path)
+def find_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Two migration files share a version number.")
+    return migrations
+
+
+def ensure_migration_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS SchemaMigration (
+                version     INT         PRIMARY KEY,
+                name        TEXT        NOT NULL,
+                appliedAt   TIMESTAMP   NOT NULL DEFAULT now()
+            );
+        """)
+    conn.commit()
+
+
+# Versions already applied -> time applied
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, appliedAt FROM SchemaMigration ORDER BY version;")
+        rows = cur.fetchall()
+    conn.commit()
+    return dict(rows)
+
+
+# Apply every pending migration in version order; returns the number applied
+def migrate(conn, out=sys.stdout):
+    ensure_migration_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_KEY,))
+    conn.commit()
+    try:
+        applied = applied_versions(conn)
+        count = 0
+        for version, name, path in find_migrations():
+            if version in applied:
+                continue
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute("INSERT INTO SchemaMigration (version, name) VALUES (%s, %s);", (version, name))
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                print(f"Migration {version:04d} {name} failed; nothing from it was applied.", file=out)
+                raise
+            print(f"Applied {version:04d} {name}", file=out)
+            count += 1
+        return count
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_KEY,))
+        conn.commit()
+
+
+def print_status(conn, out=sys.stdout):
+    ensure_migration_table(conn)
+    applied = applied_versions(conn)
+    for version, name, _ in find_migrations():
+        state = f"applied {applied[version]:%Y-%m-%d %H:%M}" if version in applied else "pending"
+        print(f"{version:04d} {name:<40} {state}", file=out)
+
+
+# Index names used anywhere in an EXPLAIN (FORMAT JSON) plan
+def plan_indexes(node):
+    found = set()
+    if isinstance(node, dict):
+        if "Index Name" in node:
+            found.add(node["Index Name"])
+        for value in node.values():
+            found |= plan_indexes(value)
+    elif isinstance(node, list):
+        for value in node:
+            found |= plan_indexes(value)
+    return found
+
+
+# EXPLAIN each checked statement and report whether its plan uses an expected index
+# Sequential scans are disabled for the check: on small (sample) tables the planner rightly
+# prefers them, and the question here is whether an index exists that the query can use.
+# Returns True when every check passes.
+def verify(pool, conn, out=sys.stdout):
+    get_all_apis(pool)      # endpoints register their statements when constructed
+    passed = True
+    for api_name, statement, params, expected in INDEX_CHECKS:
+        registry.ensure(conn, statement)
+        placeholders = ", ".join(["%s"] * len(params))
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off;")
+            cur.execute(f"EXPLAIN (FORMAT JSON) EXECUTE {statement}({placeholders});", params)
+            plan = cur.fetchone()[0]
+        conn.rollback()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        used = plan_indexes(plan)
+        ok = bool(used.intersection(expected))
+        passed = passed and ok
+        print(f"{'OK  ' if ok else 'FAIL'} {api_name:<24} {statement:<24} "
+              f"uses: {', '.join(sorted(used)) or 'no index'}", file=out)
+    return passed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply LandscapingDB schema migrations.")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations.")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check with EXPLAIN that each endpoint's statement uses its index.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        dbPool = ConnectionPool(DB_CONFIG)
+    except psycopg2.Error as e:
+        print("Error connecting to database:", e)
+        return 1
+
+    try:
+        with dbPool.connection() as conn:
+            if args.status:
+                print_status(conn)
+            elif args.verify:
+                return 0 if verify(dbPool, conn) else 1
+            else:
+                count = migrate(conn)
+                print(f"{count} migration(s) applied." if count else "Database is up to date.")
+    except psycopg2.Error as e:
+        print("Migration error:", str(e).strip())
+        return 1
+    finally:
+        dbPool.closeall()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
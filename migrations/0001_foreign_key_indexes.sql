@@ -0,0 +1,21 @@
+-- 0001: Indexes on foreign keys and lookup columns used by the API endpoints
+-- PostgreSQL indexes primary keys and UNIQUE columns only; these cover the joins and filters
+-- of ListProperties, UpdateClientProperties, WorkSummary and GetServiceHistory.
+
+-- ListProperties (filter by owner) and UpdateClientProperties (update all of a client's properties)
+CREATE INDEX IF NOT EXISTS idx_property_client ON Property (clientID);
+
+-- WorkSummary: per-employee totals and the partial first/last day of a date range
+CREATE INDEX IF NOT EXISTS idx_workrecord_employee ON WorkRecord (employeeID);
+CREATE INDEX IF NOT EXISTS idx_workrecord_start ON WorkRecord (startTime);
+CREATE INDEX IF NOT EXISTS idx_workrecord_end ON WorkRecord (endTime);
+
+-- GetServiceHistory: work records of a service, and the properties a service is attached to
+CREATE INDEX IF NOT EXISTS idx_workrecord_service ON WorkRecord (recurringServiceID);
+CREATE INDEX IF NOT EXISTS idx_recurringservicelist_service ON RecurringServiceList (recurringServiceID);
+
+-- Invoices of a client
+CREATE INDEX IF NOT EXISTS idx_invoice_client ON Invoice (clientID);
+
+-- ListClients name order / keyset pagination (also in landscapingdb.txt for new databases)
+CREATE INDEX IF NOT EXISTS idx_client_name ON Client (lastName, firstName, accountNumber);
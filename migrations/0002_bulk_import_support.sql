@@ -0,0 +1,45 @@
+-- 0002: Support for bulk_import.py
+
+-- The sample data inserts explicit ids without advancing the SERIAL sequences, so the first
+-- generated id would collide with an existing row. Move each sequence past the current maximum.
+SELECT setval(pg_get_serial_sequence('client', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM Client;
+SELECT setval(pg_get_serial_sequence('property', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM Property;
+SELECT setval(pg_get_serial_sequence('workrecord', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM WorkRecord;
+SELECT setval(pg_get_serial_sequence('invoice', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM Invoice;
+
+-- Input checks for staged CSV text, so a bad value rejects its row instead of failing the whole import
+CREATE OR REPLACE FUNCTION is_valid_timestamp(value TEXT) RETURNS BOOLEAN AS $$
+BEGIN
+    PERFORM value::timestamp;
+    RETURN TRUE;
+EXCEPTION WHEN others THEN
+    RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION is_valid_interval(value TEXT) RETURNS BOOLEAN AS $$
+BEGIN
+    PERFORM value::interval;
+    RETURN TRUE;
+EXCEPTION WHEN others THEN
+    RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION is_valid_money(value TEXT) RETURNS BOOLEAN AS $$
+BEGIN
+    PERFORM value::money;
+    RETURN TRUE;
+EXCEPTION WHEN others THEN
+    RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION is_valid_boolean(value TEXT) RETURNS BOOLEAN AS $$
+BEGIN
+    PERFORM value::boolean;
+    RETURN TRUE;
+EXCEPTION WHEN others THEN
+    RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
@@ -0,0 +1,29 @@
+-- 0003: Change notifications for the client cache (client_cache.py)
+
+-- Every statement that updates or deletes clients sends NOTIFY client_changed with each
+-- affected account number (the old one, in case it was changed), delivered when the
+-- transaction commits. Statements touching more than 100 clients send a single '*' instead,
+-- which tells listeners to empty their cache rather than receive thousands of messages.
+-- New clients need no notification: the cache never holds an account that does not exist.
+CREATE OR REPLACE FUNCTION notify_client_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF (SELECT count(*) FROM old_rows) > 100 THEN
+        PERFORM pg_notify('client_changed', '*');
+    ELSE
+        PERFORM pg_notify('client_changed', accountNumber) FROM old_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS client_notify_update ON Client;
+CREATE TRIGGER client_notify_update
+AFTER UPDATE ON Client
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_client_change();
+
+DROP TRIGGER IF EXISTS client_notify_delete ON Client;
+CREATE TRIGGER client_notify_delete
+AFTER DELETE ON Client
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_client_change();
@@ -0,0 +1,12 @@
+-- 0004: Support for the billing run (BillingRunAPI in financialmanagement.py)
+
+-- Invoice numbers (INV + at least 4 digits) come from a sequence, so billing partitions running
+-- on several connections never hand out the same number. Start past every existing INVnnnn.
+CREATE SEQUENCE IF NOT EXISTS invoice_num_seq START WITH 1 INCREMENT BY 1;
+SELECT setval('invoice_num_seq',
+              COALESCE((SELECT MAX(substring(invoiceNumber FROM 4)::BIGINT) FROM Invoice
+                        WHERE invoiceNumber ~ '^INV[0-9]+$'), 0) + 1, false);
+
+-- One invoice per client and billing period: makes a billing run idempotent, since a rerun of
+-- the same period skips (and, under concurrency, conflicts on) the clients already invoiced
+CREATE UNIQUE INDEX IF NOT EXISTS idx_invoice_client_period ON Invoice (clientID, periodStart, periodEnd);
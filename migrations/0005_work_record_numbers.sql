@@ -0,0 +1,15 @@
+-- 0005: Support for clock-in/clock-out (workrecordmanagement.py)
+
+-- Work record numbers (WR + at least 4 digits) are generated by the database, so check-ins
+-- inserted from several connections never collide. Start past every existing WRnnnn.
+CREATE SEQUENCE IF NOT EXISTS work_record_num_seq START WITH 1 INCREMENT BY 1;
+SELECT setval('work_record_num_seq',
+              COALESCE((SELECT MAX(substring(workRecordNum FROM 3)::BIGINT) FROM WorkRecord
+                        WHERE workRecordNum ~ '^WR[0-9]+$'), 0) + 1, false);
+
+-- A column default rather than a trigger: it costs nothing per row and COPY applies it too
+ALTER TABLE WorkRecord
+    ALTER COLUMN workRecordNum SET DEFAULT 'WR' || LPAD(nextval('work_record_num_seq')::TEXT, 4, '0');
+
+-- Open records (clocked in, not yet out) per employee: ClockIn refuses a second one, ClockOut closes it
+CREATE INDEX IF NOT EXISTS idx_workrecord_open ON WorkRecord (employeeID) WHERE endTime IS NULL;
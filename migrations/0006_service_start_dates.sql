@@ -0,0 +1,16 @@
+-- 0006: Support for the visit schedule (schedule.py, VisitSchedule in servicemanagement.py)
+
+-- The day an assignment's visits are counted from. Weekly and biweekly visits fall on the same
+-- weekday as this date, monthly and quarterly ones on its day of the month.
+ALTER TABLE RecurringServiceList ADD COLUMN IF NOT EXISTS startDate DATE;
+
+-- Existing assignments keep the rhythm of their first recorded visit; unvisited ones start today
+UPDATE RecurringServiceList rsl
+SET startDate = COALESCE((SELECT MIN(w.startTime)::date FROM WorkRecord w
+                          WHERE w.recurringServiceID = rsl.recurringServiceID), CURRENT_DATE)
+WHERE startDate IS NULL;
+
+-- New assignments (AssignRecurringService, bulk import) start on the day they are made
+ALTER TABLE RecurringServiceList
+    ALTER COLUMN startDate SET DEFAULT CURRENT_DATE,
+    ALTER COLUMN startDate SET NOT NULL;
@@ -0,0 +1,88 @@
+-- 0007: WorkRecordDailyRollup for databases created before it was added to landscapingdb.txt
+-- WorkSummary, Payroll and datagen.py read or rebuild this table. Same definitions as
+-- landscapingdb.txt, so running this on a fresh database changes nothing.
+
+-- Per-employee totals of finished work records, grouped by the day each record starts and ends
+CREATE TABLE IF NOT EXISTS WorkRecordDailyRollup (
+    employeeID      INT         NOT NULL,
+    startDate       DATE        NOT NULL,
+    endDate         DATE        NOT NULL,
+    recordCount     INT         NOT NULL,
+    totalDuration   INTERVAL    NOT NULL,
+
+    PRIMARY KEY     (employeeID, startDate, endDate)
+);
+
+-- Applies the rows changed by one INSERT/UPDATE/DELETE statement to the rollup.
+-- Statement-level with transition tables, so bulk loads cost one upsert per (employee, day) group.
+CREATE OR REPLACE FUNCTION apply_work_record_rollup() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO WorkRecordDailyRollup AS R (employeeID, startDate, endDate, recordCount, totalDuration)
+        SELECT employeeID, startTime::date, endTime::date, -COUNT(*), -SUM(endTime - startTime)
+        FROM old_rows
+        WHERE startTime IS NOT NULL AND endTime IS NOT NULL
+        GROUP BY employeeID, startTime::date, endTime::date
+        ON CONFLICT (employeeID, startDate, endDate) DO UPDATE
+            SET recordCount = R.recordCount + EXCLUDED.recordCount,
+                totalDuration = R.totalDuration + EXCLUDED.totalDuration;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO WorkRecordDailyRollup AS R (employeeID, startDate, endDate, recordCount, totalDuration)
+        SELECT employeeID, startTime::date, endTime::date, COUNT(*), SUM(endTime - startTime)
+        FROM new_rows
+        WHERE startTime IS NOT NULL AND endTime IS NOT NULL
+        GROUP BY employeeID, startTime::date, endTime::date
+        ON CONFLICT (employeeID, startDate, endDate) DO UPDATE
+            SET recordCount = R.recordCount + EXCLUDED.recordCount,
+                totalDuration = R.totalDuration + EXCLUDED.totalDuration;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Drop groups whose last record went away
+        DELETE FROM WorkRecordDailyRollup R
+        USING old_rows O
+        WHERE R.employeeID = O.employeeID
+          AND R.startDate = O.startTime::date
+          AND R.endDate = O.endTime::date
+          AND R.recordCount = 0;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuilds the rollup from scratch (e.g. after loading WorkRecord with triggers disabled)
+CREATE OR REPLACE FUNCTION refresh_work_record_rollup() RETURNS VOID AS $$
+BEGIN
+    DELETE FROM WorkRecordDailyRollup;
+    INSERT INTO WorkRecordDailyRollup (employeeID, startDate, endDate, recordCount, totalDuration)
+    SELECT employeeID, startTime::date, endTime::date, COUNT(*), SUM(endTime - startTime)
+    FROM WorkRecord
+    WHERE startTime IS NOT NULL AND endTime IS NOT NULL
+    GROUP BY employeeID, startTime::date, endTime::date;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS work_record_rollup_insert ON WorkRecord;
+CREATE TRIGGER work_record_rollup_insert
+AFTER INSERT ON WorkRecord
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_work_record_rollup();
+
+DROP TRIGGER IF EXISTS work_record_rollup_update ON WorkRecord;
+CREATE TRIGGER work_record_rollup_update
+AFTER UPDATE ON WorkRecord
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_work_record_rollup();
+
+DROP TRIGGER IF EXISTS work_record_rollup_delete ON WorkRecord;
+CREATE TRIGGER work_record_rollup_delete
+AFTER DELETE ON WorkRecord
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_work_record_rollup();
+
+-- Fill the rollup with the work records already in the database
+SELECT refresh_work_record_rollup();
@@ -0,0 +1,17 @@
+-- 0008: Enforce one open work record per employee (ClockIn in workrecordmanagement.py)
+
+-- Migration 0005 only indexed the open records, and ClockIn checked for one before inserting,
+-- which two concurrent inserts (separate processes, or a caller's transaction next to the
+-- check-in buffer) can both pass. A unique partial index makes the database refuse the second;
+-- ClockIn inserts with ON CONFLICT ... DO NOTHING and reports the skipped check-in.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM WorkRecord WHERE endTime IS NULL
+               GROUP BY employeeID HAVING count(*) > 1) THEN
+        RAISE EXCEPTION 'Some employees have more than one open work record (endTime IS NULL); '
+                        'close all but one per employee before applying this migration';
+    END IF;
+END $$;
+
+DROP INDEX IF EXISTS idx_workrecord_open;
+CREATE UNIQUE INDEX idx_workrecord_open ON WorkRecord (employeeID) WHERE endTime IS NULL;
@@ -0,0 +1,10 @@
+-- 0009: Index the time span of every work record (Payroll in financialmanagement.py)
+
+-- Payroll pays the part of a record that crosses into a pay period from the period start, so it
+-- needs the records with startTime < periodStart < endTime. A B-tree on startTime or endTime
+-- only bounds one side of that: a historical pay run would read every earlier (or every later)
+-- record. A GiST index on the span finds the records containing periodStart directly.
+-- LEAST() keeps a record whose endTime is before its startTime indexable (as an empty span,
+-- which contains nothing); open records (no endTime) get an unbounded span.
+CREATE INDEX IF NOT EXISTS idx_workrecord_span ON WorkRecord
+    USING gist (tsrange(LEAST(startTime, endTime), endTime));
@@ -5,25 +5,30 @@
 
 #propertymanagement.py
 
-from api_endpoint import APIEndpoint
+from api_endpoint import APIEndpoint, APIError, APIResult, after_commit, optional_text, parse_bool
+import schedule
+import statements
+
+# Columns returned by list_properties, in row order
+PROPERTY_COLUMNS = ["propertyNumber", "streetAddress", "streetAddress2", "city", "stateID", "zipcode",
+                    "activeStatus", "firstName", "lastName", "accountNumber"]
 
 # ---------------------------
 # ListPropertiesAPI (List API)
 # Author: Manuel Rodriguez
 # ---------------------------
 class ListPropertiesAPI(APIEndpoint):
+    name = "ListProperties"
+
     # Initialize Class Instance
-    def __init__(self, conn):
-        self.conn = conn            # Store the database connection
-        cur = self.conn.cursor()    # Create a cursor object for executing SQL statements
-        
-        # Prepare the SQL statement for listing properties
+    def __init__(self, pool):
+        self.pool = pool
+        # Register the SQL statement for listing properties
         # This statement explicitly selects the columns we want to display from Property and Client tables.
         # It filters by active status, city, and client account number using bind variables ($1, $2, and $3),
         # allowing for NULL values to disable filtering.
-        try:
-            cur.execute("""
-                PREPARE list_properties(boolean, text, text) AS
+        # It is prepared lazily the first time each connection executes it
+        statements.register("list_properties", ("boolean", "text", "text"), """
                 SELECT 
                     P.propertynumber,  -- unique identifier visible to the user
   	                P.streetaddress, 	
@@ -41,17 +46,6 @@ class ListPropertiesAPI(APIEndpoint):
                     AND ($2 IS NULL OR P.city = $2)
                     AND ($3 IS NULL OR C.accountnumber = $3);
             """)
-            self.conn.commit()  # Commit the prepare command
-
-        # Print error message if the prepare command fails
-        except Exception as e:
-            self.conn.rollback()
-            print("Error preparing list_properties PREPARE statement")
-        
-        # Close the cursor
-        finally:
-            cur.close()
-
 
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
@@ -70,38 +64,61 @@ class ListPropertiesAPI(APIEndpoint):
         print("-------------------------\n")
 
 
+    # Lists properties with their owner
+    # params: activeStatus, city, accountNumber (all optional, blank disables the filter)
+    def run(self, params: dict, conn=None) -> APIResult:
+        # Convert inputs to proper types: if empty, then use None (which becomes SQL NULL)
+        active_filter = parse_bool(params.get("activeStatus"), "Active status")
+        city_filter = optional_text(params.get("city"))
+        account_filter = optional_text(params.get("accountNumber"))
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()  # Create a cursor object for executing SQL statements
+            # Execute the prepared statement "list_properties" with parameters
+            try:
+                statements.execute(cur, "list_properties", (active_filter, city_filter, account_filter))
+                rows = cur.fetchall()
+            # Close the cursor
+            finally:
+                cur.close()
+
+        return APIResult(PROPERTY_COLUMNS, rows)
+
+
+    # The full property list for the given filters, used by stream() and export()
+    # params: activeStatus, city, accountNumber (all optional, blank disables the filter)
+    def list_query(self, params: dict):
+        active_filter = parse_bool(params.get("activeStatus"), "Active status")
+        city_filter = optional_text(params.get("city"))
+        account_filter = optional_text(params.get("accountNumber"))
+        return "list_properties", (active_filter, city_filter, account_filter), PROPERTY_COLUMNS
+
+
+    # Yields properties one row at a time through a server-side cursor (memory stays constant)
+    # params: activeStatus, city, accountNumber (all optional, blank disables the filter)
+    def stream(self, params: dict, conn=None):
+        name, args, _ = self.list_query(params)
+        return self.stream_statement(name, args, conn)
+
+
     # Function for executing API and collecting user input
     def execute(self):
         # Collect user input for filtering properties listed
-        filter_active = input("Enter active status filter (true/false or leave empty for all): ").strip().lower()
-        filter_city = input("Enter city filter (or leave empty for all): ").strip()
-        filter_account = input("Enter client account number filter (or leave empty for all): ").strip()
+        params = {
+            "activeStatus": input("Enter active status filter (true/false or leave empty for all): ").strip().lower(),
+            "city": input("Enter city filter (or leave empty for all): ").strip(),
+            "accountNumber": input("Enter client account number filter (or leave empty for all): ").strip(),
+        }
 
-        # Convert inputs to proper types: if empty, then use None (which becomes SQL NULL)
-        if filter_active == "":
-            active_filter = None
-        elif filter_active == "true":
-            active_filter = True
-        elif filter_active == "false":
-            active_filter = False
-        else:
+        try:
+            rows = self.stream(params)
+        except APIError:
             print("Invalid active status input. Use true, false, or leave empty for all.")
             return
 
-        # If city filter is empty, set it to None (no filtering by city)
-        city_filter = filter_city if filter_city != "" else None
-        # If client account number filter is empty, set it to None (no filtering by account number)
-        account_filter = filter_account if filter_account != "" else None
-
-        cur = self.conn.cursor()  # Create a cursor object for executing SQL statements
-        
-        # Execute the prepared statement "list_properties" with parameters
+        # Display Results as they arrive from the server
+        print("\nList of Properties:")
         try:
-            cur.execute("EXECUTE list_properties(%s, %s, %s);", (active_filter, city_filter, account_filter))
-            rows = cur.fetchall()
-            
-            # Display Results
-            print("\nList of Properties:")
             for row in rows:  # Iterate over the result rows
                 print(f"Property Number:\t{row[0]}")
                 print(f"Street Address:\t\t{row[1]}")
@@ -113,14 +130,10 @@ class ListPropertiesAPI(APIEndpoint):
                 print(f"Owner:\t\t\t{row[7]} {row[8]}")
                 print(f"Owner Account Number:\t{row[9]}")
                 print("\n")
-        
-        # Print error message if the execute command fails
+        # Print error message if the query fails
         except Exception as e:
             print("Error executing prepared statement:")
-       
-        # Close the cursor
-        finally:
-            cur.close()
+            return
 
 
 
@@ -130,14 +143,14 @@ class ListPropertiesAPI(APIEndpoint):
 # Author: Manuel Rodriguez 
 # ---------------------------
 class UpdateClientPropertiesAPI(APIEndpoint):
+    name = "UpdateClientProperties"
+
     # Initialize Class Instance
-    def __init__(self, conn):
-        self.conn = conn            # Store the database connection
-        cur = self.conn.cursor()    # Create a cursor object for executing SQL statements
-        # Prepare the SQL statement for updating properties
-        try:
-            cur.execute("""
-                PREPARE update_properties(text, boolean) AS
+    def __init__(self, pool):
+        self.pool = pool
+        # Register the SQL statement for updating properties
+        # It is prepared lazily the first time each connection executes it
+        statements.register("update_properties", ("text", "boolean"), """
                 UPDATE property
                 SET activestatus = $2
                 WHERE clientid = (
@@ -147,17 +160,6 @@ class UpdateClientPropertiesAPI(APIEndpoint):
                 )
                 RETURNING propertynumber, streetaddress, activestatus, 'UpdateProperties executed' AS explanation;
             """)
-            self.conn.commit()  # Commit the prepare command
-
-        # Print error message if the prepare command fails
-        except Exception as e:
-            self.conn.rollback()
-            print("Error preparing update_properties PREPARE statement")
-
-        # Close the cursor
-        finally:
-            cur.close()
-
 
     # Displays brief description of API for API Listing Page
     def display_brief(self, index):
@@ -175,46 +177,53 @@ class UpdateClientPropertiesAPI(APIEndpoint):
         print("-------------------------\n")
 
 
+    # Sets activeStatus on every property of one client
+    # params: accountNumber (required), activeStatus (required)
+    def run(self, params: dict, conn=None) -> APIResult:
+        account_number = optional_text(params.get("accountNumber"))
+        new_status = parse_bool(params.get("activeStatus"), "Active status")
+        # Validate the input for activeStatus
+        if new_status is None:
+            raise APIError("Invalid input for active status. Please enter true or false.")
+
+        # Try to update the properties; the transaction is rolled back if an error occurs
+        with self.transaction(conn) as conn:
+            cur = conn.cursor() # Create a cursor object for executing SQL statements
+            try:
+                # Execute the prepared statement "update_properties" with the given parameters
+                statements.execute(cur, "update_properties", (account_number, new_status))
+                updated_rows = cur.fetchall() # Fetch all the updated rows
+            # Close the cursor
+            finally:
+                cur.close()
+            # Visits to (de)activated properties appear or disappear from the visit schedule once committed
+            after_commit(conn, schedule.for_pool(self.pool).invalidate)
+
+        return APIResult(["propertyNumber", "streetAddress", "activeStatus", "explanation"], updated_rows,
+                         "Operation successful: Updated multiple records.")
+
+
     # Function for executing API
     def execute(self):
         # Collect user input for updating properties
-        account_number = input("Enter client account number to update properties: ").strip()
-        new_status_input = input("Enter new activeStatus (true/false): ").strip().lower()
-
-        # Validate the input for activeStatus
-        if new_status_input not in ["true", "false"]:
-            print("Invalid input for active status. Please enter true or false.")
-            return
-        new_status = True if new_status_input == "true" else False # Convert input to boolean
+        params = {
+            "accountNumber": input("Enter client account number to update properties: ").strip(),
+            "activeStatus": input("Enter new activeStatus (true/false): ").strip().lower(),
+        }
 
-        cur = self.conn.cursor() # Create a cursor object for executing SQL statements
-        
-        # Try to update the properties
         try:
-            cur.execute("BEGIN;") # Begin the transaction block
-            
-            # Execute the prepared statement "update_properties" with the given parameters
-            cur.execute("EXECUTE update_properties(%s, %s);", (account_number, new_status))
-            updated_rows = cur.fetchall() # Fetch all the updated rows
-            self.conn.commit() # Commit the transaction only if the entire operation succeeds
-            print("Operation successful: Updated multiple records.\n")
-            
-            # Display the updated properties
-            print("Updated Properties:")
-
-            # Display the updated properties
-            for prop in updated_rows:
-                print(f"PropertyNumber: {prop[0]}, StreetAddress: {prop[1]}, ActiveStatus: {prop[2]}")
-                print(f"Explanation: {prop[-1]}")
-        
-        # Roll back the transaction to ensure data integrity if an error occurs
+            result = self.run(params)
+        except APIError as e:
+            print(e)
+            return
         except Exception as e:
-            # Roll back the transaction to ensure data integrity if an error occurs
-            self.conn.rollback()
             print("Error during update")
+            return
 
-        # Close the cursor
-        finally:
-            cur.close()
-
+        print(f"{result.message}\n")
 
+        # Display the updated properties
+        print("Updated Properties:")
+        for prop in result.rows:
+            print(f"PropertyNumber: {prop[0]}, StreetAddress: {prop[1]}, ActiveStatus: {prop[2]}")
+            print(f"Explanation: {prop[-1]}")
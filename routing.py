@@ -0,0 +1,90 @@
+# routing.py
+
+from collections import namedtuple
+
+# ---------------------------
+# Daily crew planning
+# Splits the visits due on one day (schedule.ScheduleCache.visits) into one route per crew
+# member, so each employee works one area instead of being sent across town by hand.
+#
+# Visits are grouped by zipcode in one pass over a dict, and the zipcode groups are ordered by
+# state, city and zipcode, so the groups of one city sit next to each other (and numerically
+# close zipcodes, which are usually neighbours, too). Routes are then cut from that sequence
+# greedily, one employee at a time, at an even share of the remaining allocatedManHours:
+#   - a zipcode group that fits the share is taken whole
+#   - one that would overshoot is still taken whole when that lands closer to the share than
+#     stopping short and stays within the workday; otherwise this route takes the visits of it
+#     that still fit (first fit), and the next route continues with the rest of the zipcode
+# The share is recomputed for every employee, so an overshoot is evened out by the routes after
+# it. Everything is a sort plus linear passes: thousands of visits take milliseconds.
+# Visits that do not fit into the employees' workdays are returned unassigned.
+# ---------------------------
+
+# Hours of allocated work one employee is planned for per day
+WORKDAY_HOURS = 8
+
+# One employee's day: the visits in driving order and their allocated hours
+Route = namedtuple("Route", ["employee", "visits", "hours"])
+
+
+def visit_hours(assignment):
+    return assignment.allocatedManHours.total_seconds() / 3600
+
+
+# Zipcode groups in route order: by state, city and zipcode, each ordered by property and service
+# Returns [visits, total hours, shortest visit] per group, the visits reversed so the next one
+# to route can be popped off the end
+def zipcode_groups(visits):
+    groups = {}
+    for visit in visits:
+        groups.setdefault((visit.stateID, visit.city, visit.zipcode), []).append(visit)
+    result = []
+    for _, group in sorted(groups.items()):
+        group.sort(key=lambda visit: (visit.propertyNumber, visit.serviceNum), reverse=True)
+        hours = [visit_hours(visit) for visit in group]
+        result.append([group, sum(hours), min(hours)])
+    return result
+
+
+# Cut the visits into one Route per employee (in the order given, with empty routes when there
+# is too little work) and return (routes, visits left unassigned)
+def plan_routes(visits, employees, workday_hours=WORKDAY_HOURS):
+    # A visit longer than a workday fits nobody's day, not even as the only stop of a route
+    too_long = [visit for visit in visits if visit_hours(visit) > workday_hours]
+    pending = zipcode_groups([visit for visit in visits if visit_hours(visit) <= workday_hours])
+    remaining = sum(hours for _, hours, _ in pending)
+    position = 0    # first group not fully routed yet
+    routes = []
+
+    for crew, employee in enumerate(employees):
+        target = min(workday_hours, remaining / (len(employees) - crew))
+        route, load = [], 0.0
+        while position < len(pending):
+            group, hours, shortest = pending[position]
+            if load + hours <= target or (load + hours <= workday_hours and load + hours - target < target - load):
+                route.extend(reversed(group))
+                load += hours
+                position += 1
+                continue
+            # Split the group: every visit that still fits the share (at least one, so no route is
+            # left empty; it still fits the workday), until not even its shortest visit would; the
+            # rest stays first in line for the next route
+            skipped = []
+            while group and (not route or load + shortest <= target):
+                visit = group.pop()
+                needed = visit_hours(visit)
+                if not route or load + needed <= target:
+                    route.append(visit)
+                    load += needed
+                    pending[position][1] -= needed
+                else:
+                    skipped.append(visit)
+            group.extend(reversed(skipped))
+            if group:
+                break
+            position += 1
+        routes.append(Route(employee, route, load))
+        remaining -= load
+
+    unassigned = [visit for group, _, _ in pending[position:] for visit in reversed(group)]
+    return routes, unassigned + too_long
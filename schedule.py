@@ -0,0 +1,281 @@
+# schedule.py
+
+import bisect
+import calendar
+import datetime
+import itertools
+import threading
+from collections import namedtuple
+
+# ---------------------------
+# ScheduleCache
+# Turns every active service assignment (RecurringServiceList x RecurringService x Property)
+# into dated visits, starting on the assignment's startDate (migration 0006):
+#   - W / B: every 7 / 14 days
+#   - M / Q: every 1 / 3 months on the same day of the month (the last day in shorter months)
+#
+# The visits are never materialized one by one. Each assignment is filed once, under its
+# residue class: (days, startDate ordinal % days) for weekly schedules, (months, month number
+# % months, day of month) for monthly ones. The visits due on a date are then the assignments
+# in the few classes that date belongs to, minus those not started yet, found with a bisect
+# on the class's start dates. Counting visits per day needs no per-visit work at all.
+#
+# Listing every visit is streamed one day at a time, holding the lock only while that day is
+# looked up, so callers page through it (VisitSchedule) instead of building millions of rows.
+# Listing one property's or service's visits picks its assignments from an index and computes
+# their dates directly (dates_of), never touching the rest of the fleet.
+#
+# The assignments are loaded in one query on first use. AssignRecurringService, UpdateService
+# and UpdateClientProperties mark what they changed once their transaction commits
+# (api_endpoint.after_commit); the next read reloads only the changed services (or everything,
+# for property changes) in one query and refiles them.
+# ---------------------------
+
+FREQUENCY_DAYS = {"W": 7, "B": 14}
+FREQUENCY_MONTHS = {"M": 1, "Q": 3}
+
+# Longest range one read may expand
+MAX_HORIZON_DAYS = 731
+
+Assignment = namedtuple("Assignment", ["propertyNumber", "serviceNum", "serviceName", "frequency", "startDate",
+                                       "allocatedManHours", "city", "stateID", "zipcode"])
+
+# Active assignments of active services on active properties; a partial reload appends a serviceNum filter
+ASSIGNMENT_QUERY = """
+    SELECT rsl.propertyID, rsl.recurringServiceID, p.propertyNumber, rs.serviceNum, rs.name,
+           TRIM(rsl.frequencyTypeID), rsl.startDate, rs.allocatedManHours, p.city, p.stateID, p.zipcode
+    FROM RecurringServiceList rsl
+        JOIN RecurringService rs ON rs.id = rsl.recurringServiceID
+        JOIN Property p ON p.id = rsl.propertyID
+    WHERE rsl.activeStatus AND p.activeStatus AND rs.orderStatusID = 'A'
+"""
+
+
+def month_number(day):
+    return day.year * 12 + day.month - 1
+
+
+# The residue class an assignment is filed under, or None for an unknown frequency
+def class_of(assignment):
+    start = assignment.startDate
+    if assignment.frequency in FREQUENCY_DAYS:
+        days = FREQUENCY_DAYS[assignment.frequency]
+        return ("D", days, start.toordinal() % days)
+    if assignment.frequency in FREQUENCY_MONTHS:
+        months = FREQUENCY_MONTHS[assignment.frequency]
+        return ("M", months, month_number(start) % months, start.day)
+    return None
+
+
+# The dates of an assignment's visits from start to end (inclusive), as ordinals
+def dates_of(assignment, start, end):
+    first = max(start, assignment.startDate)
+    if first > end:
+        return []
+    if assignment.frequency in FREQUENCY_DAYS:
+        days = FREQUENCY_DAYS[assignment.frequency]
+        ordinal = first.toordinal()
+        ordinal += (assignment.startDate.toordinal() - ordinal) % days
+        return list(range(ordinal, end.toordinal() + 1, days))
+    if assignment.frequency in FREQUENCY_MONTHS:
+        months = FREQUENCY_MONTHS[assignment.frequency]
+        month = month_number(first)
+        month += (month_number(assignment.startDate) - month) % months
+        ordinals = []
+        for month in range(month, month_number(end) + 1, months):
+            year, month = divmod(month, 12)
+            day = min(assignment.startDate.day, calendar.monthrange(year, month + 1)[1])
+            visit = datetime.date(year, month + 1, day)
+            if first <= visit <= end:
+                ordinals.append(visit.toordinal())
+        return ordinals
+    return []
+
+
+# Every residue class with visits on day
+def classes_on(day):
+    classes = [("D", days, day.toordinal() % days) for days in FREQUENCY_DAYS.values()]
+    last_day = calendar.monthrange(day.year, day.month)[1]
+    # On the last day of a month, schedules on the 29th-31st fall due as well
+    days_of_month = range(day.day, 32) if day.day == last_day else (day.day,)
+    for months in FREQUENCY_MONTHS.values():
+        residue = month_number(day) % months
+        classes.extend(("M", months, residue, day_of_month) for day_of_month in days_of_month)
+    return classes
+
+
+# Assignments of one residue class, with a lazily sorted index of their start dates
+class ResidueClass:
+    def __init__(self):
+        self.members = {}       # assignment key -> startDate ordinal
+        self._sorted = None     # (ordinals, keys) ordered by start date, rebuilt after a change
+
+    def add(self, key, ordinal):
+        self.members[key] = ordinal
+        self._sorted = None
+
+    def remove(self, key):
+        if self.members.pop(key, None) is not None:
+            self._sorted = None
+
+    # Keys of the members started on or before the ordinal, and how many there are
+    def started(self, ordinal):
+        if self._sorted is None:
+            pairs = sorted((start, key) for key, start in self.members.items())
+            self._sorted = ([start for start, _ in pairs], [key for _, key in pairs])
+        ordinals, keys = self._sorted
+        count = bisect.bisect_right(ordinals, ordinal)
+        return keys, count
+
+
+class ScheduleCache:
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._assignments = None    # key (see _file) -> Assignment, None until loaded
+        self._classes = {}          # residue class -> ResidueClass
+        self._by_service = {}       # serviceNum -> set of keys
+        self._by_property = {}      # propertyNumber -> set of keys
+        self._dirty = set()         # serviceNums changed since the last read
+        self._stale = True          # reload everything on the next read
+
+    # A service's assignments changed (created, re-timed, paused, ...)
+    def invalidate_service(self, service_num):
+        with self._lock:
+            self._dirty.add(service_num)
+
+    # Anything may have changed (e.g. properties were deactivated)
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    # Visits from start to end (inclusive) as (date, key, Assignment), by date, then property and
+    # service in the order they were created (key is the sort key within a day). Only visits after
+    # (date, key) when after is given, and only those of one property and/or service when given.
+    def visits(self, start, end, property_number=None, service_num=None, after=None):
+        if after is not None and after[0] > start:
+            start = after[0]
+        if property_number is None and service_num is None:
+            return self._all_visits(start, end, after)
+        return iter(self._matching_visits(start, end, property_number, service_num, after))
+
+    # Every visit, one day at a time; the lock is held only while a day is looked up, so a caller
+    # reading slowly never blocks writers (a change between two days shows from the next day on)
+    def _all_visits(self, start, end, after):
+        for day in self._days(start, end):
+            with self._lock:
+                self._refresh()
+                due = self._due_keys(day)
+                due.sort()
+                if after is not None and day == after[0]:
+                    due = due[bisect.bisect_right(due, after[1]):]
+                assignments = list(map(self._assignments.__getitem__, due))
+            yield from zip(itertools.repeat(day), due, assignments)
+
+    # The visits of one property and/or service: their assignments come from the indexes, and each
+    # one's dates are computed from its schedule
+    def _matching_visits(self, start, end, property_number, service_num, after):
+        with self._lock:
+            self._refresh()
+            keys = None
+            for index, value in ((self._by_property, property_number), (self._by_service, service_num)):
+                if value is not None:
+                    matching = index.get(value, set())
+                    keys = matching if keys is None else keys & matching
+            found = [(ordinal, key, self._assignments[key])
+                     for key in keys for ordinal in dates_of(self._assignments[key], start, end)]
+        found.sort(key=lambda visit: visit[:2])
+        if after is not None:
+            last = (after[0].toordinal(), after[1])
+            found = [visit for visit in found if visit[:2] > last]
+        return [(datetime.date.fromordinal(ordinal), key, assignment) for ordinal, key, assignment in found]
+
+    # Number of visits per day from start to end, without expanding a single visit
+    def counts(self, start, end):
+        with self._lock:
+            self._refresh()
+            result = []
+            for day in self._days(start, end):
+                ordinal = day.toordinal()
+                total = 0
+                for residue_class in classes_on(day):
+                    members = self._classes.get(residue_class)
+                    if members is not None:
+                        total += members.started(ordinal)[1]
+                result.append((day, total))
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {"assignments": len(self._assignments or {}), "classes": len(self._classes),
+                    "dirtyServices": len(self._dirty), "stale": self._stale}
+
+    @staticmethod
+    def _days(start, end):
+        return (start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1))
+
+    def _due_keys(self, day):
+        ordinal = day.toordinal()
+        due = []
+        for residue_class in classes_on(day):
+            members = self._classes.get(residue_class)
+            if members is not None:
+                keys, count = members.started(ordinal)
+                due.extend(keys[:count])
+        return due
+
+    # Apply pending invalidations: a full reload, or one query for the changed services
+    def _refresh(self):
+        if self._stale or self._assignments is None:
+            rows = self._query(ASSIGNMENT_QUERY)
+            self._assignments, self._classes, self._by_service, self._by_property = {}, {}, {}, {}
+            self._file(rows)
+            self._stale = False
+            self._dirty.clear()
+        elif self._dirty:
+            services = sorted(self._dirty)
+            rows = self._query(ASSIGNMENT_QUERY + " AND rs.serviceNum = ANY(%s)", (services,))
+            for service_num in services:
+                for key in self._by_service.pop(service_num, ()):
+                    assignment = self._assignments.pop(key)
+                    self._classes[class_of(assignment)].remove(key)
+                    self._by_property[assignment.propertyNumber].discard(key)
+            self._file(rows)
+            self._dirty.clear()
+
+    def _file(self, rows):
+        for property_id, service_id, *fields in rows:
+            assignment = Assignment(*fields)
+            residue_class = class_of(assignment)
+            if residue_class is None:
+                continue
+            # One int per assignment: cheap to hash, and sorting them orders by property, then service
+            key = property_id << 32 | service_id
+            self._assignments[key] = assignment
+            self._by_service.setdefault(assignment.serviceNum, set()).add(key)
+            self._by_property.setdefault(assignment.propertyNumber, set()).add(key)
+            self._classes.setdefault(residue_class, ResidueClass()).add(key, assignment.startDate.toordinal())
+
+    def _query(self, sql, params=None):
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql + ";", params)
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+            conn.commit()
+        return rows
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# The schedule shared by every endpoint using this pool
+def for_pool(pool):
+    with _caches_lock:
+        cache = _caches.get(id(pool))
+        if cache is None:
+            cache = _caches[id(pool)] = ScheduleCache(pool)
+        return cache
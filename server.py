@@ -0,0 +1,236 @@
+# server.py
+
+import argparse
+import asyncio
+import json
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from api_endpoint import APIError
+from apis import get_all_apis
+from config import DB_CONFIG
+from db_pool import ConnectionPool
+import client_cache
+import lookups
+import schedule
+import workrecordmanagement
+from tracing import tracer
+
+
+# ---------------------------
+# HTTP service: every endpoint in apis.get_all_apis() served as JSON
+#
+#   GET  /apis               -> catalogue of endpoints, grouped as in the CLI menu
+#   GET  /api/<Name>?k=v     -> run(params) with the query string as params
+#   POST /api/<Name>         -> run(params) with a JSON object body as params
+#   POST /lookups/refresh    -> reload the cached lookup tables (lookups.py)
+#   GET  /stats              -> client cache counters and query tracer totals (tracing.py)
+#
+# The event loop only parses requests and writes responses. Each run() call executes on a
+# worker thread with a connection from the server's own ConnectionPool, so up to maxconn
+# queries are in flight at once while slow clients never block the loop. Endpoints with a
+# queued path (APIEndpoint.submit, e.g. ClockIn) are awaited on the loop instead, so any
+# number of callers can wait for the same flush.
+# ---------------------------
+
+MAX_BODY_SIZE = 1024 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+# Raised while reading a request that cannot be answered normally
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class APIServer:
+    def __init__(self, pool):
+        self.pool = pool
+        self.groups = get_all_apis(pool)
+        self.apis = {api.name: api for group in self.groups.values() for api in group}
+        # One worker per pooled connection: more threads would only queue on the pool
+        self.executor = ThreadPoolExecutor(max_workers=pool.maxconn, thread_name_prefix="api")
+
+    # Serve until cancelled
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"Serving {len(self.apis)} APIs on {addresses}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        client_cache.for_pool(self.pool).close()
+        workrecordmanagement.for_pool(self.pool).close()
+
+    # One TCP connection; HTTP/1.1 keep-alive is honoured so load generators can reuse sockets
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Route one request and return (status, JSON payload)
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+
+        if path == "/apis":
+            if method != "GET":
+                return 405, {"error": "Use GET."}
+            return 200, {group: [api.name for api in apis] for group, apis in self.groups.items()}
+
+        if path == "/stats":
+            if method != "GET":
+                return 405, {"error": "Use GET."}
+            return 200, {"clientCache": client_cache.for_pool(self.pool).stats(),
+                         "checkIns": workrecordmanagement.for_pool(self.pool).stats(),
+                         "schedule": schedule.for_pool(self.pool).stats(), "queries": tracer.snapshot()}
+
+        if path == "/lookups/refresh":
+            if method != "POST":
+                return 405, {"error": "Use POST."}
+            loop = asyncio.get_running_loop()
+            try:
+                tables = await loop.run_in_executor(self.executor, lookups.refresh, self.pool)
+            except (pg_pool.PoolError, psycopg2.Error) as e:
+                return 503, {"error": str(e).strip()}
+            return 200, {table: dict(codes) for table, codes in tables.items()}
+
+        if not path.startswith("/api/"):
+            return 404, {"error": f"No route for {url.path}."}
+        api = self.apis.get(path[len("/api/"):])
+        if api is None:
+            return 404, {"error": f"Unknown API '{path[len('/api/'):]}'."}
+
+        if method == "GET":
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
+        elif method == "POST":
+            try:
+                params = json.loads(body) if body else {}
+            except ValueError as e:
+                return 400, {"error": f"Invalid JSON body: {e}"}
+            if not isinstance(params, dict):
+                return 400, {"error": "The request body must be a JSON object."}
+        else:
+            return 405, {"error": "Use GET or POST."}
+
+        loop = asyncio.get_running_loop()
+        try:
+            # Queued work (ClockIn) is awaited here, so waiting callers do not hold worker threads
+            future = api.submit(params)
+            if future is not None:
+                result = await asyncio.wrap_future(future)
+            else:
+                result = await loop.run_in_executor(self.executor, api.run, params)
+        except APIError as e:
+            return 400, {"api": api.name, "error": str(e)}
+        except pg_pool.PoolError as e:
+            return 503, {"api": api.name, "error": str(e)}
+        except psycopg2.Error as e:
+            return 500, {"api": api.name, "error": str(e).strip()}
+        except Exception as e:
+            # A bug in one endpoint still gets an answer, and the keep-alive connection stays usable
+            traceback.print_exc(file=sys.stderr)
+            return 500, {"api": api.name, "error": f"Internal error: {e}"}
+        payload = {"api": api.name, "message": result.message,
+                   "columns": result.columns, "rows": result.as_dicts()}
+        if result.next_token is not None:
+            payload["nextToken"] = result.next_token
+        return 200, payload
+
+
+# Read one HTTP request; returns None when the client closed the connection between requests
+async def read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length.")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+async def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload, default=str).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the LandscapingDB APIs as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080).")
+    parser.add_argument("--maxconn", type=int,
+                        help="Database connections for the server's pool (default: maxconn from config.py).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = dict(DB_CONFIG)
+    if args.maxconn:
+        config["maxconn"] = args.maxconn
+
+    try:
+        dbPool = ConnectionPool(config)
+    except psycopg2.Error as e:
+        print("Error connecting to database:", e)
+        return
+
+    server = APIServer(dbPool)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Shutting down.", file=sys.stderr)
+    finally:
+        server.close()
+        dbPool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
 # servicemanagement.py
 
-from api_endpoint import APIEndpoint
+from api_endpoint import (APIEndpoint, APIError, APIResult, after_commit, decode_page_token, encode_page_token,
+                          optional_text, parse_bool, parse_date, parse_limit)
+import datetime
+import itertools
+
+from psycopg2 import errors
+
+import lookups
+import schedule
+import statements
 
 # ---------------------------
 # AssignRecurringService API
@@ -9,29 +18,47 @@ from api_endpoint import APIEndpoint
 class AssignRecurringService(APIEndpoint):
     """ API to assign a new recurring service to a property """
 
-    def __init__(self, conn):
-        self.conn = conn
-        cur = self.conn.cursor()
-        try:
-            # Prepare SQL statement for assigning a recurring service
-            cur.execute("""
-                PREPARE assign_recurring_service(text, text, interval, money, text) AS
-                INSERT INTO RecurringService (serviceTypeID, name, allocatedManHours, price, orderStatusID)
-                VALUES (
-                    (SELECT id FROM ServiceType WHERE id = $1),  -- Get service type ID
-                    $2,  -- Service name
-                    $3,  -- Allocated hours
-                    $4,  -- Price
-                    'A'  -- Default OrderStatus to 'Active'
+    name = "AssignRecurringService"
+
+    def __init__(self, pool):
+        self.pool = pool
+        # Register SQL statement for assigning a recurring service to one or more properties
+        # It is prepared lazily the first time each connection executes it
+        # One data-modifying CTE per call: the property lookup, one RecurringService per property
+        # (serviceNum taken from service_num_seq up front, so each new service can be matched to its
+        # property) and the RecurringServiceList links. It is all or nothing: when any property
+        # number is unknown, nothing is inserted and the row for that number comes back with known = false.
+        # The service type and frequency codes are validated against the lookup cache before this runs.
+        statements.register("assign_recurring_service", ("text", "text", "interval", "money", "text[]", "text"), """
+                WITH found AS (
+                    SELECT id, propertyNumber
+                    FROM Property
+                    WHERE propertyNumber = ANY($5)
+                ),
+                targets AS (
+                    SELECT id AS propertyID, propertyNumber,
+                           'RS' || LPAD(nextval('service_num_seq')::TEXT, 4, '0') AS serviceNum
+                    FROM found
+                    WHERE (SELECT count(*) FROM found) = cardinality($5)
+                ),
+                service AS (
+                    INSERT INTO RecurringService (serviceNum, serviceTypeID, name, allocatedManHours, price, orderStatusID)
+                    SELECT serviceNum, $1, $2, $3, $4, 'A'  -- New services start Active
+                    FROM targets
+                    RETURNING id, serviceNum
+                ),
+                assigned AS (
+                    INSERT INTO RecurringServiceList (propertyID, recurringServiceID, frequencyTypeID, activeStatus)
+                    SELECT t.propertyID, s.id, $6, TRUE
+                    FROM targets t
+                        JOIN service s ON s.serviceNum = t.serviceNum
                 )
-                RETURNING serviceNum;
+                SELECT n.propertyNumber, t.serviceNum, f.id IS NOT NULL AS known
+                FROM unnest($5) WITH ORDINALITY AS n(propertyNumber, ord)
+                    LEFT JOIN found f ON f.propertyNumber = n.propertyNumber
+                    LEFT JOIN targets t ON t.propertyNumber = n.propertyNumber
+                ORDER BY n.ord;
             """)
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            print("Error preparing assign_recurring_service:", e)
-        finally:
-            cur.close()
 
     def display_brief(self, index):
         # Display brief API description 
@@ -43,73 +70,108 @@ class AssignRecurringService(APIEndpoint):
         print("Assigns a new recurring service to a property with the required details.")
         print("Parameters:")
         print("\t- propertyNumber (text): The property number where the service will be assigned")
+        print("\t- propertyNumbers (list): Instead of propertyNumber, several property numbers (or one")
+        print("\t  comma-separated text) that each get their own copy of the service, in one transaction")
         print("\t- serviceType (text): Service Type Code. Options:")
-        print("\t\tL: Lawncare")
-        print("\t\tT: Tree Trimming")
-        print("\t\tF: Flowerbed")
-        print("\t\tS: Snow Removal")
-        print("\t\tO: Other")
+        for line in lookups.describe(self.pool, "ServiceType"):
+            print(f"\t\t{line}")
         print("\t- serviceName (text): Descriptive name of the service")
         print("\t- allocatedManHours (interval): Time allocated (e.g., '01:30:00')")
         print("\t- price (money): Cost of the service (e.g., '60.00')")
         print("\t- frequencyType (text): Frequency of the service. Options:")
-        print("\t\tW: Weekly")
-        print("\t\tB: Biweekly")
-        print("\t\tM: Monthly")
-        print("\t\tQ: Quarterly")
+        for line in lookups.describe(self.pool, "FrequencyType"):
+            print(f"\t\t{line}")
         print("\tReturns:")
-        print("\t- The assigned service number (auto-generated)")
+        print("\t- The assigned service number (auto-generated), one per property in bulk mode")
         print("\nExample Input:")
         print("propertyNumber = 'P001', serviceType = 'L', serviceName = 'Premium Lawn Mowing',")
         print("allocatedManHours = '01:30:00', price = 60.00, frequencyType = 'W'")
+        print("Bulk: propertyNumbers = 'P001, P002, P003', serviceType = 'S', serviceName = 'Snow Removal', ...")
         print("-------------------------\n")
 
+    # Creates a recurring service and links it to a property, in one round trip
+    # params: propertyNumber or propertyNumbers, serviceType, serviceName, allocatedManHours, price, frequencyType
+    # With propertyNumbers (a list, or comma-separated text) every property gets its own service from
+    # the same template in one set-based statement; the result has a (propertyNumber, serviceNum) row each.
+    def run(self, params: dict, conn=None) -> APIResult:
+        property_numbers = self._property_numbers(params)
+        service_name = optional_text(params.get("serviceName"))
+        allocated_man_hours = optional_text(params.get("allocatedManHours"))
+        price = optional_text(params.get("price"))
+        # Codes are checked against the lookup cache, so a typo fails before any round trip
+        service_type = lookups.validate(self.pool, "ServiceType", params.get("serviceType"),
+                                        "serviceType", required=True, conn=conn)
+        frequency_type = lookups.validate(self.pool, "FrequencyType", params.get("frequencyType"),
+                                          "frequencyType", required=True, conn=conn)
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement to insert the services and their property links
+                statements.execute(cur, "assign_recurring_service",
+                            (service_type, service_name, allocated_man_hours, price, property_numbers, frequency_type))
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+            # The visit schedule picks up the new services once they are committed
+            visit_schedule = schedule.for_pool(self.pool)
+            for _, service_num, _ in rows:
+                if service_num is not None:
+                    after_commit(conn, visit_schedule.invalidate_service, service_num)
+
+        missing = [number for number, _, known in rows if not known]
+        if missing:
+            shown = ", ".join(missing[:10]) + (f" and {len(missing) - 10} more" if len(missing) > 10 else "")
+            raise APIError(f"Property {shown} does not exist; no service was assigned."
+                           if len(missing) == 1 else f"Properties {shown} do not exist; no service was assigned.")
+
+        if len(rows) == 1:
+            message = f"Service assigned successfully with service number: {rows[0][1]}"
+        else:
+            message = f"Service assigned successfully to {len(rows)} properties."
+        if "propertyNumbers" not in params:
+            return APIResult(["serviceNum"], [(rows[0][1],)], message)
+        return APIResult(["propertyNumber", "serviceNum"], [(number, service_num) for number, service_num, _ in rows],
+                         message)
+
+    # The property numbers to assign to, without duplicates and in the order given
+    @staticmethod
+    def _property_numbers(params):
+        if "propertyNumbers" in params:
+            value = params.get("propertyNumbers")
+            if isinstance(value, str) or value is None:
+                value = (value or "").split(",")
+            elif not isinstance(value, (list, tuple)):
+                raise APIError("propertyNumbers must be a list of property numbers.")
+            numbers = list(dict.fromkeys(filter(None, (optional_text(number) for number in value))))
+        else:
+            number = optional_text(params.get("propertyNumber"))
+            numbers = [number] if number else []
+        if not numbers:
+            raise APIError("At least one property number is required.")
+        return numbers
+
     def execute(self):
         # Execute the API by collecting user input
-        property_number = input("Enter property number: ").strip()
-        service_type = input("Enter service type code (L for Lawncare, T for Tree Trimming, F for Flowerbed, S for Snow Removal, O for Other): ").strip()
-        service_name = input("Enter service name (e.g., Special Lawn Care): ").strip()
-        allocated_man_hours = input("Enter allocated man hours (HH:MM:SS): ").strip()
-        price = input("Enter price: ").strip()
-        frequency_type = input("Enter frequency type code (W for Weekly, B for Biweekly, M for Monthly, Q for Quarterly): ").strip()
-
-        cur = self.conn.cursor()
-        try:
-            # Ensure property exists before inserting service
-            cur.execute("SELECT id FROM Property WHERE propertyNumber = %s;", (property_number,))
-            property_id = cur.fetchone()
-
-            if not property_id:
-                print(f"Error: Property {property_number} does not exist.")
-                return
+        params = {
+            "propertyNumbers": input("Enter property number (or several, separated by commas): ").strip(),
+            "serviceType": input(f"Enter service type code ({lookups.options(self.pool, 'ServiceType')}): ").strip(),
+            "serviceName": input("Enter service name (e.g., Special Lawn Care): ").strip(),
+            "allocatedManHours": input("Enter allocated man hours (HH:MM:SS): ").strip(),
+            "price": input("Enter price: ").strip(),
+            "frequencyType": input(f"Enter frequency type code ({lookups.options(self.pool, 'FrequencyType')}): ").strip(),
+        }
 
-            # Execute the prepared statement to insert into RecurringService
-            cur.execute("EXECUTE assign_recurring_service(%s, %s, %s, %s, %s);", 
-                        (service_type, service_name, allocated_man_hours, price, property_number))
-            service_num = cur.fetchone()[0]
-
-            # Retrieve the id of the newly created service using its serviceNum
-            cur.execute("SELECT id FROM RecurringService WHERE serviceNum = %s;", (service_num,))
-            new_service_id = cur.fetchone()[0]
-
-            # Insert into RecurringServiceList to link the property with the new service.
-            cur.execute("""
-                INSERT INTO RecurringServiceList (propertyID, recurringServiceID, frequencyTypeID, activeStatus)
-                VALUES (
-                    (SELECT id FROM Property WHERE propertyNumber = %s),
-                    %s,
-                    %s,
-                    TRUE
-                );
-            """, (property_number, new_service_id, frequency_type))
-
-            self.conn.commit()
-            print(f"Service assigned successfully with service number: {service_num}")
+        try:
+            result = self.run(params)
+            print(result.message)
+            if len(result) > 1:
+                for property_number, service_num in result.rows:
+                    print(f"\t{property_number}: {service_num}")
+        except APIError as e:
+            print(f"Error: {e}")
         except Exception as e:
             print("Error executing assign_recurring_service:", e)
-            self.conn.rollback()
-        finally:
-            cur.close()
 
 # ---------------------------
 # UpdateService API
@@ -118,29 +180,24 @@ class AssignRecurringService(APIEndpoint):
 class UpdateService(APIEndpoint):
     # API to update details of an existing recurring service 
 
-    def __init__(self, conn):
-        self.conn = conn
-        cur = self.conn.cursor()
-        try:
-            # Prepare SQL statement for updating a recurring service in the RecurringService table
-            cur.execute("""
-                PREPARE update_service(text, text, interval, money, text, text) AS
+    name = "UpdateService"
+
+    def __init__(self, pool):
+        self.pool = pool
+        # Register SQL statement for updating a recurring service in the RecurringService table
+        # It is prepared lazily the first time each connection executes it
+        # NULL parameters keep the current value; codes are validated against the lookup cache
+        statements.register("update_service", ("text", "text", "interval", "money", "text", "text"), """
                 UPDATE RecurringService
                 SET 
-                    name = $2, 
-                    allocatedManHours = $3, 
-                    price = $4, 
-                    serviceTypeID = (SELECT id FROM ServiceType WHERE id = $5),  -- Fetch serviceTypeID
-                    orderStatusID = (SELECT id FROM OrderStatus WHERE id = $6)  -- Fetch orderStatusID
+                    name = COALESCE($2, name),
+                    allocatedManHours = COALESCE($3, allocatedManHours),
+                    price = COALESCE($4, price),
+                    serviceTypeID = COALESCE($5, serviceTypeID),
+                    orderStatusID = COALESCE($6, orderStatusID)
                 WHERE serviceNum = $1
                 RETURNING serviceNum;
             """)
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            print("Error preparing update_service.")
-        finally:
-            cur.close()
 
     def display_brief(self, index):
         # Display brief API description
@@ -156,69 +213,79 @@ class UpdateService(APIEndpoint):
         print("\t- allocatedManHours (interval): Updated allocated hours, e.g., '02:00:00'")
         print("\t- price (money): Updated cost, e.g., 100.00")
         print("\t- serviceType (text): Updated service type code. Options:")
-        print("\t\tL: Lawncare")
-        print("\t\tT: Tree Trimming")
-        print("\t\tF: Flowerbed")
-        print("\t\tS: Snow Removal")
-        print("\t\tO: Other")
+        for line in lookups.describe(self.pool, "ServiceType"):
+            print(f"\t\t{line}")
         print("\t- orderStatus (text): Updated order status code. Options:")
-        print("\t\tA: Active")
-        print("\t\tI: Inactive")
-        print("\t\tP: Paused")
+        for line in lookups.describe(self.pool, "OrderStatus"):
+            print(f"\t\t{line}")
         print("\t- frequencyType (text): (Optional) Updated frequency type code for the service assignment. Options:")
-        print("\t\tW: Weekly")
-        print("\t\tB: Biweekly")
-        print("\t\tM: Monthly")
-        print("\t\tQ: Quarterly")
+        for line in lookups.describe(self.pool, "FrequencyType"):
+            print(f"\t\t{line}")
+        print("\tFields left empty keep their current value.")
         print("\nExample Input:")
         print("serviceNum = 'RS0083', serviceName = 'Advanced Lawn Care', allocatedManHours = '02:00:00',")
         print("price = 100.00, serviceType = 'L', orderStatus = 'A', frequencyType = 'Q'")
         print("-------------------------\n")
 
+    # Updates a recurring service (and optionally the frequency of its assignment)
+    # params: serviceNum (required), serviceName, allocatedManHours, price, serviceType, orderStatus, frequencyType
+    def run(self, params: dict, conn=None) -> APIResult:
+        service_num = optional_text(params.get("serviceNum"))
+        if service_num is None:
+            raise APIError("serviceNum is required.")
+        service_name = optional_text(params.get("serviceName"))
+        allocated_man_hours = optional_text(params.get("allocatedManHours"))
+        price = optional_text(params.get("price"))
+        service_type = lookups.validate(self.pool, "ServiceType", params.get("serviceType"), "serviceType", conn=conn)
+        order_status = lookups.validate(self.pool, "OrderStatus", params.get("orderStatus"), "orderStatus", conn=conn)
+        frequency_type = lookups.validate(self.pool, "FrequencyType", params.get("frequencyType"),
+                                          "frequencyType", conn=conn)
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                # Execute the prepared statement with updated details for the RecurringService table
+                # No row comes back when the service does not exist
+                statements.execute(cur, "update_service",
+                            (service_num, service_name, allocated_man_hours, price, service_type, order_status))
+                row = cur.fetchone()
+                if not row:
+                    raise APIError(f"Service with number {service_num} does not exist.")
+                updated_service_num = row[0]
+
+                # If the user provided a new frequency, update the RecurringServiceList table accordingly.
+                if frequency_type:
+                    cur.execute("""
+                        UPDATE RecurringServiceList
+                        SET frequencyTypeID = %s
+                        WHERE recurringServiceID = (SELECT id FROM RecurringService WHERE serviceNum = %s);
+                    """, (frequency_type, service_num))
+            finally:
+                cur.close()
+            # A new frequency or order status moves or cancels this service's visits, once committed
+            after_commit(conn, schedule.for_pool(self.pool).invalidate_service, updated_service_num)
+
+        return APIResult(["serviceNum"], [(updated_service_num,)],
+                         f"Service updated successfully with service number: {updated_service_num}")
+
     def execute(self):
         # Execute the API by collecting user input 
-        service_num = input("Enter service number (e.g., RS0083): ").strip()
-        service_name = input("Enter new service name (or press enter to keep current): ").strip() or None
-        allocated_man_hours = input("Enter new allocated man hours (HH:MM:SS, or press enter to keep current): ").strip() or None
-        price = input("Enter new price (or press enter to keep current): ").strip() or None
-        service_type = input("Enter new service type code (L for Lawncare, T for Tree Trimming, F for Flowerbed, S for Snow Removal, O for Other, or press enter to keep current): ").strip() or None
-        order_status = input("Enter new order status code (A for Active, I for Inactive, P for Paused, or press enter to keep current): ").strip() or None
-        frequency_type = input("Enter new frequency type code (W for Weekly, B for Biweekly, M for Monthly, Q for Quarterly, or press enter to keep current): ").strip() or None
-
-        cur = self.conn.cursor()
-        try:
-            # Ensure the service exists before attempting an update
-            cur.execute("SELECT serviceNum FROM RecurringService WHERE serviceNum = %s;", (service_num,))
-            existing_service = cur.fetchone()
-
-            if not existing_service:
-                print(f"Error: Service with number {service_num} does not exist.")
-                return
-
-            # Execute the prepared statement with updated details for the RecurringService table
-            cur.execute("EXECUTE update_service (%s, %s, %s, %s, %s, %s);", 
-                        (service_num, service_name, allocated_man_hours, price, service_type, order_status))
-            updated_service_num = cur.fetchone()[0]
-
-            # If the user provided a new frequency, update the RecurringServiceList table accordingly.
-            if frequency_type:
-                cur.execute("""
-                    UPDATE RecurringServiceList
-                    SET frequencyTypeID = %s
-                    WHERE recurringServiceID = (SELECT id FROM RecurringService WHERE serviceNum = %s);
-                """, (frequency_type, service_num))
-
-            self.conn.commit()
+        params = {
+            "serviceNum": input("Enter service number (e.g., RS0083): ").strip(),
+            "serviceName": input("Enter new service name (or press enter to keep current): ").strip(),
+            "allocatedManHours": input("Enter new allocated man hours (HH:MM:SS, or press enter to keep current): ").strip(),
+            "price": input("Enter new price (or press enter to keep current): ").strip(),
+            "serviceType": input(f"Enter new service type code ({lookups.options(self.pool, 'ServiceType')}, or press enter to keep current): ").strip(),
+            "orderStatus": input(f"Enter new order status code ({lookups.options(self.pool, 'OrderStatus')}, or press enter to keep current): ").strip(),
+            "frequencyType": input(f"Enter new frequency type code ({lookups.options(self.pool, 'FrequencyType')}, or press enter to keep current): ").strip(),
+        }
 
-            if updated_service_num:
-                print(f"Service updated successfully with service number: {updated_service_num}")
-            else:
-                print("Failed to update service. Please check service number and inputs.")
+        try:
+            print(self.run(params).message)
+        except APIError as e:
+            print(f"Error: {e}")
         except Exception as e:
             print("Error executing update_service.")
-            self.conn.rollback()
-        finally:
-            cur.close()
 
 # ---------------------------
 # GetServiceHistory API
@@ -231,15 +298,101 @@ class GetServiceHistory(APIEndpoint):  # Detail API for retrieving client servic
     - Type of service performed
     - Duration of the service
     - Cost of the service
+    - The property the service belongs to (for a service shared by several properties, the one
+      with the lowest internal id)
+    Results can be limited to a date range and a single property, and summarized per property.
     """
 
-    def __init__(self, conn):
+    name = "GetServiceHistory"
+
+    # Columns returned for each work record, in row order
+    COLUMNS = ["startTime", "endTime", "serviceType", "allocatedManHours", "price",
+               "propertyNumber", "workRecordNum"]
+
+    # Columns returned by the per-property breakdown, in row order
+    BREAKDOWN_COLUMNS = ["propertyNumber", "streetAddress", "workRecords", "totalDuration", "totalCost"]
+
+    # Optional filters, in parameter order after the account number: (name, condition, type)
+    FILTERS = [("start", "wr.startTime >= ${}", "date"),
+               ("end", "wr.startTime < ${} + 1", "date"),
+               ("property", "p.propertyNumber = ${}", "text")]
+
+    # The owning property of each service the client's properties are linked to, computed once per
+    # query: a service linked to several properties belongs to the one with the lowest propertyID,
+    # so each work record is listed and counted once, under one property, instead of once per
+    # linked property. RecurringServiceList records no link order, so this is simply a stable rule
+    # (the same one BillingRun bills by), not the property the service was linked to first. A
+    # propertyNumber filter on a property that shares a service without owning it therefore
+    # returns none of that service's work records.
+    OWNER_CLAUSE = """
+            WITH owner AS (
+                SELECT o.recurringServiceID, MIN(o.propertyID) AS propertyID
+                FROM RecurringServiceList o
+                WHERE o.recurringServiceID IN (SELECT rsl.recurringServiceID
+                                               FROM Client c
+                                                   JOIN Property p ON p.clientID = c.id
+                                                   JOIN RecurringServiceList rsl ON rsl.propertyID = p.id
+                                               WHERE c.accountNumber = $1)
+                GROUP BY o.recurringServiceID
+            )"""
+
+    # Client -> property -> services it owns -> work records
+    FROM_CLAUSE = """
+            FROM Client c
+                JOIN Property p ON p.clientID = c.id
+                JOIN owner ON owner.propertyID = p.id
+                JOIN RecurringService rs ON rs.id = owner.recurringServiceID
+                JOIN WorkRecord wr ON wr.recurringServiceID = rs.id
+            WHERE c.accountNumber = $1"""
+
+    def __init__(self, pool):
         """
-        Initializes the class with a database connection.
+        Initializes the class with the shared connection pool and registers its SQL statements.
+        Both queries find the owners of the client's services once (OWNER_CLAUSE), then walk
+        Client -> Property -> owned RecurringService -> WorkRecord with plain joins (served by the
+        foreign-key indexes), so a client's history is one set-based plan instead of a subquery per
+        joined row.
+        Each query is registered once per combination of filters (8 shapes), with only the filters
+        in use in its WHERE clause, so every shape keeps a plan that uses its filters even once the
+        server switches to a generic plan.
         
-        :param conn: Database connection object
+        :param pool: ConnectionPool that hands out a connection per run()
+        """
+        self.pool = pool  # Store the connection pool used for executing queries
+
+        for used in itertools.product((False, True), repeat=len(self.FILTERS)):
+            shape = [f for f, on in zip(self.FILTERS, used) if on]
+            argtypes = ["text"] + [argtype for _, _, argtype in shape]
+            where = "".join(f"\n                AND {condition.format(number)}"
+                            for number, (_, condition, _) in enumerate(shape, start=2))
+            names = [name for name, _, _ in shape]
+
+            # One row per work record, oldest first
+            statements.register(self._statement("service_history", names), argtypes, f"""{self.OWNER_CLAUSE}
+            SELECT wr.startTime, wr.endTime, rs.name AS serviceType, rs.allocatedManHours, rs.price,
+                   p.propertyNumber, wr.workRecordNum{self.FROM_CLAUSE}{where}
+            ORDER BY wr.startTime, wr.workRecordNum;
+            """)
+
+            # Same filters, totalled per property
+            statements.register(self._statement("service_history_by_property", names), argtypes, f"""{self.OWNER_CLAUSE}
+            SELECT p.propertyNumber, p.streetAddress, COUNT(wr.id) AS workRecords,
+                   COALESCE(SUM(wr.endTime - wr.startTime), '0 seconds'::interval) AS totalDuration,
+                   COALESCE(SUM(rs.price), 0::money) AS totalCost{self.FROM_CLAUSE}{where}
+            GROUP BY p.id, p.propertyNumber, p.streetAddress
+            ORDER BY p.propertyNumber;
+            """)
+
+    @staticmethod
+    def _statement(base, filters):
+        """
+        Names the statement of one filter shape, e.g. service_history_start_property.
+
+        :param base: service_history or service_history_by_property
+        :param filters: Names of the filters in use, in FILTERS order
+        :return: Registered statement name
         """
-        self.conn = conn  # Store the database connection object for executing queries
+        return "_".join([base, *filters])
 
     def display_brief(self, index: int):
         """
@@ -257,59 +410,121 @@ class GetServiceHistory(APIEndpoint):  # Detail API for retrieving client servic
         print("Retrieves full service history for a client, including date, type, duration, and cost.")
         print("\nParameters:")
         print("\t- accountNumber (text): The unique account number of the client.")
+        print("\t- startDate (YYYY-MM-DD, optional): Only services performed on or after this day.")
+        print("\t- endDate (YYYY-MM-DD, optional): Only services performed on or before this day.")
+        print("\t- propertyNumber (text, optional): Only services at this property.")
+        print("\tA service shared by several properties is listed under only one of them, the property with the")
+        print("\tlowest internal id; filtering on another property that shares it returns none of its work records.")
         print("\tReturns:")
-        print("\t The list of service records for the given client, showing when each service was performed, the type of service, the duration, and the cost.")
+        print("\t The list of service records for the given client, oldest first, showing when each service was performed, the type of service, the duration, the cost and the property,")
+        print("\t followed by the number of services, time worked and cost per property.")
         
         print("\nExample Input:")
-        print("accountNumber = 'C0001'")
+        print("accountNumber = 'C0001', startDate = '2025-01-01', endDate = '2025-01-31', propertyNumber = ''")
         print("-------------------------\n")
 
+    def _filters(self, params: dict, base: str = "service_history") -> tuple:
+        """
+        Validates the parameters shared by run() and stream() and picks the statement for the filters given.
+
+        :param params: accountNumber (text), startDate, endDate (YYYY-MM-DD, optional), propertyNumber (optional)
+        :param base: service_history or service_history_by_property
+        :return: (statement name, statement parameters)
+        """
+        account_number = optional_text(params.get("accountNumber"))
+        if not account_number:
+            raise APIError("Account number is required.")
+        values = [parse_date(params.get("startDate"), "Start date"),
+                  parse_date(params.get("endDate"), "End date"),
+                  optional_text(params.get("propertyNumber"))]
+        used = [(name, value) for (name, _, _), value in zip(self.FILTERS, values) if value is not None]
+        return (self._statement(base, [name for name, _ in used]),
+                (account_number, *(value for _, value in used)))
+
+    def run(self, params: dict, conn=None) -> APIResult:
+        """
+        Fetches a client's service history, or its per-property breakdown.
+
+        :param params: accountNumber (text), startDate, endDate (YYYY-MM-DD, optional),
+                       propertyNumber (text, optional), breakdown (true/false, optional: totals per property)
+        :param conn: Optional connection owned by the caller's transaction
+        :return: APIResult with one row per work record, or one row per property when breakdown is true
+        """
+        statement, filters, columns = self.list_query(params)
+
+        # Open a database cursor using 'with' to ensure it's properly closed after execution
+        with self.transaction(conn) as conn, conn.cursor() as cur:
+            # Execute the prepared statement with the validated filters
+            statements.execute(cur, statement, filters)
+
+            # Fetch all matching service history records
+            records = cur.fetchall()
+
+        return APIResult(columns, records)
+
+    def list_query(self, params: dict):
+        """
+        Selects the full history (or breakdown) statement for stream() and export().
+
+        :param params: Same parameters as run()
+        :return: (statement name, statement parameters, columns)
+        """
+        if parse_bool(params.get("breakdown"), "Breakdown"):
+            return (*self._filters(params, "service_history_by_property"), self.BREAKDOWN_COLUMNS)
+        return (*self._filters(params), self.COLUMNS)
+
+    def stream(self, params: dict, conn=None):
+        """
+        Yields a client's service history one row at a time, oldest first, through a server-side cursor.
+
+        :param params: Same filters as run()
+        :param conn: Optional connection owned by the caller's transaction
+        :return: Iterator over rows in COLUMNS order
+        """
+        return self.stream_statement(*self._filters(params), conn)
+
     def execute(self):
         """
         Executes the query to fetch a client's service history.
-        - Prompts the user for the client’s account number
-        - Queries the database to retrieve historical service records
-        - Prints the service history or an error message if no records are found
+        - Prompts the user for the client’s account number and optional filters
+        - Prints the service history as it is read, then the per-property breakdown
+        - Prints an error message if no records are found
         """
         
-        # Prompt the user to enter the client's unique account number
-        account_number = input("Enter Client Account Number (Example: C0001): ").strip()
-
-        # SQL query to fetch service history for a given client account number
-        # Join with RecurringService to get service details
-        # Join with Client table to match the account number
-        query = """
-        SELECT wr.startTime, wr.endTime, rs.name AS serviceType, rs.allocatedManHours, rs.price
-        FROM WorkRecord wr
-            JOIN RecurringService rs ON wr.recurringServiceID = rs.id  
-            JOIN Property p ON p.id = (
-                SELECT propertyID FROM RecurringServiceList WHERE recurringServiceID = wr.recurringServiceID
-            )  
-            JOIN Client c ON c.id = p.clientID 
-        WHERE c.accountNumber = %s;
-        """
-
+        # Prompt the user to enter the client's unique account number and the optional filters
+        params = {
+            "accountNumber": input("Enter Client Account Number (Example: C0001): ").strip(),
+            "startDate": input("Enter start date (YYYY-MM-DD, leave empty for no limit): ").strip(),
+            "endDate": input("Enter end date (YYYY-MM-DD, leave empty for no limit): ").strip(),
+            "propertyNumber": input("Enter Property Number (leave empty for all properties): ").strip(),
+        }
+
+        count = 0
         try:
-            # Open a database cursor using 'with' to ensure it's properly closed after execution
-            with self.conn.cursor() as cur:
-                # Execute the SQL query safely using parameterized queries to prevent SQL injection
-                cur.execute(query, (account_number,))
-                
-                # Fetch all matching service history records
-                records = cur.fetchall()
-                
-                # If no records found, print an error message
-                if not records:
-                    print("Error: Client not found or no service history available.")
-                else:
+            for row in self.stream(params):
+                if count == 0:
                     # Display the retrieved service history in a readable format
                     print("\nService History:")
-                    for row in records:
-                        print(f"Start Time: {row[0]}, End Time: {row[1]}, Service: {row[2]}, Duration: {row[3]} hours, Cost: ${row[4]}")
-        
+                print(f"Start Time: {row[0]}, End Time: {row[1]}, Service: {row[2]}, Duration: {row[3]} hours, "
+                      f"Cost: ${row[4]}, Property: {row[5]}")
+                count += 1
+            breakdown = self.run({**params, "breakdown": True}).rows if count else []
+        except APIError as e:
+            print(f"Error: {e}")
+            return
         except Exception as e:
             # Print a error message if a database error occurs
             print("An error occurred while retrieving service history.")
+            return
+
+        # If no records found, print an error message
+        if not count:
+            print("Error: Client not found or no service history available.")
+            return
+
+        print("\nBy Property:")
+        for row in breakdown:
+            print(f"Property: {row[0]} ({row[1]}), Services: {row[2]}, Time Worked: {row[3]}, Cost: {row[4]}")
 
 # ---------------------------
 # ListAssignedService API
@@ -319,16 +534,47 @@ class ListAssignedServices(APIEndpoint):  # List API for retrieving assigned ser
     """
     This class retrieves all currently assigned services for a given property.
     - Includes service type, duration, and price
-    - Supports filtering through limit and offset
+    - Returns one page at a time, with a continuation token for the next page
     """
 
-    def __init__(self, conn):
+    name = "ListAssignedServices"
+
+    # Columns returned for each assigned service, in row order
+    COLUMNS = ["serviceNum", "name", "allocatedManHours", "price"]
+
+    def __init__(self, pool):
         """
-        Initializes the class with a database connection.
+        Initializes the class with the shared connection pool and registers its SQL statements.
+        Pages are ordered by (name, serviceNum). Later pages seek past the last key returned
+        (keyset pagination), so page N costs the same as page 1 and rows inserted or removed
+        between requests never shift a page.
         
-        :param conn: Database connection object
+        :param pool: ConnectionPool that hands out a connection per run()
         """
-        self.conn = conn  # Store the database connection object for executing queries
+        self.pool = pool  # Store the connection pool used for executing queries
+
+        # First page of assigned services for a property
+        statements.register("list_assigned_services", ("text", "integer"), """
+            SELECT rs.serviceNum, rs.name, rs.allocatedManHours, rs.price
+            FROM RecurringServiceList rsl
+                JOIN RecurringService rs ON rsl.recurringServiceID = rs.id
+                JOIN Property p ON p.id = rsl.propertyID
+            WHERE p.propertyNumber = $1 AND rsl.activeStatus = TRUE
+            ORDER BY rs.name, rs.serviceNum
+            LIMIT $2;
+            """)
+
+        # Following pages: continue after the (name, serviceNum) carried by the page token
+        statements.register("list_assigned_services_after", ("text", "text", "text", "integer"), """
+            SELECT rs.serviceNum, rs.name, rs.allocatedManHours, rs.price
+            FROM RecurringServiceList rsl
+                JOIN RecurringService rs ON rsl.recurringServiceID = rs.id
+                JOIN Property p ON p.id = rsl.propertyID
+            WHERE p.propertyNumber = $1 AND rsl.activeStatus = TRUE
+                AND (rs.name, rs.serviceNum) > ($2, $3)
+            ORDER BY rs.name, rs.serviceNum
+            LIMIT $4;
+            """)
 
     def display_brief(self, index: int):
         """
@@ -343,65 +589,288 @@ class ListAssignedServices(APIEndpoint):  # List API for retrieving assigned ser
         Displays detailed information about what this API does.
         """
         print("\n--- ListAssignedServices ---")
-        print("Lists all active services currently assigned to a property, with optional filtering.")
+        print("Lists all active services currently assigned to a property, one page at a time.")
         print("\nParameters:")
         print("\t- propertyNumber (text): The property number where services are assigned.")
         print("\t- limit (integer, optional): Max number of results per page (default: 10).")
-        print("\t- offset (integer, optional): The number of records to skip (default: 0, starts from first record).")
         print("\nReturns:")
         print("\t- A list of active services assigned to the specified property, showing the service number, name, allocated time, and cost.")
+        print("\t- After each page you can choose to show the next one.")
         print("\nExample Input:")
-        print("propertyNumber = 'P001', limit = 5, offset = 0")
+        print("propertyNumber = 'P001', limit = 5")
         print("-------------------------\n")
 
+    def run(self, params: dict, conn=None) -> APIResult:
+        """
+        Fetches the active services assigned to a property, one page at a time.
+
+        :param params: propertyNumber (text), limit (integer, default 10),
+                       pageToken (text, optional: the next_token of the previous page)
+        :param conn: Optional connection owned by the caller's transaction
+        :return: APIResult with one row per assigned service; next_token is set while more pages remain
+        """
+        property_number = optional_text(params.get("propertyNumber"))
+        limit = parse_limit(params.get("limit"), 10)        # Default value is 10
+        after = decode_page_token(params.get("pageToken"), self.name, 2)
+
+        # Open a database cursor using 'with' to ensure it's properly closed after execution
+        with self.transaction(conn) as conn, conn.cursor() as cur:
+            # Fetch one extra row to learn whether another page follows
+            if after is None:
+                statements.execute(cur, "list_assigned_services", (property_number, limit + 1))
+            else:
+                statements.execute(cur, "list_assigned_services_after", (property_number, *after, limit + 1))
+
+            # Fetch all matching records from the database
+            services = cur.fetchall()
+
+        return self.page_result(self.COLUMNS, services, limit, lambda row: (row[1], row[0]))
+
+    def list_query(self, params: dict):
+        """
+        Selects every assigned service of a property (no paging), for export().
+
+        :param params: propertyNumber (text)
+        :return: (statement name, statement parameters, columns)
+        """
+        return "list_assigned_services", (optional_text(params.get("propertyNumber")), None), self.COLUMNS
+
     def execute(self):
         """
         Executes the query to fetch assigned services for a property.
-        - Prompts the user for the property number
-        - Queries the database to retrieve assigned services
-        - Supports using LIMIT and OFFSET
-        - Prints the list of services or an error message if no records are found
+        - Prompts the user for the property number and page size
+        - Runs the query through run(), one page at a time
+        - Prints each page and offers the next one, or an error message if no records are found
         """
 
         # Prompt the user to enter the property number (identifier for the property)
-        property_number = input("Enter Property Number (Example: P001): ").strip()
+        # and the page size
+        params = {
+            "propertyNumber": input("Enter Property Number (Example: P001): ").strip(),
+            "limit": input("Enter max results per page (default 10): ").strip(),
+        }
+
+        page = 1
+        while True:
+            try:
+                result = self.run(params)
+            except APIError as e:
+                print(f"Error: {e}")
+                return
+            except Exception as e:
+                # Print a error message if a database error occurs
+                print("An error occurred while retrieving assigned services.")
+                return
+
+            # If no records are found, display an error message
+            if page == 1 and not result.rows:
+                print("Error: No services found for this property.")
+                return
+
+            # Display the retrieved services in a user-friendly format
+            print(f"\nAssigned Services (page {page}):")
+            for row in result.rows:
+                print(f"Service Number: {row[0]}, Service: {row[1]}, Duration: {row[2]} hours, Cost: ${row[3]}")
+
+            if result.next_token is None:
+                return
+            if input("Show next page? (y/n): ").strip().lower() not in ("y", "yes"):
+                return
+            params["pageToken"] = result.next_token
+            page += 1
+
+
+# ---------------------------
+# VisitSchedule API
+# ---------------------------
+class VisitSchedule(APIEndpoint):  # List API for the dated visits of every active assignment
+    """
+    This class expands the active service assignments into dated visits over a date range.
+    - Weekly and biweekly visits repeat from each assignment's startDate (migration 0006),
+      monthly and quarterly ones on its day of the month
+    - Reads come from the shared ScheduleCache (schedule.py), which AssignRecurringService,
+      UpdateService and UpdateClientProperties keep current
+    - Visits come one page at a time (keyset pageToken); one property's or service's visits are
+      computed from its own assignments only
+    - In summary mode, returns the number of visits per day instead of the visits
+    """
+
+    name = "VisitSchedule"
+
+    # Columns returned for each visit, in row order
+    COLUMNS = ["visitDate", "propertyNumber", "serviceNum", "serviceName", "frequency", "allocatedManHours"]
+    SUMMARY_COLUMNS = ["visitDate", "visits"]
+
+    # Days shown when no endDate is given
+    DEFAULT_DAYS = 7
+
+    # Visits per page when no limit is given
+    DEFAULT_LIMIT = 1000
+
+    def __init__(self, pool):
+        """
+        Initializes the class with the shared connection pool. No statements are registered:
+        the schedule cache loads the assignments itself.
 
-        # Prompt the user for filtering options (limit and offset for pagination)
-        limit = input("Enter max results per page (default 10): ").strip() or "10"  
-        # Default value is 10
-        offset = input("Enter offset (default 0, start from first result): ").strip() or "0"  
-        # Default value is 0
+        :param pool: ConnectionPool the schedule cache loads from
+        """
+        self.pool = pool
+
+    def display_brief(self, index: int):
+        """
+        Displays a brief description of this API's functionality.
 
-        # SQL query to fetch assigned services for a given property
-        query = """
-        SELECT rs.serviceNum, rs.name, rs.allocatedManHours, rs.price
-        FROM RecurringServiceList rsl
-            JOIN RecurringService rs ON rsl.recurringServiceID = rs.id
-            JOIN Property p ON p.id = rsl.propertyID
-        WHERE p.propertyNumber = %s AND rsl.activeStatus = TRUE
-        ORDER BY rs.name
-        LIMIT %s OFFSET %s;
+        :param index: Index of the API in a list of available APIs
         """
+        print(f"{index}. VisitSchedule - List the visits due for every active service over a date range.")
 
+    def display_details(self):
+        """
+        Displays detailed information about what this API does.
+        """
+        print("\n--- VisitSchedule ---")
+        print("Lists the visits due for every active service assignment, day by day.")
+        print("Services are visited from their start date on: weekly and biweekly on the same weekday,")
+        print("monthly and quarterly on the same day of the month (the last day in shorter months).")
+        print("\nParameters:")
+        print("\t- startDate (date, optional): First day (YYYY-MM-DD, default: today)")
+        print(f"\t- endDate (date, optional): Last day (default: {self.DEFAULT_DAYS} days from startDate, "
+              f"at most {schedule.MAX_HORIZON_DAYS} days)")
+        print("\t- propertyNumber (text, optional): Only visits to this property")
+        print("\t- serviceNum (text, optional): Only visits of this service")
+        print("\t- summary (true/false, optional): Only the number of visits per day")
+        print(f"\t- limit (integer, optional): Max number of visits per page (default: {self.DEFAULT_LIMIT})")
+        print("\t- refresh (true/false, optional): Reload every assignment first (after changes made outside the APIs)")
+        print("\nReturns:")
+        print("\t- One row per visit: date, property number, service number and name, frequency, allocated time")
+        print("\t- In summary mode, one row per day: date, number of visits")
+        print("\t- The visits come one page at a time; after each page you can choose to show the next one")
+        print("\nExample Input:")
+        print("startDate = '2025-07-01', endDate = '2025-07-31', propertyNumber = 'P001'")
+        print("-------------------------\n")
+
+    def run(self, params: dict, conn=None) -> APIResult:
+        """
+        Expands the active assignments into the visits due from startDate to endDate.
+
+        :param params: startDate, endDate (dates), propertyNumber, serviceNum (text),
+                       summary, refresh (true/false), limit (integer, default DEFAULT_LIMIT),
+                       pageToken (text, optional: the next_token of the previous page)
+        :param conn: Not used; the schedule cache reads through its own pool connection
+        :return: APIResult with one row per visit ordered by date, property and service (next_token
+                 is set while more pages remain), or one row per day in summary mode
+        """
+        start, end = self._range(params)
+        property_number = optional_text(params.get("propertyNumber"))
+        service_num = optional_text(params.get("serviceNum"))
+        summary = parse_bool(params.get("summary"), "summary")
+        limit = parse_limit(params.get("limit"), self.DEFAULT_LIMIT)
+        after = self._page_token(params.get("pageToken"))
+
+        visit_schedule = schedule.for_pool(self.pool)
+        if parse_bool(params.get("refresh"), "refresh"):
+            visit_schedule.invalidate()
+
+        filtered = property_number is not None or service_num is not None
         try:
-            # Open a database cursor using 'with' to ensure it's properly closed after execution
-            with self.conn.cursor() as cur:
-                # Execute the SQL query with the provided inputs (ensuring safe parameterized query execution)
-                cur.execute(query, (property_number, limit, offset))
-                
-                # Fetch all matching records from the database
-                services = cur.fetchall()
-                
-                # If no records are found, display an error message
-                if not services:
-                    print("Error: No services found for this property.")
-                else:
-                    # Display the retrieved services in a user-friendly format
-                    print("\nAssigned Services:")
-                    for row in services:
-                        print(f"Service Number: {row[0]}, Service: {row[1]}, Duration: {row[2]} hours, Cost: ${row[3]}")
-        
-        except Exception as e:
-            # Print a error message if a database error occurs
-             print("An error occurred while retrieving assigned services.")
+            if summary and not filtered:
+                return APIResult(self.SUMMARY_COLUMNS, visit_schedule.counts(start, end))
+            if summary:
+                # Only the matching assignments are expanded, so counting their visits is cheap
+                totals = dict.fromkeys(self._days(start, end), 0)
+                for day, _, _ in visit_schedule.visits(start, end, property_number, service_num):
+                    totals[day] += 1
+                return APIResult(self.SUMMARY_COLUMNS, list(totals.items()))
+            # One extra visit tells whether another page follows
+            visits = list(itertools.islice(visit_schedule.visits(start, end, property_number, service_num, after),
+                                           limit + 1))
+        except errors.UndefinedColumn:
+            # No RecurringServiceList.startDate yet
+            raise APIError("The visit schedule needs migration 0006: run migrate.py first.")
+
+        rows = [(day, a.propertyNumber, a.serviceNum, a.serviceName, a.frequency, a.allocatedManHours)
+                for day, _, a in visits[:limit]]
+        next_token = None
+        if len(visits) > limit:
+            day, key, _ = visits[limit - 1]
+            next_token = encode_page_token(self.name, (day, key))
+        return APIResult(self.COLUMNS, rows, next_token=next_token)
+
+    def _page_token(self, token):
+        """
+        Decodes a pageToken into the (date, assignment key) of the last visit already returned.
+
+        :param token: next_token of the previous page, or blank for the first page
+        :return: (date, key), or None for the first page
+        """
+        after = decode_page_token(token, self.name, 2)
+        if after is None:
+            return None
+        try:
+            return datetime.date.fromisoformat(after[0]), int(after[1])
+        except (TypeError, ValueError):
+            raise APIError("Invalid page token.")
 
+    def _range(self, params):
+        """
+        Reads and checks the requested date range.
+
+        :param params: startDate and endDate (optional)
+        :return: (first day, last day)
+        """
+        start = parse_date(params.get("startDate"), "startDate") or datetime.date.today()
+        end = parse_date(params.get("endDate"), "endDate") or start + datetime.timedelta(days=self.DEFAULT_DAYS - 1)
+        if end < start:
+            raise APIError("endDate must not be before startDate.")
+        if (end - start).days >= schedule.MAX_HORIZON_DAYS:
+            raise APIError(f"The date range may span at most {schedule.MAX_HORIZON_DAYS} days.")
+        return start, end
+
+    @staticmethod
+    def _days(start, end):
+        return [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+    def execute(self):
+        """
+        Prompts for a date range and optional filters, then prints the visits due, day by day.
+        """
+        params = {
+            "startDate": input("Enter start date (YYYY-MM-DD, or press enter for today): ").strip(),
+            "endDate": input(f"Enter end date (YYYY-MM-DD, or press enter for {self.DEFAULT_DAYS} days): ").strip(),
+            "propertyNumber": input("Enter property number (or press enter for all): ").strip(),
+            "serviceNum": input("Enter service number (or press enter for all): ").strip(),
+            "summary": input("Only show the number of visits per day? (true/false, default false): ").strip(),
+        }
+
+        current = None
+        page = 1
+        while True:
+            try:
+                result = self.run(params)
+            except APIError as e:
+                print(f"Error: {e}")
+                return
+            except Exception as e:
+                print("An error occurred while expanding the visit schedule:", e)
+                return
+
+            if page == 1 and not result.rows:
+                print("No visits are due in this date range.")
+                return
+            if result.columns == self.SUMMARY_COLUMNS:
+                print("\nVisits per day:")
+                for day, visits in result.rows:
+                    print(f"{day}: {visits}")
+                return
+            for day, property_number, service_num, service_name, frequency, hours in result.rows:
+                if day != current:
+                    print(f"\n{day}:")
+                    current = day
+                print(f"\t{property_number} - {service_num} {service_name} ({frequency}, {hours})")
+
+            if result.next_token is None:
+                return
+            if input("\nShow next page? (y/n): ").strip().lower() not in ("y", "yes"):
+                return
+            params["pageToken"] = result.next_token
+            page += 1
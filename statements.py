@@ -0,0 +1,222 @@
+# statements.py
+
+import csv
+import itertools
+import re
+import threading
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import errors, extensions
+
+
+# ---------------------------
+# StatementRegistry
+# Central catalogue of every prepared statement used by the API endpoints.
+# Registering a statement costs nothing; it is PREPAREd lazily the first time
+# it is executed on a physical connection. All statements still missing on
+# that connection are prepared together in a single multi-statement round trip.
+#
+# Statement families cover SQL generated at run time, such as an UPDATE of whichever columns
+# were supplied: each distinct shape (e.g. the tuple of columns) gets its own statement,
+# prepared once per connection and kept in a per-connection LRU of SHAPE_CACHE_SIZE entries.
+# ---------------------------
+
+# Rows fetched per round trip when a statement is streamed through a server-side cursor
+STREAM_FETCH_SIZE = 1000
+
+# Output formats supported by copy_out()
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Prepared shapes kept per family on each connection before the least recently used is deallocated
+SHAPE_CACHE_SIZE = 16
+
+# $1, $2, ... placeholders in a statement body
+PARAM_PATTERN = re.compile(r"\$(\d+)")
+
+
+class StatementRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}   # statement name -> (argument types, query body)
+        self._prepared = {}     # connection key -> set of statement names prepared on it
+        self._families = {}     # family name -> (build, capacity, {shape: (statement name, argtypes, body)})
+        self._shapes = {}       # (connection key, family name) -> LRU of statement names prepared on it
+        self._cursor_ids = itertools.count(1)
+
+    # Register (or re-register) a statement: register("retrieve_client", ("text",), "SELECT ...")
+    def register(self, name, argtypes, body):
+        with self._lock:
+            self._statements[name] = (tuple(argtypes), body.strip().rstrip(";"))
+
+    # Register a family of generated statements
+    # build(shape) returns (argument types, query body) for a hashable shape, e.g. a tuple of columns
+    def register_family(self, family, build, capacity=SHAPE_CACHE_SIZE):
+        with self._lock:
+            self._families[family] = (build, capacity, {})
+
+    # Build the PREPARE command for a registered statement
+    def prepare_sql(self, name, argtypes=None, body=None):
+        if body is None:
+            argtypes, body = self._statements[name]
+        if argtypes:
+            return f"PREPARE {name}({', '.join(argtypes)}) AS {body}"
+        return f"PREPARE {name} AS {body}"
+
+    # Prepare the given statements (or every registered one) that the connection is missing
+    # Runs in one round trip, no matter how many statements are missing
+    def ensure(self, conn, *names):
+        prepared = self._prepared_on(conn)
+        with self._lock:
+            wanted = names or tuple(self._statements)
+            missing = [name for name in wanted if name not in prepared]
+            sql = ";\n".join(self.prepare_sql(name) for name in missing)
+        if not missing:
+            return
+        cur = conn.cursor()
+        try:
+            cur.execute(sql)
+        finally:
+            cur.close()
+        prepared.update(missing)
+
+    # Execute a registered statement, preparing it first if this connection has not seen it yet
+    def execute(self, cur, name, params=()):
+        self.ensure(cur.connection, name)
+        placeholders = ", ".join(["%s"] * len(params))
+        try:
+            cur.execute(f"EXECUTE {name}({placeholders});" if params else f"EXECUTE {name};", params)
+        except errors.InvalidSqlStatementName:
+            # The server session lost its statements (e.g. DISCARD ALL); re-prepare on next use
+            self.forget(cur.connection)
+            raise
+
+    # Execute the statement of a family for one shape
+    # A shape this connection already has costs the EXECUTE round trip only. A new one is prepared
+    # first, deallocating the connection's least recently used shapes beyond the family's capacity.
+    def execute_shape(self, cur, family, shape, params=()):
+        conn = cur.connection
+        key = self._connection_key(conn)
+        with self._lock:
+            build, capacity, shapes = self._families[family]
+            if shape not in shapes:
+                argtypes, body = build(shape)
+                shapes[shape] = (f"{family}_{len(shapes) + 1}", tuple(argtypes), body.strip().rstrip(";"))
+            name, argtypes, body = shapes[shape]
+            lru = self._shapes.setdefault((key, family), OrderedDict())
+            missing = name not in lru
+            if not missing:
+                lru.move_to_end(name)
+            evict = list(lru)[:max(0, len(lru) + 1 - capacity)] if missing else []
+
+        if missing:
+            # PREPARE runs first, so a failure leaves the evicted statements (and the bookkeeping) in place
+            sql = ";\n".join([self.prepare_sql(name, argtypes, body)] + [f"DEALLOCATE {old}" for old in evict])
+            cur.execute(sql)
+            with self._lock:
+                for old in evict:
+                    lru.pop(old, None)
+                lru[name] = True
+
+        placeholders = ", ".join(["%s"] * len(params))
+        try:
+            cur.execute(f"EXECUTE {name}({placeholders});" if params else f"EXECUTE {name};", params)
+        except errors.InvalidSqlStatementName:
+            self.forget(conn)
+            raise
+
+    # The statement body with $n placeholders rewritten for client-side binding (%(pn)s::type)
+    # DECLARE CURSOR cannot wrap an EXECUTE, so streamed statements are sent as plain queries
+    def bind_sql(self, name):
+        argtypes, body = self._statements[name]
+        body = body.replace("%", "%%")
+        return PARAM_PATTERN.sub(lambda m: f"%(p{m.group(1)})s::{argtypes[int(m.group(1)) - 1]}", body)
+
+    # Yield the rows of a registered statement through a named (server-side) cursor
+    # Only fetch_size rows are held in memory at a time, and the first rows arrive before the
+    # query has finished. Must be consumed inside a transaction on the same connection.
+    def stream(self, conn, name, params=(), fetch_size=STREAM_FETCH_SIZE):
+        sql = self.bind_sql(name)
+        cur = conn.cursor(name=f"{name}_cursor_{next(self._cursor_ids)}")
+        try:
+            cur.execute(sql, {f"p{i}": value for i, value in enumerate(params, start=1)})
+            while True:
+                rows = cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cur.close()
+
+    # Write every row of a registered statement to a text file with COPY (query) TO STDOUT
+    #   - "csv": a header row of column names, then one CSV line per row
+    #   - "jsonl": one JSON object per row, keyed by column names
+    # The server formats the rows and psycopg2 copies them to the file in chunks, so no Python
+    # object is built per row and memory stays constant. Returns the number of rows written.
+    def copy_out(self, cur, name, params, out, columns, fmt="csv"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'.")
+        # COPY takes no parameters, so the values are inlined with psycopg2's own quoting
+        query = cur.mogrify(self.bind_sql(name), {f"p{i}": value for i, value in enumerate(params, start=1)})
+        # A trailing newline keeps a final "-- comment" in the body from swallowing the closing parenthesis
+        query = query.decode(extensions.encodings[cur.connection.encoding]) + "\n"
+        aliases = ", ".join(f'"{column}"' for column in columns)
+
+        # The leading comment names the statement for the query tracer
+        if fmt == "csv":
+            csv.writer(out, lineterminator="\n").writerow(columns)
+            cur.copy_expert(f"/* {name} */ COPY ({query}) TO STDOUT WITH (FORMAT csv)", out)
+        else:
+            # One text column per row; CSV format with quote/delimiter characters that JSON never
+            # contains raw, so the JSON is written exactly as the server rendered it (no escaping)
+            cur.copy_expert(f"/* {name} */ COPY (SELECT row_to_json(q) FROM ({query}) AS q({aliases})) "
+                            f"TO STDOUT WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')", out)
+        return cur.rowcount
+
+    # Drop everything known about a connection (called when the pool closes it)
+    def forget(self, conn):
+        with self._lock:
+            for key in [key for key in self._prepared if key[0] == id(conn)]:
+                del self._prepared[key]
+            for key in [key for key in self._shapes if key[0][0] == id(conn)]:
+                del self._shapes[key]
+
+    # Statements are tracked per server session, so a reconnect starts from an empty set
+    def _connection_key(self, conn):
+        try:
+            return (id(conn), conn.get_backend_pid())
+        except psycopg2.Error:
+            return (id(conn), None)
+
+    def _prepared_on(self, conn):
+        key = self._connection_key(conn)
+        with self._lock:
+            return self._prepared.setdefault(key, set())
+
+
+# The process-wide registry shared by every endpoint module
+registry = StatementRegistry()
+
+
+def register(name, argtypes, body):
+    registry.register(name, argtypes, body)
+
+
+def execute(cur, name, params=()):
+    registry.execute(cur, name, params)
+
+
+def register_family(family, build, capacity=SHAPE_CACHE_SIZE):
+    registry.register_family(family, build, capacity)
+
+
+def execute_shape(cur, family, shape, params=()):
+    registry.execute_shape(cur, family, shape, params)
+
+
+def stream(conn, name, params=(), fetch_size=STREAM_FETCH_SIZE):
+    return registry.stream(conn, name, params, fetch_size)
+
+
+def copy_out(cur, name, params, out, columns, fmt="csv"):
+    return registry.copy_out(cur, name, params, out, columns, fmt)
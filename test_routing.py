@@ -0,0 +1,68 @@
+# test_routing.py
+
+import datetime
+import random
+import unittest
+
+import routing
+from schedule import Assignment
+
+# ---------------------------
+# Checks of the daily route planning (routing.py): whatever the visits and crew, every visit is
+# planned exactly once (in a route or unassigned) and no route is longer than the workday.
+#
+#   python3 -m unittest test_routing
+# ---------------------------
+
+
+def visit(number, minutes, zipcode="98101", city="Seattle"):
+    return Assignment(f"P{number:04d}", f"RS{number:04d}", "Mowing", "W", datetime.date(2025, 1, 1),
+                      datetime.timedelta(minutes=minutes), city, "WA", zipcode)
+
+
+class PlanRoutesTest(unittest.TestCase):
+    def check_plan(self, visits, employees, workday_hours):
+        routes, unassigned = routing.plan_routes(visits, employees, workday_hours)
+        self.assertEqual([route.employee for route in routes], list(employees))
+        planned = [v for route in routes for v in route.visits] + unassigned
+        self.assertEqual(sorted(planned), sorted(visits))
+        for route in routes:
+            self.assertAlmostEqual(route.hours, sum(routing.visit_hours(v) for v in route.visits))
+            self.assertLessEqual(route.hours, workday_hours + 1e-9)
+        return routes, unassigned
+
+    def test_random_plans_keep_every_visit_once_within_the_workday(self):
+        rng = random.Random(475)
+        for _ in range(300):
+            zipcodes = [f"98{rng.randrange(100, 200)}" for _ in range(rng.randrange(1, 8))]
+            visits = [visit(n, rng.choice((15, 30, 45, 60, 90, 120, 240, 600)), rng.choice(zipcodes))
+                      for n in range(rng.randrange(0, 60))]
+            employees = [f"E{n:04d}" for n in range(rng.randrange(0, 10))]
+            self.check_plan(visits, employees, rng.choice((4, 8, 10)))
+
+    def test_visit_longer_than_the_workday_is_unassigned(self):
+        long_visit = visit(1, 9 * 60)
+        routes, unassigned = self.check_plan([long_visit, visit(2, 60)], ["E0001", "E0002"], 8)
+        self.assertEqual(unassigned, [long_visit])
+
+    def test_no_employees_leaves_everything_unassigned(self):
+        visits = [visit(1, 60), visit(2, 30)]
+        routes, unassigned = self.check_plan(visits, [], 8)
+        self.assertEqual(routes, [])
+        self.assertEqual(sorted(unassigned), sorted(visits))
+
+    def test_too_much_work_is_unassigned_not_overbooked(self):
+        visits = [visit(n, 120) for n in range(20)]
+        routes, unassigned = self.check_plan(visits, ["E0001", "E0002"], 8)
+        self.assertEqual([len(route.visits) for route in routes], [4, 4])
+        self.assertEqual(len(unassigned), 12)
+
+    def test_zipcodes_stay_together_when_they_fit(self):
+        visits = [visit(n, 60, zipcode) for n, zipcode in enumerate(["98101"] * 4 + ["98199"] * 4)]
+        routes, unassigned = self.check_plan(visits, ["E0001", "E0002"], 8)
+        self.assertEqual(unassigned, [])
+        self.assertEqual([{v.zipcode for v in route.visits} for route in routes], [{"98101"}, {"98199"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# test_schedule.py
+
+import datetime
+import itertools
+import random
+import unittest
+
+import schedule
+
+# ---------------------------
+# Checks of the visit schedule expansion (schedule.py) that need no database: assignments are
+# given as rows of ASSIGNMENT_QUERY through a ScheduleCache whose _query is replaced.
+#
+#   python3 -m unittest test_schedule
+# ---------------------------
+
+HOUR = datetime.timedelta(hours=1)
+
+
+def row(number, frequency, start, property_number=None):
+    # (propertyID, recurringServiceID, then the Assignment fields), one property per service by default
+    return (number, number, property_number or f"P{number:04d}", f"RS{number:04d}", "Mowing", frequency,
+            start, HOUR, "Seattle", "WA", "98101")
+
+
+class FakeCache(schedule.ScheduleCache):
+    def __init__(self, rows):
+        super().__init__(pool=None)
+        self.rows = rows
+
+    def _query(self, sql, params=None):
+        if params is None:
+            return list(self.rows)
+        return [r for r in self.rows if r[3] in params[0]]
+
+
+def dates(cache, start, end, **filters):
+    return [(day, assignment.serviceNum) for day, _, assignment in cache.visits(start, end, **filters)]
+
+
+class ResidueClassTest(unittest.TestCase):
+    def test_weekly_and_biweekly_classes(self):
+        start = datetime.date(2025, 3, 5)
+        self.assertEqual(schedule.class_of(schedule.Assignment(*row(1, "W", start)[2:])),
+                         ("D", 7, start.toordinal() % 7))
+        self.assertEqual(schedule.class_of(schedule.Assignment(*row(1, "B", start)[2:])),
+                         ("D", 14, start.toordinal() % 14))
+
+    def test_monthly_and_quarterly_classes(self):
+        start = datetime.date(2025, 5, 17)
+        month = schedule.month_number(start)
+        self.assertEqual(schedule.class_of(schedule.Assignment(*row(1, "M", start)[2:])), ("M", 1, 0, 17))
+        self.assertEqual(schedule.class_of(schedule.Assignment(*row(1, "Q", start)[2:])), ("M", 3, month % 3, 17))
+
+    def test_unknown_frequency_is_not_filed(self):
+        cache = FakeCache([row(1, "X", datetime.date(2025, 1, 1))])
+        self.assertEqual(dates(cache, datetime.date(2025, 1, 1), datetime.date(2025, 12, 31)), [])
+
+    def test_every_frequency_repeats_from_its_start_date(self):
+        cache = FakeCache([row(1, "W", datetime.date(2025, 1, 6)), row(2, "B", datetime.date(2025, 1, 6)),
+                           row(3, "M", datetime.date(2025, 1, 6)), row(4, "Q", datetime.date(2025, 1, 6))])
+        start, end = datetime.date(2025, 1, 1), datetime.date(2025, 4, 30)
+        visits = dates(cache, start, end)
+        by_service = {num: [day for day, service in visits if service == num]
+                      for num in ("RS0001", "RS0002", "RS0003", "RS0004")}
+        weekly = [datetime.date(2025, 1, 6) + datetime.timedelta(days=7 * n) for n in range(17)]
+        self.assertEqual(by_service["RS0001"], weekly)
+        self.assertEqual(by_service["RS0002"], weekly[::2])
+        self.assertEqual(by_service["RS0003"], [datetime.date(2025, m, 6) for m in (1, 2, 3, 4)])
+        self.assertEqual(by_service["RS0004"], [datetime.date(2025, 1, 6), datetime.date(2025, 4, 6)])
+        # Visits are ordered by date, then by property and service
+        self.assertEqual(visits, sorted(visits))
+
+
+class MonthEndTest(unittest.TestCase):
+    def test_monthly_on_the_31st_falls_on_the_last_day_of_shorter_months(self):
+        cache = FakeCache([row(1, "M", datetime.date(2024, 1, 31))])
+        visits = [day for day, _ in dates(cache, datetime.date(2024, 1, 1), datetime.date(2024, 6, 30))]
+        self.assertEqual(visits, [datetime.date(2024, 1, 31), datetime.date(2024, 2, 29), datetime.date(2024, 3, 31),
+                                  datetime.date(2024, 4, 30), datetime.date(2024, 5, 31), datetime.date(2024, 6, 30)])
+
+    def test_quarterly_on_the_30th_in_february(self):
+        cache = FakeCache([row(1, "Q", datetime.date(2024, 11, 30))])
+        visits = [day for day, _ in dates(cache, datetime.date(2024, 11, 1), datetime.date(2025, 8, 31))]
+        self.assertEqual(visits, [datetime.date(2024, 11, 30), datetime.date(2025, 2, 28),
+                                  datetime.date(2025, 5, 30), datetime.date(2025, 8, 30)])
+
+    def test_dates_of_clamps_like_the_residue_classes(self):
+        for start in (datetime.date(2024, 1, 29), datetime.date(2024, 1, 30), datetime.date(2024, 1, 31),
+                      datetime.date(2023, 12, 31), datetime.date(2024, 2, 29)):
+            for frequency in ("M", "Q"):
+                cache = FakeCache([row(1, frequency, start)])
+                first, last = datetime.date(2023, 12, 1), datetime.date(2025, 3, 31)
+                expected = [day.toordinal() for day, _ in dates(cache, first, last)]
+                assignment = schedule.Assignment(*row(1, frequency, start)[2:])
+                self.assertEqual(schedule.dates_of(assignment, first, last), expected, (start, frequency))
+
+
+class ScheduleCacheTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(475)
+        first = datetime.date(2024, 1, 1)
+        self.rows = [row(n, rng.choice("WBMQ"), first + datetime.timedelta(days=rng.randrange(400)), f"P{n // 3:04d}")
+                     for n in range(1, 301)]
+        self.cache = FakeCache(self.rows)
+        self.start, self.end = datetime.date(2024, 6, 1), datetime.date(2025, 5, 31)
+
+    def test_no_visit_before_the_start_date(self):
+        starts = {r[3]: r[6] for r in self.rows}
+        for day, service in dates(self.cache, self.start, self.end):
+            self.assertGreaterEqual(day, starts[service])
+
+    def test_counts_match_the_visits(self):
+        visits = dates(self.cache, self.start, self.end)
+        per_day = {day: len(list(group)) for day, group in itertools.groupby(visits, key=lambda visit: visit[0])}
+        days = [self.start + datetime.timedelta(days=n) for n in range((self.end - self.start).days + 1)]
+        self.assertEqual(self.cache.counts(self.start, self.end), [(day, per_day.get(day, 0)) for day in days])
+
+    def test_filters_match_the_full_listing(self):
+        everything = list(self.cache.visits(self.start, self.end))
+        filters = [("P0005", None), (None, "RS0017"), ("P0005", "RS0016"), ("P0005", "RS0001")]
+        for property_number, service_num in filters:
+            expected = [visit for visit in everything
+                        if property_number in (None, visit[2].propertyNumber)
+                        and service_num in (None, visit[2].serviceNum)]
+            self.assertEqual(list(self.cache.visits(self.start, self.end, property_number, service_num)), expected)
+
+    def test_resuming_after_a_visit_continues_the_listing(self):
+        everything = list(self.cache.visits(self.start, self.end))
+        for position in (0, 1, 57, len(everything) // 2, len(everything) - 1):
+            day, key, _ = everything[position]
+            self.assertEqual(list(self.cache.visits(self.start, self.end, after=(day, key))), everything[position + 1:])
+            property_number = everything[position][2].propertyNumber
+            filtered = [visit for visit in everything[position + 1:] if visit[2].propertyNumber == property_number]
+            self.assertEqual(list(self.cache.visits(self.start, self.end, property_number, after=(day, key))), filtered)
+
+    def test_invalidated_service_is_reloaded(self):
+        self.cache.counts(self.start, self.start)
+        changed = self.rows[10]
+        self.rows[10] = changed[:5] + ("W" if changed[5] != "W" else "M",) + changed[6:]
+        self.cache.invalidate_service(changed[3])
+        self.assertEqual(dates(self.cache, self.start, self.end), dates(FakeCache(self.rows), self.start, self.end))
+        self.assertEqual(list(self.cache.visits(self.start, self.end, property_number=changed[2])),
+                         list(FakeCache(self.rows).visits(self.start, self.end, property_number=changed[2])))
+
+
+if __name__ == "__main__":
+    unittest.main()
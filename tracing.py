@@ -0,0 +1,207 @@
+# tracing.py
+
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2 import extensions
+
+# ---------------------------
+# Query tracer
+# Every connection opened by ConnectionPool uses TracingConnection and TracingCursor, so each
+# database round trip made by an endpoint is timed and counted without changing endpoint code:
+#   - per statement: the prepared statement name for EXECUTE and server-side cursors, the
+#     name in a leading /* name */ comment (COPY exports), otherwise the normalized SQL text
+#   - per endpoint: calls, wall time of each run()/stream()/export() transaction, and the
+#     database time, round trips and rows of the statements run inside it
+# The driver shows the totals from its menu and can write them as JSON on exit; the HTTP
+# service returns them from GET /stats. Set "trace": False in DB_CONFIG to turn tracing off.
+# ---------------------------
+
+EXECUTE_PATTERN = re.compile(r"^\s*EXECUTE\s+(\w+)", re.IGNORECASE)
+COMMENT_PATTERN = re.compile(r"^\s*/\*\s*(\w+)\s*\*/")
+CURSOR_SUFFIX = re.compile(r"_cursor_\d+$")
+
+# Length of the SQL text kept as the key of statements that have no name
+SQL_KEY_LENGTH = 60
+
+# Attributed to round trips made outside any endpoint (pool health checks, migrations, ...)
+NO_ENDPOINT = "(no endpoint)"
+
+
+# The name a round trip is recorded under
+def statement_key(query, cursor_name=None):
+    if cursor_name:
+        return CURSOR_SUFFIX.sub("", cursor_name)
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        query = str(query)
+    match = COMMENT_PATTERN.match(query) or EXECUTE_PATTERN.match(query)
+    if match:
+        return match.group(1)
+    if query.lstrip()[:8].upper() == "PREPARE ":
+        return "(prepare)"
+    return " ".join(query.split())[:SQL_KEY_LENGTH]
+
+
+class QueryTracer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._statements = {}   # statement key -> totals
+            self._endpoints = {}    # endpoint name -> totals
+            self._started = time.time()
+
+    # One round trip: elapsed seconds and rows returned (or copied)
+    def record(self, statement, endpoint, elapsed, rows):
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                stats = self._statements[statement] = {"roundTrips": 0, "rows": 0, "totalMs": 0.0, "maxMs": 0.0}
+            stats["roundTrips"] += 1
+            stats["rows"] += rows
+            stats["totalMs"] += elapsed * 1000
+            stats["maxMs"] = max(stats["maxMs"], elapsed * 1000)
+
+            stats = self._endpoint(endpoint or NO_ENDPOINT)
+            stats["roundTrips"] += 1
+            stats["rows"] += rows
+            stats["dbMs"] += elapsed * 1000
+
+    # One endpoint call, timed from checkout to commit
+    def record_call(self, endpoint, elapsed):
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["calls"] += 1
+            stats["wallMs"] += elapsed * 1000
+
+    def _endpoint(self, name):
+        stats = self._endpoints.get(name)
+        if stats is None:
+            stats = self._endpoints[name] = {"calls": 0, "wallMs": 0.0, "dbMs": 0.0, "roundTrips": 0, "rows": 0}
+        return stats
+
+    # Copy of the totals, busiest first, with averages filled in
+    def snapshot(self):
+        with self._lock:
+            statements = {name: dict(stats) for name, stats in self._statements.items()}
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+            started = self._started
+        for stats in statements.values():
+            stats["avgMs"] = stats["totalMs"] / stats["roundTrips"]
+        for stats in endpoints.values():
+            stats["avgMs"] = stats["wallMs"] / stats["calls"] if stats["calls"] else 0.0
+        return {
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "statements": dict(sorted(statements.items(), key=lambda item: -item[1]["totalMs"])),
+            "endpoints": dict(sorted(endpoints.items(), key=lambda item: -(item[1]["wallMs"] or item[1]["dbMs"]))),
+        }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+            f.write("\n")
+
+    # Text tables of the busiest statements and endpoints
+    def print_report(self, out=sys.stdout, limit=20):
+        snapshot = self.snapshot()
+        print(f"\nQuery statistics since {snapshot['since']}", file=out)
+        print(f"\n{'Statement':<40} {'Trips':>7} {'Rows':>8} {'Total ms':>10} {'Avg ms':>8} {'Max ms':>8}", file=out)
+        print("-" * 86, file=out)
+        for name, s in list(snapshot["statements"].items())[:limit]:
+            print(f"{name[:40]:<40} {s['roundTrips']:>7} {s['rows']:>8} {s['totalMs']:>10.1f} "
+                  f"{s['avgMs']:>8.2f} {s['maxMs']:>8.1f}", file=out)
+        print(f"\n{'Endpoint':<24} {'Calls':>6} {'Trips':>7} {'Rows':>8} {'Wall ms':>10} {'DB ms':>10} {'Avg ms':>8}",
+              file=out)
+        print("-" * 78, file=out)
+        for name, s in snapshot["endpoints"].items():
+            print(f"{name[:24]:<24} {s['calls']:>6} {s['roundTrips']:>7} {s['rows']:>8} {s['wallMs']:>10.1f} "
+                  f"{s['dbMs']:>10.1f} {s['avgMs']:>8.2f}", file=out)
+
+
+# The process-wide tracer every traced connection reports to
+tracer = QueryTracer()
+
+
+# Connection that remembers which endpoint is using it
+class TracingConnection(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.endpoint = None
+
+
+# Cursor that times every round trip it makes
+class TracingCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            # A server-side cursor only declares the query here; its rows are counted as they are fetched
+            rows = self.rowcount if self.name is None and self.description is not None else 0
+            self._record(query, started, max(rows, 0))
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._record(sql, started, max(self.rowcount, 0))
+
+    # Fetches are round trips only on server-side (named) cursors
+    def fetchone(self):
+        if self.name is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._record(None, started, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        if self.name is None:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        started = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        self._record(None, started, len(rows))
+        return rows
+
+    def fetchall(self):
+        if self.name is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._record(None, started, len(rows))
+        return rows
+
+    def _record(self, query, started, rows):
+        tracer.record(statement_key(query, self.name), getattr(self.connection, "endpoint", None),
+                      time.perf_counter() - started, rows)
+
+
+# psycopg2.connect() arguments that turn tracing on
+CONNECT_KWARGS = {"connection_factory": TracingConnection, "cursor_factory": TracingCursor}
+
+
+# Attribute the round trips made on conn to an endpoint for the duration of the block
+# Nested blocks of the same endpoint (e.g. a helper run inside run()) count as one call
+@contextmanager
+def endpoint_call(conn, name):
+    if not isinstance(conn, TracingConnection):
+        yield
+        return
+    previous = conn.endpoint
+    conn.endpoint = name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        conn.endpoint = previous
+        if previous != name:
+            tracer.record_call(name, time.perf_counter() - started)
@@ -0,0 +1,561 @@
+# workrecordmanagement.py
+
+import csv
+import datetime
+import io
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from psycopg2 import errors
+
+from api_endpoint import APIEndpoint, APIError, APIResult, optional_text, parse_bool, parse_date
+import routing
+import schedule
+import statements
+import tracing
+
+# Columns returned for every check-in, in row order
+CHECKIN_COLUMNS = ["workRecordNum", "employeeNum", "serviceNum", "startTime"]
+
+# Check-ins written by one flush of the ingest buffer (one COPY and one INSERT ... SELECT)
+INGEST_BATCH_SIZE = 1000
+
+# Seconds a check-in waits for others to share its flush
+INGEST_FLUSH_INTERVAL = 0.05
+
+
+# Current time as stored in WorkRecord (whole seconds, local time like the rest of the data)
+def now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+
+# Parse an optional YYYY-MM-DD HH:MI[:SS] timestamp; blank becomes the current time
+def parse_timestamp(value, field):
+    if value is None or str(value).strip() == "":
+        return now()
+    if isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise APIError(f"{field} must be a timestamp (YYYY-MM-DD HH:MI).")
+
+
+# Insert a list of (employeeNum, serviceNum, startTime) check-ins in three round trips:
+# COPY into a session temp table, then one INSERT ... SELECT that resolves the numbers and
+# skips invalid check-ins. Returns one (workRecordNum, employeeNum, serviceNum, startTime,
+# error) row per check-in, in order; workRecordNum is NULL and error set for skipped ones.
+# The statements read a per-session temp table, so they are sent as plain queries.
+def insert_checkins(cur, checkins):
+    data = io.StringIO()
+    writer = csv.writer(data, lineterminator="\n")
+    for seq, (employee_num, service_num, start_time) in enumerate(checkins):
+        writer.writerow([seq, employee_num, service_num, start_time.isoformat(sep=" ")])
+    data.seek(0)
+
+    # The temp table lives as long as the session and is emptied by every commit
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS work_record_checkins (
+            seq         INT PRIMARY KEY,
+            employeeNum TEXT,
+            serviceNum  TEXT,
+            startTime   TIMESTAMP
+        ) ON COMMIT DELETE ROWS;
+        TRUNCATE work_record_checkins;
+    """)
+    cur.copy_expert("COPY work_record_checkins (seq, employeeNum, serviceNum, startTime) "
+                    "FROM STDIN WITH (FORMAT csv);", data)
+    # An employee can only have one open work record: a check-in is refused when one is already
+    # open, and only the first valid check-in per employee in the batch is kept. The unique index
+    # idx_workrecord_open (migration 0008) settles races with concurrent inserts: a conflicting
+    # row is skipped and its check-in refused the same way.
+    # workRecordNum comes from the column default (migration 0005).
+    cur.execute("""
+        WITH checked AS (
+            SELECT c.seq, c.employeeNum, c.serviceNum, c.startTime, e.id AS employeeID, rs.id AS recurringServiceID,
+                   CASE WHEN e.id IS NULL THEN 'Employee not found.'
+                        WHEN e.deactivatedDate <= c.startTime THEN 'Employee is deactivated.'
+                        WHEN rs.id IS NULL THEN 'Service not found.'
+                        WHEN EXISTS (SELECT 1 FROM WorkRecord w WHERE w.employeeID = e.id AND w.endTime IS NULL)
+                            THEN 'Employee is already clocked in.'
+                   END AS error
+            FROM work_record_checkins c
+                LEFT JOIN Employee e ON e.employeeNum = c.employeeNum
+                LEFT JOIN RecurringService rs ON rs.serviceNum = c.serviceNum
+        ),
+        resolved AS (
+            SELECT seq, employeeNum, serviceNum, startTime, employeeID, recurringServiceID,
+                   CASE WHEN error IS NULL
+                             AND seq > MIN(seq) FILTER (WHERE error IS NULL) OVER (PARTITION BY employeeID)
+                        THEN 'Employee is already clocked in.'
+                        ELSE error END AS error
+            FROM checked
+        ),
+        inserted AS (
+            INSERT INTO WorkRecord (recurringServiceID, startTime, employeeID)
+            SELECT recurringServiceID, startTime, employeeID
+            FROM resolved
+            WHERE error IS NULL
+            ORDER BY seq
+            ON CONFLICT (employeeID) WHERE endTime IS NULL DO NOTHING
+            RETURNING employeeID, workRecordNum
+        )
+        SELECT i.workRecordNum, r.employeeNum, r.serviceNum, r.startTime,
+               COALESCE(r.error, CASE WHEN i.workRecordNum IS NULL THEN 'Employee is already clocked in.' END)
+        FROM resolved r
+            LEFT JOIN inserted i ON i.employeeID = r.employeeID AND r.error IS NULL
+        ORDER BY r.seq;
+    """)
+    return cur.fetchall()
+
+
+# ---------------------------
+# CheckInBuffer
+# Collects check-ins from many threads (HTTP workers, crew devices sending queues of
+# check-ins) and writes them together: a flush runs when INGEST_BATCH_SIZE check-ins are
+# waiting or INGEST_FLUSH_INTERVAL seconds after the first one arrived, whichever is first.
+# One flush is one transaction of three round trips, whatever its size, so the rate is bound
+# by the batch size rather than by one commit per check-in. Each caller gets a Future with
+# its own result row and waits for it, so run() still returns only once the row is committed.
+# ---------------------------
+class CheckInBuffer:
+    def __init__(self, pool, batch_size=INGEST_BATCH_SIZE, interval=INGEST_FLUSH_INTERVAL):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._pending = []          # (check-in, Future), oldest first
+        self._first_at = None       # time.monotonic() of the oldest pending check-in
+        self._closing = False
+        self._thread = None
+        self.flushes = self.written = 0
+
+    # Queue check-ins and return one Future per check-in, resolved with its result row
+    def submit(self, checkins):
+        futures = [Future() for _ in checkins]
+        with self._cond:
+            if self._closing:
+                raise APIError("The check-in service is shutting down.")
+            self._start()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.extend(zip(checkins, futures))
+            self._cond.notify()
+        return futures
+
+    # Counters for monitoring (HTTP service: GET /stats)
+    def stats(self):
+        with self._cond:
+            return {"pending": len(self._pending), "flushes": self.flushes, "written": self.written,
+                    "batchSize": self.batch_size, "flushIntervalMs": self.interval * 1000}
+
+    # Flush what is pending and stop the flusher thread
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    # The flusher starts on first use, so processes that never clock in start no thread
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="checkin-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Wait for a full batch, the flush interval, or shutdown
+                deadline = self._first_at + self.interval
+                while len(self._pending) < self.batch_size and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                self._first_at = time.monotonic() if self._pending else None
+            self._flush(batch)
+
+    # Write one batch in its own transaction and resolve its futures
+    def _flush(self, batch):
+        try:
+            with self.pool.connection() as conn, tracing.endpoint_call(conn, ClockInAPI.name):
+                try:
+                    with conn.cursor() as cur:
+                        rows = insert_checkins(cur, [checkin for checkin, _ in batch])
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._cond:
+            self.flushes += 1
+            self.written += sum(1 for row in rows if row[0] is not None)
+        for (_, future), row in zip(batch, rows):
+            future.set_result(row)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+# The buffer shared by every ClockIn endpoint using this pool (one flusher thread per process)
+def for_pool(pool):
+    with _buffers_lock:
+        buffer = _buffers.get(id(pool))
+        if buffer is None:
+            buffer = _buffers[id(pool)] = CheckInBuffer(pool)
+        return buffer
+
+
+# ---------------------------
+# ClockInAPI: starts a work record for an employee on a recurring service
+# ---------------------------
+class ClockInAPI(APIEndpoint):
+    name = "ClockIn"
+
+    # Initialize Class Instance
+    # Check-ins go through the shared CheckInBuffer; with a caller connection they are inserted
+    # directly in the caller's transaction instead
+    def __init__(self, pool):
+        self.pool = pool
+        self.buffer = for_pool(pool)
+
+    # Displays brief description of API for API Listing Page
+    def display_brief(self, index):
+        print(f"{index}. ClockIn - Starts a work record when an employee begins a service.")
+
+    # Displays details of API and its use
+    def display_details(self):
+        print("\n--- ClockIn ---")
+        print("Description: Creates an open work record (no end time) with a generated work record number.")
+        print("An employee can only be clocked in to one service at a time.")
+        print("Parameters:")
+        print("\t- employeeNum (text): The employee starting work, e.g. E0001")
+        print("\t- serviceNum (text): The recurring service being performed, e.g. RS0001")
+        print("\t- startTime (timestamp, optional, format: YYYY-MM-DD HH:MI): Defaults to now")
+        print("\t- checkIns (list, optional): Many check-ins at once, each an object with the fields above;")
+        print("\t  invalid ones are reported in the error column instead of failing the call")
+        print("Returns: workRecordNum, employeeNum, serviceNum, startTime")
+        print("-------------------------\n")
+
+    # Clock in one employee, or a list of check-ins (bulk mode)
+    # params: employeeNum, serviceNum, startTime; or checkIns (list of objects with those fields)
+    def run(self, params: dict, conn=None) -> APIResult:
+        if conn is None:
+            return self.submit(params).result()
+        bulk = params.get("checkIns") is not None
+        checkins = self._checkins(params, bulk)
+        with self._migration_errors(), self.transaction(conn) as conn, conn.cursor() as cur:
+            rows = insert_checkins(cur, checkins)
+        return self._result(bulk, rows)
+
+    # Queue the check-ins on the buffer and return a Future of run()'s APIResult
+    # The HTTP service awaits it on the event loop, so callers waiting for a flush hold no worker thread
+    def submit(self, params: dict):
+        bulk = params.get("checkIns") is not None
+        futures = self.buffer.submit(self._checkins(params, bulk))
+        result = Future()
+
+        def finish(_):
+            try:
+                with self._migration_errors():
+                    rows = [future.result() for future in futures]
+                result.set_result(self._result(bulk, rows))
+            except Exception as e:
+                result.set_exception(e)
+
+        # One flusher resolves the check-ins in the order they were queued, so the last one is done last
+        futures[-1].add_done_callback(finish)
+        return result
+
+    # Errors raised when the migrations ClockIn depends on have not been applied
+    @staticmethod
+    @contextmanager
+    def _migration_errors():
+        try:
+            yield
+        except errors.NotNullViolation:
+            # No workRecordNum default yet
+            raise APIError("Clock-in needs migration 0005: run migrate.py first.")
+        except errors.InvalidColumnReference:
+            # No unique index for ON CONFLICT yet
+            raise APIError("Clock-in needs migration 0008: run migrate.py first.")
+
+    # Build the result of a call from its check-in rows
+    @staticmethod
+    def _result(bulk, rows):
+        if bulk:
+            created = sum(1 for row in rows if row[0] is not None)
+            return APIResult(CHECKIN_COLUMNS + ["error"], rows,
+                             f"{created} of {len(rows)} check-in(s) recorded.")
+        if rows[0][4] is not None:
+            raise APIError(rows[0][4])
+        return APIResult(CHECKIN_COLUMNS, [rows[0][:4]], "Clocked in successfully!")
+
+    # Validate the check-ins: [(employeeNum, serviceNum, startTime)]
+    def _checkins(self, params, bulk):
+        items = params.get("checkIns") if bulk else [params]
+        if not isinstance(items, (list, tuple)) or not items:
+            raise APIError("checkIns must be a non-empty list of check-ins.")
+        checkins = []
+        for number, item in enumerate(items, start=1):
+            prefix = f"Check-in {number}: " if bulk else ""
+            if not isinstance(item, dict):
+                raise APIError(f"{prefix}Each check-in must be an object.")
+            employee_num = optional_text(item.get("employeeNum"))
+            service_num = optional_text(item.get("serviceNum"))
+            if not employee_num or not service_num:
+                raise APIError(f"{prefix}Employee number and service number are required.")
+            checkins.append((employee_num, service_num, parse_timestamp(item.get("startTime"), "Start time")))
+        return checkins
+
+    # Function for executing API and collecting user input
+    def execute(self):
+        params = {
+            "employeeNum": input("Enter employee number (e.g. E0001): ").strip(),
+            "serviceNum": input("Enter service number (e.g. RS0001): ").strip(),
+            "startTime": input("Enter start time (YYYY-MM-DD HH:MI, leave blank for now): ").strip(),
+        }
+        if any(value.lower() == "quit" for value in params.values()):
+            print("Operation terminated by user.")
+            return
+
+        try:
+            result = self.run(params)
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except Exception:
+            print("Error clocking in. Please try again.")
+            return
+
+        workRecordNum, employeeNum, serviceNum, startTime = result.rows[0]
+        print(f"\n{result.message}")
+        print(f"Work Record Number: {workRecordNum}")
+        print(f"Employee: {employeeNum}, Service: {serviceNum}, Started: {startTime}")
+
+
+# ---------------------------
+# ClockOutAPI: closes an employee's open work record
+# ---------------------------
+class ClockOutAPI(APIEndpoint):
+    name = "ClockOut"
+
+    COLUMNS = ["workRecordNum", "employeeNum", "serviceNum", "startTime", "endTime"]
+
+    # Initialize Class Instance and register the UPDATE
+    # $1: employee number, closing the employee's open record(s); $2: a work record number instead
+    # $3: end time, which cannot be before the start time
+    # The open record is found through idx_workrecord_open (migration 0005); the WorkRecord
+    # rollup triggers add the closed record to WorkRecordDailyRollup
+    def __init__(self, pool):
+        self.pool = pool
+        statements.register("clock_out", ("text", "text", "timestamp"), """
+            UPDATE WorkRecord w
+            SET endTime = $3
+            FROM Employee e, RecurringService rs
+            WHERE e.id = w.employeeID
+              AND rs.id = w.recurringServiceID
+              AND w.endTime IS NULL
+              AND w.startTime <= $3
+              AND (w.workRecordNum = $2 OR ($2 IS NULL AND e.employeeNum = $1))
+            RETURNING w.workRecordNum, e.employeeNum, rs.serviceNum, w.startTime, w.endTime;
+            """)
+
+    # Displays brief description of API for API Listing Page
+    def display_brief(self, index):
+        print(f"{index}. ClockOut - Ends an employee's open work record.")
+
+    # Displays details of API and its use
+    def display_details(self):
+        print("\n--- ClockOut ---")
+        print("Description: Sets the end time of the open work record of an employee (or of one work record).")
+        print("Parameters:")
+        print("\t- employeeNum (text): The employee finishing work, e.g. E0001, or")
+        print("\t- workRecordNum (text): The open work record to close, e.g. WR0042")
+        print("\t- endTime (timestamp, optional, format: YYYY-MM-DD HH:MI): Defaults to now")
+        print("Returns: workRecordNum, employeeNum, serviceNum, startTime, endTime")
+        print("-------------------------\n")
+
+    # Close the open work record(s)
+    # params: employeeNum or workRecordNum, endTime
+    def run(self, params: dict, conn=None) -> APIResult:
+        employee_num = optional_text(params.get("employeeNum"))
+        work_record_num = optional_text(params.get("workRecordNum"))
+        if not employee_num and not work_record_num:
+            raise APIError("An employee number or a work record number is required.")
+        end_time = parse_timestamp(params.get("endTime"), "End time")
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                statements.execute(cur, "clock_out", (employee_num, work_record_num, end_time))
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+
+        if not rows:
+            raise APIError("No open work record found that started before the end time.")
+        return APIResult(self.COLUMNS, rows, "Clocked out successfully!")
+
+    # Function for executing API and collecting user input
+    def execute(self):
+        params = {
+            "employeeNum": input("Enter employee number (leave blank to enter a work record number): ").strip(),
+        }
+        if not params["employeeNum"]:
+            params["workRecordNum"] = input("Enter work record number: ").strip()
+        params["endTime"] = input("Enter end time (YYYY-MM-DD HH:MI, leave blank for now): ").strip()
+        if any(value.lower() == "quit" for value in params.values()):
+            print("Operation terminated by user.")
+            return
+
+        try:
+            result = self.run(params)
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except Exception:
+            print("Error clocking out. Please try again.")
+            return
+
+        print(f"\n{result.message}")
+        for workRecordNum, employeeNum, serviceNum, startTime, endTime in result.rows:
+            print(f"{workRecordNum}: {employeeNum} on {serviceNum}, {startTime} to {endTime} ({endTime - startTime})")
+
+
+# ---------------------------
+# DailyPlanAPI: splits the visits due on a day into one route per active employee
+# ---------------------------
+class DailyPlanAPI(APIEndpoint):
+    name = "DailyPlan"
+
+    COLUMNS = ["employeeNum", "firstName", "lastName", "stop", "propertyNumber", "city", "zipcode",
+               "serviceNum", "serviceName", "allocatedManHours"]
+    SUMMARY_COLUMNS = ["employeeNum", "firstName", "lastName", "visits", "plannedHours", "zipcodes"]
+
+    # Initialize Class Instance and register the employee query
+    # $1: the day planned; employees hired by then and not deactivated by then can be sent out
+    def __init__(self, pool):
+        self.pool = pool
+        statements.register("active_employees", ("date",), """
+            SELECT employeeNum, firstName, lastName
+            FROM Employee
+            WHERE hireDate <= $1 AND (deactivatedDate IS NULL OR deactivatedDate > $1)
+            ORDER BY employeeNum;
+            """)
+
+    # Displays brief description of API for API Listing Page
+    def display_brief(self, index):
+        print(f"{index}. DailyPlan - Plans the routes of the active employees for the visits due on a day.")
+
+    # Displays details of API and its use
+    def display_details(self):
+        print("\n--- DailyPlan ---")
+        print("Description: Takes the visits due on a day (see VisitSchedule) and gives every active employee")
+        print("a route of nearby visits: visits are grouped by zipcode within each city, and the groups are")
+        print("shared out so each employee gets about the same allocated man hours.")
+        print("Parameters:")
+        print("\t- date (date, optional, format: YYYY-MM-DD): The day to plan, defaults to today")
+        print(f"\t- workdayHours (number, optional): Allocated hours one employee can take, defaults to {routing.WORKDAY_HOURS}")
+        print("\t- summary (true/false, optional): One row per employee instead of one per visit")
+        print("Returns: employeeNum, firstName, lastName, stop, propertyNumber, city, zipcode, serviceNum,")
+        print("serviceName, allocatedManHours; visits that do not fit anyone's day come last, without an employee")
+        print("-------------------------\n")
+
+    # Plan the routes of one day
+    # params: date, workdayHours, summary
+    def run(self, params: dict, conn=None) -> APIResult:
+        day = parse_date(params.get("date"), "date") or datetime.date.today()
+        workday_hours = self._workday_hours(params.get("workdayHours"))
+        summary = parse_bool(params.get("summary"), "summary")
+
+        try:
+            visits = [visit for _, _, visit in schedule.for_pool(self.pool).visits(day, day)]
+        except errors.UndefinedColumn:
+            # No RecurringServiceList.startDate yet
+            raise APIError("Daily planning needs migration 0006: run migrate.py first.")
+
+        with self.transaction(conn) as conn:
+            cur = conn.cursor()
+            try:
+                statements.execute(cur, "active_employees", (day,))
+                employees = cur.fetchall()
+            finally:
+                cur.close()
+
+        routes, unassigned = routing.plan_routes(visits, employees, workday_hours)
+        message = (f"{len(visits) - len(unassigned)} of {len(visits)} visits on {day} planned for "
+                   f"{len(employees)} employees.")
+        if unassigned:
+            message += f" {len(unassigned)} visits did not fit into the workday and are unassigned."
+
+        if summary:
+            rows = [(*route.employee, len(route.visits), round(route.hours, 2),
+                     ", ".join(dict.fromkeys(visit.zipcode for visit in route.visits)))
+                    for route in routes]
+            if unassigned:
+                rows.append((None, None, None, len(unassigned), round(sum(map(routing.visit_hours, unassigned)), 2),
+                             ", ".join(dict.fromkeys(visit.zipcode for visit in unassigned))))
+            return APIResult(self.SUMMARY_COLUMNS, rows, message)
+
+        rows = []
+        for route in routes:
+            rows.extend((*route.employee, stop, visit.propertyNumber, visit.city, visit.zipcode, visit.serviceNum,
+                         visit.serviceName, visit.allocatedManHours)
+                        for stop, visit in enumerate(route.visits, start=1))
+        rows.extend((None, None, None, None, visit.propertyNumber, visit.city, visit.zipcode, visit.serviceNum,
+                     visit.serviceName, visit.allocatedManHours) for visit in unassigned)
+        return APIResult(self.COLUMNS, rows, message)
+
+    # Parse the optional workday length in hours
+    @staticmethod
+    def _workday_hours(value):
+        if value is None or str(value).strip() == "":
+            return routing.WORKDAY_HOURS
+        try:
+            hours = float(str(value).strip())
+        except ValueError:
+            raise APIError("workdayHours must be a number of hours.")
+        if not 0 < hours <= 24:
+            raise APIError("workdayHours must be between 0 and 24.")
+        return hours
+
+    # Function for executing API and collecting user input
+    def execute(self):
+        params = {
+            "date": input("Enter the day to plan (YYYY-MM-DD, leave blank for today): ").strip(),
+            "workdayHours": input(f"Enter hours per employee (leave blank for {routing.WORKDAY_HOURS}): ").strip(),
+        }
+        if any(value.lower() == "quit" for value in params.values()):
+            print("Operation terminated by user.")
+            return
+
+        try:
+            result = self.run(params)
+        except APIError as e:
+            print(f"Error: {e}")
+            return
+        except Exception:
+            print("Error planning the day. Please try again.")
+            return
+
+        print(f"\n{result.message}")
+        current = False
+        for employeeNum, firstName, lastName, stop, propertyNumber, city, zipcode, serviceNum, serviceName, hours in result.rows:
+            if employeeNum != current:
+                print(f"\n{employeeNum}: {firstName} {lastName}" if employeeNum else "\nUnassigned:")
+                current = employeeNum
+            print(f"\t{stop or '-'}. {propertyNumber} ({city} {zipcode}) - {serviceNum} {serviceName}, {hours}")